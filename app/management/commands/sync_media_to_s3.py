@@ -0,0 +1,56 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.media_sync import MediaSync
+
+
+class Command(BaseCommand):
+    help = "Upload MEDIA_ROOT to the S3 media bucket, skipping files that have not changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bucket", default=os.environ.get("AWS_STORAGE_BUCKET_NAME"),
+                            help="Target bucket (default: AWS_STORAGE_BUCKET_NAME).")
+        parser.add_argument("--prefix", default=getattr(settings, "AWS_MEDIA_LOCATION", "media"),
+                            help="Key prefix inside the bucket (default: AWS_MEDIA_LOCATION).")
+        parser.add_argument("--manifest",
+                            help="Manifest path (default: <MEDIA_ROOT>/.s3-sync-manifest.json).")
+        parser.add_argument("--workers", type=int, default=8,
+                            help="Number of concurrent uploads.")
+        parser.add_argument("--endpoint-url",
+                            help="S3-compatible endpoint, e.g. a local moto or MinIO server.")
+        parser.add_argument("--no-remote-check", action="store_true",
+                            help="Don't HEAD objects missing from the manifest before uploading them.")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Report what would be uploaded without uploading.")
+
+    def handle(self, *args, **options):
+        if not options["bucket"]:
+            raise CommandError("AWS_STORAGE_BUCKET_NAME not set in environment; pass --bucket")
+
+        import boto3
+        client = boto3.client("s3", endpoint_url=options["endpoint_url"])
+
+        sync = MediaSync(
+            client,
+            options["bucket"],
+            settings.MEDIA_ROOT,
+            prefix=options["prefix"],
+            manifest_path=options["manifest"],
+            workers=options["workers"],
+            check_remote=not options["no_remote_check"],
+            dry_run=options["dry_run"],
+            log=self.stdout.write,
+        )
+        self.stdout.write(
+            f"Syncing {settings.MEDIA_ROOT} to s3://{options['bucket']}/{sync.prefix} "
+            f"with {options['workers']} workers")
+        stats = sync.run()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Uploaded {stats.uploaded} files ({stats.bytes_uploaded / (1024 * 1024):.1f} MB), "
+            f"skipped {stats.skipped} unchanged, {stats.failed} failed "
+            f"in {stats.seconds:.1f}s ({stats.throughput:.2f} MB/s)"))
+        if stats.failed:
+            raise CommandError(f"{stats.failed} files failed to upload; rerun to retry them")
@@ -1,3 +1,187 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from botocore.exceptions import ClientError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+
+from app.media_sync import MANIFEST_NAME, MediaSync
+from main.storages import CachedS3Storage
+
+
+class FakeS3:
+    """Just enough of a boto3 S3 client, backed by a directory."""
+
+    def __init__(self, root):
+        self.root = root
+        self.uploads = []
+        self.heads = 0
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split('/'))
+
+    def head_object(self, Bucket, Key):
+        self.heads += 1
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+        with open(path, 'rb') as f:
+            data = f.read()
+        return {'ContentLength': len(data), 'ETag': f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def upload_file(self, Filename, Bucket, Key):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(Filename, path)
+        self.uploads.append(Key)
+
+
+class MediaSyncTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.media_root = os.path.join(self.tmp, 'media')
+        self.client = FakeS3(os.path.join(self.tmp, 's3'))
+        self.write('forum/1/a.jpg', b'aaa')
+        self.write('forum/1/b.jpg', b'bbbb')
+        self.write('profile_pics/c.png', b'c')
+
+    def write(self, rel_path, data):
+        path = os.path.join(self.media_root, *rel_path.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def sync(self, **kwargs):
+        return MediaSync(self.client, 'bucket', self.media_root, log=lambda msg: None, **kwargs).run()
+
+    def test_first_run_uploads_everything(self):
+        stats = self.sync()
+        self.assertEqual((stats.uploaded, stats.skipped, stats.failed), (3, 0, 0))
+        self.assertEqual(stats.bytes_uploaded, 8)
+        self.assertCountEqual(self.client.uploads, [
+            'media/forum/1/a.jpg', 'media/forum/1/b.jpg', 'media/profile_pics/c.png'])
+        with open(os.path.join(self.media_root, MANIFEST_NAME)) as f:
+            self.assertEqual(len(json.load(f)), 3)
+
+    def test_rerun_skips_without_hashing_or_head_requests(self):
+        self.sync()
+        self.client.uploads.clear()
+        heads = self.client.heads
+
+        stats = self.sync()
+        self.assertEqual((stats.uploaded, stats.skipped), (0, 3))
+        self.assertEqual(self.client.uploads, [])
+        self.assertEqual(self.client.heads, heads)
+
+    def test_changed_file_is_uploaded_again(self):
+        self.sync()
+        self.client.uploads.clear()
+        self.write('forum/1/a.jpg', b'changed')
+
+        stats = self.sync()
+        self.assertEqual((stats.uploaded, stats.skipped), (1, 2))
+        self.assertEqual(self.client.uploads, ['media/forum/1/a.jpg'])
+
+    def test_touched_but_identical_file_is_not_uploaded(self):
+        self.sync()
+        self.client.uploads.clear()
+        path = os.path.join(self.media_root, 'forum', '1', 'a.jpg')
+        os.utime(path, (1, 1))
+
+        stats = self.sync()
+        self.assertEqual(stats.uploaded, 0)
+
+    def test_resumes_from_partial_manifest(self):
+        # an earlier, interrupted run got as far as uploading a.jpg
+        partial = MediaSync(self.client, 'bucket', self.media_root, log=lambda msg: None)
+        partial.sync_file('forum/1/a.jpg', os.path.join(self.media_root, 'forum', '1', 'a.jpg'))
+        partial.save_manifest()
+        self.client.uploads.clear()
+
+        stats = self.sync()
+        self.assertEqual((stats.uploaded, stats.skipped), (2, 1))
+        self.assertNotIn('media/forum/1/a.jpg', self.client.uploads)
+
+    def test_objects_already_in_bucket_are_not_reuploaded(self):
+        self.sync()
+        os.remove(os.path.join(self.media_root, MANIFEST_NAME))
+        self.client.uploads.clear()
+
+        stats = self.sync()
+        self.assertEqual((stats.uploaded, stats.skipped), (0, 3))
+
+    def test_failed_upload_is_counted_and_retried_next_run(self):
+        upload_file = self.client.upload_file
+
+        def flaky(Filename, Bucket, Key):
+            if Key.endswith('b.jpg'):
+                raise OSError('connection reset')
+            upload_file(Filename, Bucket, Key)
+
+        self.client.upload_file = flaky
+        stats = self.sync()
+        self.assertEqual((stats.uploaded, stats.failed), (2, 1))
+
+        self.client.upload_file = upload_file
+        self.client.uploads.clear()
+        stats = self.sync()
+        self.assertEqual(self.client.uploads, ['media/forum/1/b.jpg'])
+
+    def test_dry_run_uploads_nothing(self):
+        stats = self.sync(dry_run=True)
+        self.assertEqual(stats.uploaded, 3)
+        self.assertEqual(self.client.uploads, [])
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, MANIFEST_NAME)))
+
+    def test_command_requires_bucket(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            with self.assertRaises(CommandError):
+                call_command('sync_media_to_s3', bucket='', stdout=StringIO())
+
+
+class SignedURLCacheTests(SimpleTestCase):
+    def storage(self, **kwargs):
+        return CachedS3Storage(bucket_name='bucket', access_key='key', secret_key='secret',
+                               region_name='us-east-1', custom_domain=None,
+                               querystring_auth=True, querystring_expire=600, **kwargs)
+
+    def test_url_is_signed_once_and_reused(self):
+        storage = self.storage()
+        first = storage.url('forum/1/a.jpg')
+        self.assertIn('X-Amz-Signature', first)
+        with mock.patch('storages.backends.s3.S3Storage.url') as sign:
+            self.assertEqual(storage.url('forum/1/a.jpg'), first)
+        sign.assert_not_called()
+
+    @override_settings(MEDIA_URL_CACHE_TTL=10 ** 6)
+    def test_ttl_never_exceeds_half_the_signature_lifetime(self):
+        self.assertEqual(self.storage().url_cache.ttl, 300)
+
+    def test_expired_entries_are_signed_again(self):
+        storage = self.storage()
+        storage.url('a.jpg')
+        with mock.patch('main.storages.time.monotonic', return_value=time.monotonic() + 301):
+            with mock.patch('storages.backends.s3.S3Storage.url', return_value='fresh') as sign:
+                self.assertEqual(storage.url('a.jpg'), 'fresh')
+        sign.assert_called_once()
+
+    @override_settings(MEDIA_URL_CACHE_SIZE=2)
+    def test_cache_is_size_bounded(self):
+        storage = self.storage()
+        for name in ('a.jpg', 'b.jpg', 'c.jpg'):
+            storage.url(name)
+        self.assertIsNone(storage.url_cache.get('a.jpg'))
+        self.assertIsNotNone(storage.url_cache.get('c.jpg'))
+
+    def test_custom_arguments_bypass_cache(self):
+        storage = self.storage()
+        storage.url('a.jpg', expire=60)
+        self.assertIsNone(storage.url_cache.get('a.jpg'))
@@ -2,9 +2,7 @@ from django.contrib import messages
 from django.shortcuts import render
 from django.utils import timezone
 from datetime import datetime, time, timedelta
-import os, json
-from django.conf import settings
-from leaderboard.models import Task
+from leaderboard.models import Task, TaskTemplate
 
 # render html for a request path
 
@@ -21,18 +19,15 @@ def home(request):
     # Calculate remaining tasks and time until reset
     if request.user.is_authenticated:
         try:
-            # Load daily tasks template
-            tasks_file = os.path.join(settings.BASE_DIR, "leaderboard", "daily_tasks.json")
-            with open(tasks_file, "r", encoding="utf-8") as f:
-                templates = json.load(f)
-            
-            total_tasks = len(templates)
+            total_tasks = TaskTemplate.active_for(TaskTemplate.DAILY).count()
             
             # Get completed tasks for today
             today = timezone.localdate()
             completed_today = Task.objects.filter(
                 user=request.user, 
                 completed=True, 
+                template__kind=TaskTemplate.DAILY,
+                template__active=True,
                 created_at__date=today
             ).count()
             
@@ -52,12 +47,7 @@ def home(request):
             minutes, seconds = divmod(remainder, 60)
             time_until_reset = f"{hours}h {minutes}m {seconds}s"
             
-            # Load weekly tasks template
-            weekly_file = os.path.join(settings.BASE_DIR, "leaderboard", "weekly_tasks.json")
-            with open(weekly_file, "r", encoding="utf-8") as f:
-                weekly_templates = json.load(f)
-            
-            total_weekly_tasks = len(weekly_templates)
+            total_weekly_tasks = TaskTemplate.active_for(TaskTemplate.WEEKLY).count()
             
             # Get completed weekly tasks for this week
             # Week starts on Monday (weekday=0)
@@ -65,6 +55,8 @@ def home(request):
             completed_weekly = Task.objects.filter(
                 user=request.user,
                 completed=True,
+                template__kind=TaskTemplate.WEEKLY,
+                template__active=True,
                 created_at__date__gte=week_start,
                 created_at__date__lte=today
             ).count()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Post, Comment, PostImage
+from .models import Post, Comment, PostImage, PendingUpload
 
 
 @admin.register(Post)
@@ -61,3 +61,11 @@ class PostImageAdmin(admin.ModelAdmin):
     list_display = ('id', 'post', 'uploaded_at')
     list_filter = ('uploaded_at', 'post__author')
     search_fields = ('post__title', 'post__author__username')
+
+
+@admin.register(PendingUpload)
+class PendingUploadAdmin(admin.ModelAdmin):
+    list_display = ('id', 'post', 'name', 'attempts', 'started_at', 'created_at')
+    list_filter = ('created_at', 'attempts')
+    search_fields = ('name', 'post__title')
+    readonly_fields = ('post', 'path', 'name', 'position', 'created_at')
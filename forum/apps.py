@@ -5,3 +5,6 @@ class ForumConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'forum'
     verbose_name = 'Forum'
+
+    def ready(self):
+        import forum.signals
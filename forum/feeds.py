@@ -0,0 +1,77 @@
+"""Keyset (cursor) pagination for the forum channel feeds.
+
+Pages are ordered newest first on ``(created_at, id)`` and the cursor
+encodes the last post of the previous page, so fetching page N is a single
+indexed range scan instead of an OFFSET that grows with N.
+
+``prefetch_for_cards`` loads everything a channel card renders (author,
+profile, preview image) up front, so a page costs a fixed number of
+queries however many posts it shows.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Prefetch, Q
+
+from .models import PostImage
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def page_size(request):
+    """Page size from ``?page_size=``, falling back to ``FORUM_FEED_PAGE_SIZE``."""
+    default = getattr(settings, 'FORUM_FEED_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def encode_cursor(post):
+    raw = f'{post.created_at.isoformat()}|{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, pk)`` for a cursor, or None if it is missing or invalid."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = base64.urlsafe_b64decode(padded).decode().rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def prefetch_for_cards(queryset):
+    """Attach author/profile and a one-item ``preview_images`` list to each post."""
+    return queryset.select_related('author__profile').prefetch_related(
+        Prefetch(
+            'images',
+            queryset=PostImage.objects.order_by('position', 'uploaded_at', 'id')[:1],
+            to_attr='preview_images',
+        )
+    )
+
+
+def paginate(queryset, cursor=None, size=DEFAULT_PAGE_SIZE):
+    """Return ``(posts, next_cursor)`` for the page after ``cursor``.
+
+    ``next_cursor`` is None on the last page.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    posts = list(queryset[:size + 1])
+    next_cursor = encode_cursor(posts[size - 1]) if len(posts) > size else None
+    return posts[:size], next_cursor
@@ -0,0 +1,106 @@
+"""Resized WebP/JPEG variants of forum uploads for responsive ``srcset`` markup.
+
+Phone photos are stored at full resolution; list cards and post pages only
+need a few hundred pixels. When an image is saved we write down-scaled
+copies next to it through the same storage backend (``MediaStorage`` in
+production, the filesystem locally) and record their names on the model,
+so templates can build ``srcset`` without touching the storage again.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640, 1280)
+
+# variant key -> (Pillow format, file extension, save options)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def _variant_name(name, width, ext):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return f'{directory}/thumbs/{stem}_{width}w.{ext}'
+
+
+def build_variants(field_file):
+    """Write resized copies of ``field_file`` and return their names.
+
+    The result maps format -> {width: name}, e.g.
+    ``{'webp': {'320': 'forum/1/thumbs/a_320w.webp', ...}, 'jpeg': {...}}``.
+    Widths larger than the original are skipped (an image narrower than
+    every width still gets one re-encoded copy at its own size). Returns an
+    empty dict if the file cannot be read as an image.
+    """
+    storage = field_file.storage
+    try:
+        with storage.open(field_file.name, 'rb') as fh:
+            original = Image.open(fh)
+            original = ImageOps.exif_transpose(original)
+            original.load()
+    except (OSError, UnidentifiedImageError) as e:
+        logger.warning(f"Could not build variants for {field_file.name}: {e}")
+        return {}
+
+    if original.mode not in ('RGB', 'L'):
+        original = original.convert('RGB')
+
+    widths = [w for w in VARIANT_WIDTHS if w < original.width] or [original.width]
+
+    variants = {key: {} for key in VARIANT_FORMATS}
+    try:
+        for width in widths:
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.LANCZOS)
+            for key, (fmt, ext, options) in VARIANT_FORMATS.items():
+                buffer = BytesIO()
+                resized.save(buffer, fmt, **options)
+                name = _variant_name(field_file.name, width, ext)
+                variants[key][str(width)] = storage.save(name, ContentFile(buffer.getvalue()))
+    except Exception as e:
+        # the original upload is still usable; drop whatever was written
+        logger.error(f"Error building variants for {field_file.name}: {str(e)}", exc_info=True)
+        delete_variants(storage, variants)
+        return {}
+
+    logger.info(f"Built {len(widths)} variant sizes for {field_file.name}")
+    return variants
+
+
+def delete_variants(storage, variants):
+    """Remove the files listed in a ``build_variants`` result."""
+    for names in (variants or {}).values():
+        for name in names.values():
+            try:
+                storage.delete(name)
+            except Exception as e:
+                logger.error(f"Error deleting image variant {name}: {str(e)}", exc_info=True)
+
+
+def srcset(storage, names):
+    """``srcset`` value for one format's ``{width: name}`` mapping."""
+    return ', '.join(
+        f'{storage.url(name)} {width}w'
+        for width, name in sorted(names.items(), key=lambda item: int(item[0]))
+    )
+
+
+def variant_url(field_file, variants, max_width):
+    """URL of the largest JPEG variant no wider than ``max_width``.
+
+    Falls back to the smallest variant, then to the original file.
+    """
+    jpeg = (variants or {}).get('jpeg') or {}
+    if not jpeg:
+        return field_file.url
+    widths = sorted(int(w) for w in jpeg)
+    fitting = [w for w in widths if w <= max_width]
+    width = fitting[-1] if fitting else widths[0]
+    return field_file.storage.url(jpeg[str(width)])
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from forum import images
+from forum.models import Post, PostImage
+
+
+class Command(BaseCommand):
+    help = "Build resized WebP/JPEG variants for forum images that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Rebuild variants even for images that already have them.")
+
+    def handle(self, *args, **options):
+        built = 0
+
+        post_images = PostImage.objects.exclude(image="")
+        if not options["rebuild"]:
+            post_images = post_images.filter(variants={})
+        for post_image in post_images.iterator():
+            images.delete_variants(post_image.image.storage, post_image.variants)
+            post_image.variants = images.build_variants(post_image.image)
+            PostImage.objects.filter(pk=post_image.pk).update(variants=post_image.variants)
+            built += bool(post_image.variants)
+
+        posts = Post.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["rebuild"]:
+            posts = posts.filter(image_variants={})
+        for post in posts.iterator():
+            images.delete_variants(post.image.storage, post.image_variants)
+            post.image_variants = images.build_variants(post.image)
+            Post.objects.filter(pk=post.pk).update(image_variants=post.image_variants)
+            built += bool(post.image_variants)
+
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {built} images"))
@@ -0,0 +1,25 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from forum import visibility
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-viewer visibility sets used to filter restricted forum posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "usernames", nargs="*",
+            help="Only rebuild these users (default: everyone).")
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.all()
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+
+        user_ids = list(users.values_list("id", flat=True))
+        for start in range(0, len(user_ids), visibility.CHUNK_SIZE):
+            visibility.rebuild_visibility(user_ids[start:start + visibility.CHUNK_SIZE])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt post visibility for {len(user_ids)} users"))
@@ -0,0 +1,43 @@
+from datetime import timedelta
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from forum import uploads
+from forum.models import PendingUpload, Post
+
+
+class Command(BaseCommand):
+    help = ("Re-queue post images whose background upload was lost (e.g. by a restart), "
+            "recount Post.pending_uploads and remove orphaned spool files.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than", type=int, default=60,
+            help="Only touch uploads and spool files at least this many seconds old (default 60).")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options["older_than"])
+
+        upload_ids = list(uploads.retryable().filter(created_at__lt=cutoff).values_list("pk", flat=True))
+        uploads.enqueue_on_commit(upload_ids)
+
+        post_ids = set(Post.objects.filter(pending_uploads__gt=0).values_list("pk", flat=True))
+        post_ids.update(PendingUpload.objects.values_list("post_id", flat=True))
+        uploads.recount_pending(post_ids)
+
+        known = set(PendingUpload.objects.values_list("path", flat=True))
+        removed = 0
+        spool_dir = uploads.spool_dir()
+        for name in os.listdir(spool_dir):
+            path = os.path.join(spool_dir, name)
+            if path in known or time.time() - os.path.getmtime(path) < options["older_than"]:
+                continue
+            os.remove(path)
+            removed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Re-queued {len(upload_ids)} uploads, recounted {len(post_ids)} posts, "
+            f"removed {removed} orphaned spool files"))
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0012_merge_20251209_1005'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisibleAuthor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('privacy', models.CharField(choices=[('cio_wide', 'CIO-Wide'), ('friends_only', 'Friends Only')], max_length=20)),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('viewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visible_authors', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('viewer', 'privacy', 'author'), name='uq_visible_author')],
+            },
+        ),
+    ]
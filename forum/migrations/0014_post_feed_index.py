@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0013_visibleauthor'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['tag', 'privacy', '-created_at', '-id'], name='forum_post_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_depth(apps, schema_editor):
+    Comment = apps.get_model('forum', 'Comment')
+    depth = 0
+    frontier = list(Comment.objects.filter(parent__isnull=True).values_list('id', flat=True))
+    while frontier:
+        depth += 1
+        children = []
+        for start in range(0, len(frontier), 500):
+            chunk = frontier[start:start + 500]
+            children.extend(Comment.objects.filter(parent_id__in=chunk).values_list('id', flat=True))
+        for start in range(0, len(children), 500):
+            Comment.objects.filter(id__in=children[start:start + 500]).update(depth=depth)
+        frontier = children
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0014_post_feed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'created_at'], name='forum_comment_thread_idx'),
+        ),
+        migrations.RunPython(backfill_depth, migrations.RunPython.noop),
+    ]
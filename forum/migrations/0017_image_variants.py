@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0015_comment_depth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='postimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0017_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='postimage',
+            options={'ordering': ['position', 'uploaded_at']},
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='pending_uploads',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='postimage',
+            name='position',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
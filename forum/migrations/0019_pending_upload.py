@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def reset_pending_counts(apps, schema_editor):
+    # uploads queued before this migration left no row to resume from
+    Post = apps.get_model('forum', 'Post')
+    Post.objects.filter(pending_uploads__gt=0).update(pending_uploads=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0018_background_uploads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=500)),
+                ('name', models.CharField(max_length=255)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_images', to='forum.post')),
+            ],
+            options={
+                'ordering': ['post', 'position'],
+            },
+        ),
+        migrations.RunPython(reset_pending_counts, migrations.RunPython.noop),
+    ]
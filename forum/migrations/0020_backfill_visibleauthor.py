@@ -0,0 +1,53 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+FRIENDS_ONLY = 'friends_only'
+CIO_WIDE = 'cio_wide'
+
+
+def backfill_visible_authors(apps, schema_editor):
+    """Fill VisibleAuthor from the existing friendships (see forum.visibility)."""
+    Friendship = apps.get_model('social', 'Friendship')
+    Profile = apps.get_model('users', 'Profile')
+    VisibleAuthor = apps.get_model('forum', 'VisibleAuthor')
+
+    cios = set(Profile.objects.filter(role='cio').values_list('user_id', flat=True))
+    edges = list(Friendship.objects.values_list('user_id', 'friend_id'))
+
+    rows = set()
+    follows = defaultdict(set)
+    members = defaultdict(set)
+    for user_id, friend_id in edges:
+        # friends_only: the author (user) points at the viewer (friend)
+        rows.add((friend_id, user_id, FRIENDS_ONLY))
+        if user_id in cios:
+            rows.add((friend_id, user_id, CIO_WIDE))
+        if friend_id in cios:
+            follows[user_id].add(friend_id)
+            if user_id not in cios:
+                members[friend_id].add(user_id)
+    for viewer_id, cio_ids in follows.items():
+        for cio_id in cio_ids:
+            for author_id in members[cio_id]:
+                rows.add((viewer_id, author_id, CIO_WIDE))
+
+    VisibleAuthor.objects.all().delete()
+    VisibleAuthor.objects.bulk_create(
+        [VisibleAuthor(viewer_id=v, author_id=a, privacy=p) for v, a, p in rows if v != a],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forum', '0019_pending_upload'),
+        ('social', '0001_initial'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_visible_authors, migrations.RunPython.noop),
+    ]
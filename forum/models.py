@@ -1,8 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
-from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_delete, post_delete, post_save
 from django.dispatch import receiver
+from . import images
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +39,8 @@ class Post(models.Model):
 
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='forum_posts')
     image = models.ImageField(upload_to=forum_image_upload_to, blank=True, null=True)  # Keep for backward compatibility
+    # resized copies of ``image``, see forum.images.build_variants
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     title = models.CharField(max_length=200, default="Title")
     caption = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -46,25 +50,62 @@ class Post(models.Model):
         max_length=20, choices=PRIVACY_CHOICES, default='public')
     is_flagged_inappropriate = models.BooleanField(default=False)
     moderation_note = models.TextField(blank=True, null=True)
+    # images still being pushed to storage in the background (forum.uploads)
+    pending_uploads = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # channel feeds: filter by tag/privacy, keyset on (created_at, id)
+            models.Index(fields=['tag', 'privacy', '-created_at', '-id'], name='forum_post_feed_idx'),
+        ]
 
     def __str__(self):
         return f'Post by {self.author} at {self.created_at:%Y-%m-%d %H:%M}'
 
+    @property
+    def is_processing(self):
+        return self.pending_uploads > 0
+
 
 class PostImage(models.Model):
     post = models.ForeignKey(Post, related_name='images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to=forum_image_upload_to)
+    # resized copies of ``image``, see forum.images.build_variants
+    variants = models.JSONField(default=dict, blank=True, editable=False)
+    # order within the post; background uploads can finish out of order
+    position = models.PositiveSmallIntegerField(default=0)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['uploaded_at']
+        ordering = ['position', 'uploaded_at']
 
     def __str__(self):
         return f'Image for {self.post.title}'
 
+
+class PendingUpload(models.Model):
+    """A spooled image that has not reached storage yet (see forum.uploads).
+
+    The row outlives the in-memory task queue, so ``resume_post_uploads``
+    can re-queue it after a restart; deleting it removes the spooled file.
+    """
+    post = models.ForeignKey(Post, related_name='pending_images', on_delete=models.CASCADE)
+    path = models.CharField(max_length=500)
+    name = models.CharField(max_length=255)
+    position = models.PositiveSmallIntegerField(default=0)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # set while a worker is storing the file, so a re-queued copy skips it
+    started_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['post', 'position']
+
+    def __str__(self):
+        return f'{self.name} for post {self.post_id}'
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         Post, related_name='comments', on_delete=models.CASCADE)
@@ -74,24 +115,79 @@ class Comment(models.Model):
         'self', null=True, blank=True, related_name='replies', on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # nesting level, stored so threads load without walking parent chains
+    depth = models.PositiveIntegerField(default=0, editable=False)
     is_deleted = models.BooleanField(default=False)
     is_flagged_inappropriate = models.BooleanField(default=False)
     moderation_note = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created_at'], name='forum_comment_thread_idx'),
+        ]
+
     def __str__(self):
         return f'{self.author} - {self.content[:20]}'
 
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.depth = self.parent.depth + 1 if self.parent_id else 0
+        super().save(*args, **kwargs)
+
     @property
     def level(self):
-        if not self.parent:
-            return 0
-        else:
-            return 1 + self.parent.level
+        return self.depth
+
+
+class VisibleAuthor(models.Model):
+    """Materialized visibility: ``viewer`` may see ``author``'s posts of ``privacy``.
+
+    Only the restricted scopes are stored; public posts and a user's own posts
+    never need a row. Rows are maintained by ``forum.visibility``.
+    """
+    PRIVACY_CHOICES = [
+        ('cio_wide', 'CIO-Wide'),
+        ('friends_only', 'Friends Only'),
+    ]
+
+    viewer = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='visible_authors')
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    privacy = models.CharField(max_length=20, choices=PRIVACY_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['viewer', 'privacy', 'author'],
+                name='uq_visible_author',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.viewer} can see {self.privacy} posts by {self.author}'
+
+
+@receiver(post_save, sender=Post)
+def build_post_image_variants(sender, instance, **kwargs):
+    """Generate resized copies of a newly attached Post image."""
+    if instance.image and not instance.image_variants:
+        instance.image_variants = images.build_variants(instance.image)
+        Post.objects.filter(pk=instance.pk).update(image_variants=instance.image_variants)
+
+
+@receiver(post_save, sender=PostImage)
+def build_post_image_file_variants(sender, instance, **kwargs):
+    """Generate resized copies of a newly uploaded PostImage."""
+    if instance.image and not instance.variants:
+        instance.variants = images.build_variants(instance.image)
+        PostImage.objects.filter(pk=instance.pk).update(variants=instance.variants)
 
 
 @receiver(pre_delete, sender=Post)
 def delete_post_image_from_s3(sender, instance, **kwargs):
     """Delete the associated image from S3 when a Post is deleted."""
+    images.delete_variants(instance.image.storage, instance.image_variants)
     if instance.image:
         try:
             logger.info(f"Deleting image from S3: {instance.image.name}")
@@ -104,10 +200,23 @@ def delete_post_image_from_s3(sender, instance, **kwargs):
 @receiver(pre_delete, sender=PostImage)
 def delete_post_image_file_from_s3(sender, instance, **kwargs):
     """Delete the associated image from S3 when a PostImage is deleted."""
+    images.delete_variants(instance.image.storage, instance.variants)
     if instance.image:
         try:
             logger.info(f"Deleting PostImage from S3: {instance.image.name}")
             instance.image.delete(save=False)
             logger.info(f"Successfully deleted PostImage: {instance.image.name}")
         except Exception as e:
-            logger.error(f"Error deleting PostImage from S3: {str(e)}", exc_info=True)
\ No newline at end of file
+            logger.error(f"Error deleting PostImage from S3: {str(e)}", exc_info=True)
+
+@receiver(post_delete, sender=PendingUpload)
+def remove_spooled_file(sender, instance, **kwargs):
+    """Remove the spooled file of a finished (or abandoned) upload once committed."""
+    def remove():
+        try:
+            os.remove(instance.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"Could not remove spooled file {instance.path}: {str(e)}")
+    transaction.on_commit(remove)
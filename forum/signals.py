@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from social.models import Friendship
+from users.models import Profile
+from . import visibility
+
+
+@receiver(post_save, sender=Friendship)
+def add_friendship_visibility(sender, instance, created, **kwargs):
+    if created:
+        visibility.friendship_created(instance)
+
+
+@receiver(post_delete, sender=Friendship)
+def remove_friendship_visibility(sender, instance, **kwargs):
+    visibility.friendship_deleted(instance)
+
+
+@receiver(post_save, sender=Profile)
+def refresh_role_visibility(sender, instance, **kwargs):
+    # saved values stored by users.signals.remember_previous_profile
+    previous = getattr(instance, '_previous_fields', None) or {}
+    if (previous.get('role') == 'cio') != (instance.role == 'cio'):
+        visibility.role_changed(instance.user_id)
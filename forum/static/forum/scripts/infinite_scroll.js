@@ -0,0 +1,93 @@
+(function(){
+  /**
+   * Infinite scroll for the forum channel pages.
+   * The "Older posts" link carries the feed API url and the next cursor;
+   * when it scrolls into view we fetch the next page as JSON and append
+   * cards to the grid. Without JS the link still works as plain pagination.
+   */
+
+  function buildCard(post) {
+    const card = document.createElement('div');
+    card.className = 'forum-card';
+
+    const body = document.createElement('div');
+    body.className = 'forum-card-body';
+
+    const title = document.createElement('h3');
+    title.className = 'form-card-title';
+    title.textContent = post.title;
+    body.appendChild(title);
+
+    const user = document.createElement('h5');
+    user.className = 'forum-card-user';
+    const author = document.createElement('a');
+    author.href = post.author_url;
+    author.textContent = post.author;
+    user.appendChild(author);
+    body.appendChild(user);
+
+    const view = document.createElement('a');
+    view.href = post.url + '?next=' + encodeURIComponent(window.location.pathname);
+    view.textContent = 'View';
+    body.appendChild(view);
+
+    const imageContainer = document.createElement('div');
+    imageContainer.className = 'forum-image-container';
+    if (post.image) {
+      const img = document.createElement('img');
+      img.src = post.image;
+      img.alt = 'Post image';
+      img.className = 'forum-img';
+      img.loading = 'lazy';
+      imageContainer.appendChild(img);
+    }
+
+    card.appendChild(body);
+    card.appendChild(imageContainer);
+    return card;
+  }
+
+  document.addEventListener('DOMContentLoaded', function() {
+    const more = document.querySelector('.load-more');
+    const grid = document.querySelector('.forum-grid');
+    if (!more || !grid || !('IntersectionObserver' in window)) {
+      return;
+    }
+
+    let loading = false;
+
+    function loadNext() {
+      const cursor = more.dataset.cursor;
+      if (loading || !cursor) {
+        return;
+      }
+      loading = true;
+      fetch(more.dataset.feedUrl + '?cursor=' + encodeURIComponent(cursor), {
+        headers: { 'Accept': 'application/json' },
+        credentials: 'same-origin'
+      })
+        .then(function(resp) { return resp.json(); })
+        .then(function(data) {
+          data.posts.forEach(function(post) {
+            grid.appendChild(buildCard(post));
+          });
+          if (data.next_cursor) {
+            more.dataset.cursor = data.next_cursor;
+            more.href = '?cursor=' + encodeURIComponent(data.next_cursor);
+          } else {
+            observer.disconnect();
+            more.remove();
+          }
+        })
+        .catch(function() { /* keep the plain link as a fallback */ })
+        .finally(function() { loading = false; });
+    }
+
+    const observer = new IntersectionObserver(function(entries) {
+      if (entries.some(function(e) { return e.isIntersecting; })) {
+        loadNext();
+      }
+    });
+    observer.observe(more);
+  });
+})();
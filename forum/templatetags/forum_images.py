@@ -0,0 +1,30 @@
+from django import template
+from django.utils.html import format_html
+
+from forum import images
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, variants=None, css_class='', sizes='100vw', alt='Post image'):
+    """Render ``image`` as a ``<picture>`` with WebP and JPEG ``srcset``s.
+
+    Falls back to a plain ``<img>`` of the original when no variants have
+    been built for it yet.
+    """
+    if not variants:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy">', image.url, alt, css_class)
+
+    storage = image.storage
+    jpeg = variants.get('jpeg') or {}
+    largest = max(jpeg, key=int)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy">'
+        '</picture>',
+        images.srcset(storage, variants.get('webp') or {}), sizes,
+        storage.url(jpeg[largest]), images.srcset(storage, jpeg), sizes, alt, css_class,
+    )
@@ -0,0 +1,495 @@
+import importlib
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from PIL import Image
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from social.models import Friendship
+from .models import Post, PostImage, PendingUpload, Comment
+from .views import get_viewable_posts, can_user_view_post, can_user_view_posts
+from . import threads, uploads, visibility
+
+
+User = get_user_model()
+
+
+def make_user(username, role='student'):
+    user = User.objects.create_user(username=username, password='pass')
+    user.profile.role = role
+    user.profile.save()
+    return user
+
+
+class PostVisibilityTests(TestCase):
+    def setUp(self):
+        self.cio = make_user('cio', role='cio')
+        self.alice = make_user('alice')
+        self.bob = make_user('bob')
+        self.carol = make_user('carol')
+
+    def viewable(self, user):
+        # a fresh user object, as each request gets, so no memoized sets
+        user = User.objects.get(pk=user.pk)
+        return set(get_viewable_posts(user, Post.objects.all()))
+
+    def assert_matches_detail_check(self, user):
+        user = User.objects.get(pk=user.pk)
+        expected = {p for p in Post.objects.all() if can_user_view_post(user, p)}
+        self.assertEqual(self.viewable(user), expected)
+
+    def test_friends_only_follows_friendships(self):
+        post = Post.objects.create(author=self.alice, privacy='friends_only')
+        self.assertNotIn(post, self.viewable(self.bob))
+
+        Friendship.make_friends(self.alice, self.bob)
+        self.assertIn(post, self.viewable(self.bob))
+        self.assertNotIn(post, self.viewable(self.carol))
+
+        Friendship.objects.filter(user=self.alice, friend=self.bob).delete()
+        self.assertNotIn(post, self.viewable(self.bob))
+
+    def test_cio_wide_shared_between_followers(self):
+        post = Post.objects.create(author=self.alice, privacy='cio_wide')
+        Friendship.make_friends(self.alice, self.cio)
+        self.assertNotIn(post, self.viewable(self.bob))
+
+        Friendship.make_friends(self.bob, self.cio)
+        self.assertIn(post, self.viewable(self.bob))
+
+        Friendship.objects.filter(user=self.bob, friend=self.cio).delete()
+        self.assertNotIn(post, self.viewable(self.bob))
+        for user in (self.alice, self.bob, self.carol, self.cio):
+            self.assert_matches_detail_check(user)
+
+    def test_role_change_updates_sets(self):
+        Friendship.make_friends(self.alice, self.bob)
+        Friendship.make_friends(self.carol, self.bob)
+        post = Post.objects.create(author=self.alice, privacy='cio_wide')
+        self.assertNotIn(post, self.viewable(self.carol))
+
+        self.bob.profile.role = 'cio'
+        self.bob.profile.save()
+        self.assertIn(post, self.viewable(self.carol))
+
+        self.bob.profile.role = 'student'
+        self.bob.profile.save()
+        self.assertNotIn(post, self.viewable(self.carol))
+
+    def test_rebuild_matches_incremental_updates(self):
+        Friendship.make_friends(self.alice, self.cio)
+        Friendship.make_friends(self.bob, self.cio)
+        Friendship.make_friends(self.bob, self.carol)
+        user_ids = [u.id for u in (self.cio, self.alice, self.bob, self.carol)]
+        incremental = set(visibility.VisibleAuthor.objects.values_list(
+            'viewer_id', 'author_id', 'privacy'))
+        self.assertEqual(incremental, visibility.compute_visibility(user_ids))
+
+    def test_migration_backfill_matches_incremental_updates(self):
+        Friendship.make_friends(self.alice, self.cio)
+        Friendship.make_friends(self.bob, self.cio)
+        Friendship.make_friends(self.bob, self.carol)
+        incremental = set(visibility.VisibleAuthor.objects.values_list(
+            'viewer_id', 'author_id', 'privacy'))
+        visibility.VisibleAuthor.objects.all().delete()
+
+        migration = importlib.import_module('forum.migrations.0020_backfill_visibleauthor')
+        migration.backfill_visible_authors(django_apps, None)
+        self.assertEqual(set(visibility.VisibleAuthor.objects.values_list(
+            'viewer_id', 'author_id', 'privacy')), incremental)
+
+    def test_deleting_user_clears_their_visibility(self):
+        Friendship.make_friends(self.alice, self.bob)
+        Friendship.make_friends(self.alice, self.cio)
+        alice_id = self.alice.id
+        self.alice.delete()
+        self.assertFalse(visibility.VisibleAuthor.objects.filter(author_id=alice_id).exists())
+
+    def test_filter_is_a_subquery_not_an_id_list(self):
+        for i in range(3):
+            Friendship.make_friends(make_user(f'friend{i}'), self.bob)
+        viewer = User.objects.get(pk=self.bob.pk)
+        with self.assertNumQueries(0):
+            qs = get_viewable_posts(viewer, Post.objects.all())
+        sql, params = qs.query.sql_with_params()
+        self.assertIn('forum_visibleauthor', sql)
+        # same parameters whether the viewer can see three authors or none
+        lonely = get_viewable_posts(User.objects.get(pk=self.carol.pk), Post.objects.all())
+        self.assertEqual(len(params), len(lonely.query.sql_with_params()[1]))
+
+    def test_batched_check_uses_one_query(self):
+        Friendship.make_friends(self.alice, self.bob)
+        Friendship.make_friends(self.carol, self.cio)
+        posts = [
+            Post.objects.create(author=self.alice, privacy='friends_only'),
+            Post.objects.create(author=self.carol, privacy='friends_only'),
+            Post.objects.create(author=self.cio, privacy='cio_wide'),
+            Post.objects.create(author=self.carol, privacy='public'),
+        ]
+        viewer = User.objects.get(pk=self.bob.pk)
+        with self.assertNumQueries(1):
+            mask = can_user_view_posts(viewer, posts)
+        self.assertEqual(mask, [True, False, False, True])
+        self.assertEqual(mask, [can_user_view_post(viewer, p) for p in posts])
+
+    def test_checks_are_memoized_for_the_request(self):
+        Friendship.make_friends(self.alice, self.bob)
+        post = Post.objects.create(author=self.alice, privacy='friends_only')
+        other = Post.objects.create(author=self.carol, privacy='friends_only')
+        viewer = User.objects.get(pk=self.bob.pk)
+        self.assertTrue(can_user_view_post(viewer, post))
+
+        # only the author not checked yet is looked up
+        with self.assertNumQueries(1):
+            self.assertEqual(can_user_view_posts(viewer, [post, other]), [True, False])
+        with self.assertNumQueries(0):
+            self.assertEqual(can_user_view_posts(viewer, [other, post]), [False, True])
+
+
+@override_settings(STORAGES={
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+class ChannelFeedTests(TestCase):
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.posts = [
+            Post.objects.create(author=self.alice, title=f'Post {i}', tag='food')
+            for i in range(5)
+        ]
+        # newest first, ties on created_at broken by id
+        self.posts.sort(key=lambda p: (p.created_at, p.id), reverse=True)
+
+    def test_cursor_walks_every_post_once(self):
+        url = reverse('forum:channel_feed_api', args=['food'])
+        seen, cursor = [], ''
+        while True:
+            data = self.client.get(url, {'page_size': 2, 'cursor': cursor}).json()
+            seen.extend(p['id'] for p in data['posts'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, [p.id for p in self.posts])
+
+    def test_channel_page_links_to_next_page(self):
+        with self.settings(FORUM_FEED_PAGE_SIZE=3):
+            resp = self.client.get(reverse('forum:food_list'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(list(resp.context['posts']), self.posts[:3])
+        self.assertContains(resp, 'class="load-more"')
+
+        resp = self.client.get(reverse('forum:food_list'), {
+            'cursor': resp.context['next_cursor'], 'page_size': 3})
+        self.assertEqual(list(resp.context['posts']), self.posts[3:])
+        self.assertIsNone(resp.context['next_cursor'])
+
+    def test_channel_pages_stay_within_query_budget(self):
+        # session, user, visibility sets, posts, preview images,
+        # sidebar profile/picture lookups (the unread badge is cached)
+        budget = 10
+        bob = make_user('bob')
+        Friendship.make_friends(self.alice, bob)
+        self.client.login(username='bob', password='pass')
+
+        def count_queries(url_name):
+            with CaptureQueriesContext(connection) as ctx:
+                resp = self.client.get(reverse(url_name), {'page_size': 50})
+            self.assertEqual(resp.status_code, 200)
+            return len(ctx)
+
+        count_queries('forum:food_list')  # warm the unread-notification count
+        few = count_queries('forum:food_list')
+        for i in range(40):
+            post = Post.objects.create(
+                author=self.alice, title=f'Busy {i}', tag='food',
+                privacy='friends_only' if i % 2 else 'public')
+            for name in (f'forum/{self.alice.id}/a{i}.jpg', f'forum/{self.alice.id}/b{i}.jpg'):
+                variants = {'jpeg': {'320': name}, 'webp': {'320': name}}
+                PostImage.objects.create(post=post, image=name, variants=variants)
+        many = count_queries('forum:food_list')
+
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, budget)
+        for url_name in ('forum:post_list', 'forum:leaderboard_list', 'forum:cio_list'):
+            self.assertLessEqual(count_queries(url_name), budget)
+
+    def test_unknown_channel_is_404(self):
+        resp = self.client.get(reverse('forum:channel_feed_api', args=['nope']))
+        self.assertEqual(resp.status_code, 404)
+
+
+@override_settings(STORAGES={
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.post = Post.objects.create(author=self.alice, title='Thread')
+
+    def add_comments(self, count):
+        parent = None
+        for i in range(count):
+            # alternate between replying to the last comment and starting a new thread
+            parent = Comment.objects.create(
+                post=self.post, author=self.alice, content=f'c{i}',
+                parent=parent if i % 5 else None)
+
+    def count_detail_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(reverse('forum:post_detail', args=[self.post.pk]))
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx)
+
+    def test_depth_is_stored_on_create(self):
+        root = Comment.objects.create(post=self.post, author=self.alice, content='a')
+        reply = Comment.objects.create(post=self.post, author=self.alice, content='b', parent=root)
+        nested = Comment.objects.create(post=self.post, author=self.alice, content='c', parent=reply)
+        self.assertEqual([root.level, reply.level, nested.level], [0, 1, 2])
+
+    def test_thread_renders_in_bounded_queries(self):
+        self.add_comments(5)
+        few = self.count_detail_queries()
+        self.add_comments(60)
+        self.assertEqual(self.count_detail_queries(), few)
+
+    def test_top_level_comments_are_paginated(self):
+        for i in range(5):
+            Comment.objects.create(post=self.post, author=self.alice, content=f'top {i}')
+        url = reverse('forum:post_detail', args=[self.post.pk])
+        with self.settings(FORUM_COMMENTS_PAGE_SIZE=2):
+            resp = self.client.get(url, {'page': 3})
+        self.assertEqual([c.content for c in resp.context['comments']], ['top 4'])
+        self.assertEqual(resp.context['comments_page'].paginator.num_pages, 3)
+
+    def test_hidden_replies_load_on_demand(self):
+        root = Comment.objects.create(post=self.post, author=self.alice, content='root')
+        for i in range(15):
+            Comment.objects.create(post=self.post, author=self.alice, content=f'reply {i:02}', parent=root)
+
+        resp = self.client.get(reverse('forum:post_detail', args=[self.post.pk]))
+        self.assertContains(resp, 'reply 02')
+        self.assertNotContains(resp, 'reply 03')
+        self.assertContains(resp, 'Load 12 more replies')
+
+        url = reverse('forum:comment_replies', args=[root.pk])
+        resp = self.client.get(url, {'offset': 3})
+        self.assertContains(resp, 'reply 03')
+        self.assertContains(resp, 'reply 12')
+        self.assertNotContains(resp, 'reply 13')
+        self.assertContains(resp, 'Load 2 more replies')
+
+        resp = self.client.get(url, {'offset': 13})
+        self.assertContains(resp, 'reply 14')
+        self.assertNotContains(resp, 'more repl')
+
+    def test_only_rendered_replies_are_fetched(self):
+        root = Comment.objects.create(post=self.post, author=self.alice, content='root')
+        for i in range(30):
+            reply = Comment.objects.create(post=self.post, author=self.alice, content=f'r{i}', parent=root)
+            Comment.objects.create(post=self.post, author=self.alice, content=f'rr{i}', parent=reply)
+        deep = root
+        for i in range(threads.INLINE_DEPTH + 2):
+            deep = Comment.objects.create(post=self.post, author=self.alice, content=f'd{i}', parent=deep)
+
+        with CaptureQueriesContext(connection) as ctx:
+            root = threads.load_page(self.post, 1).object_list[0]
+        # page count + rows, one query per inline level, one for the deepest counts
+        self.assertLessEqual(len(ctx.captured_queries), 2 + threads.INLINE_DEPTH + 1)
+
+        self.assertEqual([c.content for c in root.shown_children], ['r0', 'r1', 'r2'])
+        self.assertEqual(root.hidden_replies, 28)
+        self.assertEqual([c.content for c in root.shown_children[0].shown_children], ['rr0'])
+
+        replies, remaining = threads.load_replies(root, offset=29)
+        self.assertEqual([c.content for c in replies], ['r29', 'd0'])
+        self.assertEqual(remaining, 0)
+        # d1, d2 and d3 are shown below d0; d4 is counted, not fetched
+        d3 = replies[1].shown_children[0].shown_children[0].shown_children[0]
+        self.assertEqual((d3.content, d3.shown_children, d3.hidden_replies), ('d3', [], 1))
+
+    def test_replies_respect_post_privacy(self):
+        self.post.privacy = 'friends_only'
+        self.post.save()
+        root = Comment.objects.create(post=self.post, author=self.alice, content='root')
+        resp = self.client.get(reverse('forum:comment_replies', args=[root.pk]))
+        self.assertEqual(resp.status_code, 403)
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, STORAGES={
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+class ImageVariantTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.post = Post.objects.create(author=self.alice, title='Photo', tag='food')
+
+    def upload(self, size=(2000, 1500)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'green').save(buffer, 'JPEG')
+        return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_upload_builds_resized_variants(self):
+        post_image = PostImage.objects.create(post=self.post, image=self.upload())
+        post_image.refresh_from_db()
+
+        self.assertEqual(sorted(post_image.variants), ['jpeg', 'webp'])
+        self.assertEqual(sorted(post_image.variants['webp'], key=int), ['320', '640', '1280'])
+        storage = post_image.image.storage
+        with storage.open(post_image.variants['jpeg']['320']) as fh:
+            self.assertEqual(Image.open(fh).size, (320, 240))
+
+        resp = self.client.get(reverse('forum:food_list'))
+        self.assertContains(resp, 'type="image/webp"')
+        self.assertContains(resp, storage.url(post_image.variants['webp']['640']) + ' 640w')
+
+        paths = [name for names in post_image.variants.values() for name in names.values()]
+        post_image.delete()
+        self.assertFalse(any(storage.exists(name) for name in paths))
+
+    def test_small_images_get_a_single_variant(self):
+        post_image = PostImage.objects.create(post=self.post, image=self.upload((200, 100)))
+        self.assertEqual(post_image.variants['jpeg'].keys(), {'200'})
+
+    def test_command_backfills_missing_variants(self):
+        post_image = PostImage.objects.create(post=self.post, image=self.upload())
+        PostImage.objects.filter(pk=post_image.pk).update(variants={})
+        call_command('build_image_variants', stdout=StringIO())
+        post_image.refresh_from_db()
+        self.assertIn('1280', post_image.variants['jpeg'])
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    UPLOAD_SPOOL_DIR=tempfile.mkdtemp(),
+    BACKGROUND_TASKS={'BACKEND': 'main.tasks.ImmediateBackend'},
+    STORAGES={
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+    },
+)
+class BackgroundUploadTests(TestCase):
+    def setUp(self):
+        self.alice = make_user('alice')
+        self.client.login(username='alice', password='pass')
+
+    def upload(self, name):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), 'blue').save(buffer, 'JPEG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+    def test_post_images_are_stored_by_the_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(reverse('forum:post_create'), {
+                'title': 'Gallery', 'caption': '', 'tag': 'general', 'privacy': 'public',
+                'images': [self.upload('one.jpg'), self.upload('two.jpg')],
+            })
+        post = Post.objects.get(title='Gallery')
+        self.assertRedirects(resp, reverse('forum:post_detail', args=[post.pk]), fetch_redirect_response=False)
+
+        self.assertFalse(post.is_processing)
+        self.assertEqual(
+            [img.image.name.rsplit('/', 1)[-1][:3] for img in post.images.all()], ['one', 'two'])
+        self.assertEqual(os.listdir(settings.UPLOAD_SPOOL_DIR), [])
+
+    def test_post_is_processing_until_uploads_finish(self):
+        post = Post.objects.create(author=self.alice, title='Pending')
+        with self.settings(BACKGROUND_TASKS={'BACKEND': 'forum.tests.HoldingBackend'}):
+            with self.captureOnCommitCallbacks(execute=True):
+                uploads.queue_post_images(post, [self.upload('a.jpg')])
+        self.assertTrue(post.is_processing)
+        resp = self.client.get(reverse('forum:post_detail', args=[post.pk]))
+        self.assertContains(resp, 'still uploading')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for func, args in HoldingBackend.queued:
+                func(*args)
+        post.refresh_from_db()
+        self.assertFalse(post.is_processing)
+        self.assertEqual(post.images.count(), 1)
+
+    def queue_and_lose(self, post, *names):
+        # queued on a backend that never runs anything, like a restarted worker
+        with self.settings(BACKGROUND_TASKS={'BACKEND': 'forum.tests.HoldingBackend'}):
+            with self.captureOnCommitCallbacks(execute=True):
+                uploads.queue_post_images(post, [self.upload(name) for name in names])
+        HoldingBackend.queued.clear()
+
+    def test_resume_requeues_uploads_lost_on_restart(self):
+        post = Post.objects.create(author=self.alice, title='Lost')
+        self.queue_and_lose(post, 'a.jpg', 'b.jpg')
+        Post.objects.filter(pk=post.pk).update(pending_uploads=7)
+        orphan = os.path.join(uploads.spool_dir(), 'orphan.jpg')
+        open(orphan, 'wb').close()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('resume_post_uploads', older_than=0, stdout=StringIO())
+
+        post.refresh_from_db()
+        self.assertFalse(post.is_processing)
+        self.assertEqual(post.images.count(), 2)
+        self.assertFalse(PendingUpload.objects.exists())
+        self.assertEqual(os.listdir(settings.UPLOAD_SPOOL_DIR), [])
+
+    def test_upload_queued_twice_is_stored_once(self):
+        post = Post.objects.create(author=self.alice, title='Twice')
+        self.queue_and_lose(post, 'a.jpg')
+        upload = PendingUpload.objects.get(post=post)
+
+        PendingUpload.objects.filter(pk=upload.pk).update(started_at=timezone.now())
+        uploads.store_post_image(upload.pk)
+        self.assertEqual(post.images.count(), 0)
+
+        PendingUpload.objects.filter(pk=upload.pk).update(started_at=None)
+        with self.captureOnCommitCallbacks(execute=True):
+            uploads.store_post_image(upload.pk)
+            uploads.store_post_image(upload.pk)
+        self.assertEqual(post.images.count(), 1)
+
+    def test_missing_spool_file_does_not_leave_post_processing(self):
+        post = Post.objects.create(author=self.alice, title='Gone')
+        self.queue_and_lose(post, 'a.jpg')
+        upload = PendingUpload.objects.get(post=post)
+        os.remove(upload.path)
+
+        uploads.store_post_image(upload.pk)
+        post.refresh_from_db()
+        self.assertFalse(post.is_processing)
+        self.assertFalse(PendingUpload.objects.exists())
+
+    def test_deleting_post_removes_its_spooled_files(self):
+        post = Post.objects.create(author=self.alice, title='Deleted')
+        self.queue_and_lose(post, 'a.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertEqual(os.listdir(settings.UPLOAD_SPOOL_DIR), [])
+
+
+class HoldingBackend:
+    """Task backend that only records what was queued."""
+    queued = []
+
+    def __init__(self, **options):
+        pass
+
+    def enqueue(self, func, *args):
+        self.queued.append((func, args))
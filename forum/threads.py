@@ -0,0 +1,118 @@
+"""Load comment threads in bulk, fetching only what is rendered.
+
+Top-level comments are paginated. Only a preview of each thread is
+rendered inline: the first ``REPLY_PREVIEW`` replies of each comment, down
+to ``INLINE_DEPTH`` levels. The replies are fetched one level at a time,
+and each level is one query. A ``ROW_NUMBER()`` window over ``parent_id``
+keeps the first few replies of every parent. A ``COUNT()`` window over the
+same partition tells how many stay hidden. So a page costs a fixed number
+of queries, and its rows are bounded by the preview size rather than by
+the size of the threads. The rest is served on demand by the
+``forum:comment_replies`` endpoint as HTML fragments, one LIMIT/OFFSET
+page of direct replies at a time.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Comment
+
+DEFAULT_PAGE_SIZE = 20
+
+# direct replies rendered under a comment before a "load more" button
+REPLY_PREVIEW = 3
+# replies returned per "load more" request
+REPLY_PAGE_SIZE = 10
+# levels of replies rendered below the comments of a page or fragment
+INLINE_DEPTH = 3
+
+
+def _comments():
+    return Comment.objects.select_related('author__profile').order_by('created_at', 'id')
+
+
+def _show_replies(parents):
+    """Attach each parent's first ``REPLY_PREVIEW`` replies; return them all.
+
+    Sets ``shown_children`` and ``hidden_replies`` on every parent, in one query.
+    """
+    by_id = {p.id: p for p in parents}
+    for parent in parents:
+        parent.shown_children = []
+        parent.hidden_replies = 0
+    if not by_id:
+        return []
+
+    replies = list(
+        _comments()
+        .filter(parent_id__in=by_id)
+        .annotate(
+            position=Window(RowNumber(), partition_by=F('parent_id'), order_by=(F('created_at').asc(), F('id').asc())),
+            siblings=Window(Count('id'), partition_by=F('parent_id')),
+        )
+        .filter(position__lte=REPLY_PREVIEW)
+    )
+    for reply in replies:
+        parent = by_id[reply.parent_id]
+        parent.shown_children.append(reply)
+        parent.hidden_replies = reply.siblings - len(parent.shown_children)
+    return replies
+
+
+def _count_replies(comments):
+    """Mark every reply of ``comments`` as hidden, counting them in one query."""
+    by_id = {c.id: c for c in comments}
+    for comment in comments:
+        comment.shown_children = []
+        comment.hidden_replies = 0
+    if not by_id:
+        return
+    counts = (
+        Comment.objects.filter(parent_id__in=by_id)
+        .values('parent_id')
+        .annotate(n=Count('id'))
+        .values_list('parent_id', 'n')
+    )
+    for parent_id, n in counts:
+        by_id[parent_id].hidden_replies = n
+
+
+def _load_previews(comments, levels=INLINE_DEPTH):
+    """Fill in the replies rendered inline below ``comments``."""
+    for _ in range(levels):
+        comments = _show_replies(comments)
+    _count_replies(comments)
+
+
+def load_page(post, page_number):
+    """Return a page of ``post``'s top-level comments with their reply previews.
+
+    Two queries for the page (count + rows), one per inline level and one
+    for the hidden counts under the deepest level. No query's rows depend
+    on the size of the threads.
+    """
+    size = getattr(settings, 'FORUM_COMMENTS_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    page = Paginator(_comments().filter(post=post, parent__isnull=True), size).get_page(page_number)
+
+    roots = list(page.object_list)
+    _load_previews(roots)
+    page.object_list = roots
+    return page
+
+
+def load_replies(comment, offset=0):
+    """Return ``(replies, remaining)`` for the direct replies of ``comment``.
+
+    ``replies`` are the next ``REPLY_PAGE_SIZE`` replies after ``offset``,
+    each with its reply preview; ``remaining`` counts the ones still hidden.
+    """
+    replies = list(
+        _comments()
+        .filter(parent=comment)
+        .annotate(siblings=Window(Count('id')))[offset:offset + REPLY_PAGE_SIZE]
+    )
+    total = replies[0].siblings if replies else 0
+    _load_previews(replies)
+    remaining = max(total - offset - len(replies), 0)
+    return replies, remaining
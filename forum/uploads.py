@@ -0,0 +1,122 @@
+"""Background storage uploads for multi-image posts.
+
+``post_create`` used to push every image to S3 inside the request. Instead
+the uploaded files are spooled to local disk, each gets a ``PendingUpload``
+row, and once the post commits one task per image is queued on
+``main.tasks``; the workers push them to storage concurrently (building
+their resized variants on the way, see ``forum.images``). The post counts
+its outstanding rows in ``Post.pending_uploads`` and shows as processing
+until that drops to zero.
+
+The task queue lives in memory, so a restart loses whatever it held; the
+rows do not. ``manage.py resume_post_uploads``, run at startup where
+``UPLOAD_SPOOL_DIR`` lives (it must be shared if several machines take
+uploads), re-queues them, recounts ``pending_uploads`` and removes spooled
+files nothing refers to; a row whose file has vanished is dropped. A worker claims its row before storing the file, so a
+row queued twice is stored once; a file that fails ``MAX_ATTEMPTS`` times
+is left in the spool, with its row, for someone to look at.
+"""
+import logging
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from main import tasks
+from .models import PendingUpload, Post, PostImage
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+# a worker that has held a row this long is presumed dead
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def spool_dir():
+    path = getattr(settings, 'UPLOAD_SPOOL_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'forum-upload-spool')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def spool(uploaded_file):
+    """Copy an uploaded file into the spool directory and return its path."""
+    ext = os.path.splitext(uploaded_file.name)[1]
+    path = os.path.join(spool_dir(), f'{uuid.uuid4().hex}{ext}')
+    with open(path, 'wb') as out:
+        for chunk in uploaded_file.chunks():
+            out.write(chunk)
+    return path
+
+
+def retryable():
+    """Rows a worker may (re)claim: not given up on, and not claimed recently."""
+    return PendingUpload.objects.filter(attempts__lt=MAX_ATTEMPTS).filter(
+        Q(started_at__isnull=True) | Q(started_at__lt=timezone.now() - CLAIM_TIMEOUT))
+
+
+def recount_pending(post_ids):
+    """Set ``pending_uploads`` of ``post_ids`` from their outstanding rows."""
+    counts = dict(
+        PendingUpload.objects.filter(post_id__in=post_ids, attempts__lt=MAX_ATTEMPTS).order_by()
+        .values_list('post_id').annotate(n=Count('id'))
+    )
+    for post_id in post_ids:
+        Post.objects.filter(pk=post_id).update(pending_uploads=counts.get(post_id, 0))
+
+
+def enqueue_on_commit(upload_ids):
+    def enqueue():
+        for upload_id in upload_ids:
+            tasks.enqueue(store_post_image, upload_id)
+    transaction.on_commit(enqueue)
+
+
+def queue_post_images(post, uploaded_files):
+    """Spool ``uploaded_files`` and queue their upload as images of ``post``."""
+    spooled = [(spool(f), f.name) for f in uploaded_files]
+    if not spooled:
+        return
+    with transaction.atomic():
+        upload_ids = [
+            PendingUpload.objects.create(post=post, path=path, name=name, position=position).pk
+            for position, (path, name) in enumerate(spooled)
+        ]
+        Post.objects.filter(pk=post.pk).update(pending_uploads=F('pending_uploads') + len(spooled))
+        enqueue_on_commit(upload_ids)
+    post.refresh_from_db(fields=['pending_uploads'])
+    logger.info(f"Queued {len(spooled)} images for post {post.pk}")
+
+
+def store_post_image(upload_id):
+    """Task: move the file of ``PendingUpload`` ``upload_id`` into storage.
+
+    Does nothing if the row is gone, given up on or claimed by another
+    worker. On failure the row is released for ``resume_post_uploads``.
+    """
+    claimed = retryable().filter(pk=upload_id).update(
+        started_at=timezone.now(), attempts=F('attempts') + 1)
+    if not claimed:
+        return
+    upload = PendingUpload.objects.select_related('post__author').get(pk=upload_id)
+    try:
+        with transaction.atomic():
+            with open(upload.path, 'rb') as fh:
+                PostImage.objects.create(post=upload.post, image=File(fh, name=upload.name), position=upload.position)
+            upload.delete()
+        logger.info(f"Stored spooled image {upload.name} for post {upload.post_id}")
+    except FileNotFoundError:
+        logger.error(f"Spooled image {upload.path} for post {upload.post_id} is missing; dropping it")
+        upload.delete()
+    except Exception as e:
+        logger.error(f"Failed to store spooled image {upload.path} for post {upload.post_id} "
+                     f"(attempt {upload.attempts}): {str(e)}", exc_info=True)
+        PendingUpload.objects.filter(pk=upload_id).update(started_at=None)
+    finally:
+        recount_pending([upload.post_id])
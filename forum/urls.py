@@ -8,11 +8,13 @@ urlpatterns = [
     path('food/', views.food_list, name='food_list'),
     path('leaderboard/', views.leaderboard_list, name='leaderboard_list'),
     path('cio/', views.cio_list, name='cio_list'),
+    path('api/feed/<str:tag>/', views.channel_feed_api, name='channel_feed_api'),
     path('post/<int:pk>/', views.post_detail, name='post_detail'),
     path('post/new/', views.post_create, name='post_create'),
     path('post/<int:pk>/delete/', views.post_delete, name='post_delete'),
     path('post/<int:pk>/update-privacy/', views.post_update_privacy, name='post_update_privacy'),
     path('comment/<int:pk>/delete/', views.comment_delete, name='comment_delete'),
+    path('comment/<int:pk>/replies/', views.comment_replies, name='comment_replies'),
 
     # Moderation endpoints
     path('post/<int:pk>/flag-inappropriate/',
@@ -1,12 +1,13 @@
 
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseForbidden, JsonResponse, Http404
 from django.db.models import Q
+from django.urls import reverse
 from .models import Post, Comment
 from .forms import PostForm, CommentForm
-from social.models import Friendship
-from users.models import Profile
+from . import feeds, images, threads, uploads, visibility
+from users.templatetags.display_name import get_display_name
 import logging
 
 logger = logging.getLogger(__name__)
@@ -31,72 +32,25 @@ def can_user_view_post(user, post):
     - 'cio_wide': Only users in the same CIO(s) as the post author can view
     - 'friends_only': Only direct friends of the post author can view
     - Post author can always view their own post
-    """
-    # Post author can always view their own post
-    if user == post.author:
-        return True
-
-    # Public posts are viewable by everyone
-    if post.privacy == 'public':
-        return True
-
-    # Anonymous users can only see public posts
-    if not user.is_authenticated:
-        return False
-
-    # Friends only: check if user is a friend of the author
-    if post.privacy == 'friends_only':
-        return Friendship.objects.filter(
-            user=post.author,
-            friend=user
-        ).exists()
-
-    # CIO-wide: check if user is in any of the same CIOs as the author
-    if post.privacy == 'cio_wide':
-        # Get the author's CIO (assuming a user can be a CIO or follow CIOs)
-        try:
-            author_profile = post.author.profile
-            viewer_profile = user.profile
-
-            # Check if the author is a CIO
-            if author_profile.role == 'cio':
-                # Check if the viewer is a friend of this CIO
-                return Friendship.objects.filter(
-                    user=post.author,
-                    friend=user
-                ).exists()
-
-            # Check if viewer and author are both followers of the same CIO
-            # Get CIOs that the viewer follows
-            viewer_cio_friends = Friendship.objects.filter(
-                user=viewer_profile.user
-            ).values_list('friend__profile__user_id', flat=True).filter(
-                friend__profile__role='cio'
-            )
 
-            # Get CIOs that the author follows
-            author_cio_friends = Friendship.objects.filter(
-                user=author_profile.user
-            ).values_list('friend__profile__user_id', flat=True).filter(
-                friend__profile__role='cio'
-            )
+    To check many posts at once use ``can_user_view_posts``.
+    """
+    return visibility.can_view_posts(user, [post])[0]
 
-            # Check if there's any overlap
-            return bool(set(viewer_cio_friends) & set(author_cio_friends))
-        except Profile.DoesNotExist:
-            return False
 
-    return False
+def can_user_view_posts(user, posts):
+    """Batched ``can_user_view_post``: one boolean per post, in at most one query."""
+    return visibility.can_view_posts(user, posts)
 
 
 def get_viewable_posts(user, posts_queryset):
     """
     Filter a queryset of posts to only include those the user can view.
 
-    For efficiency with larger datasets, this approach:
-    1. Always includes posts by the user themselves
-    2. Always includes public posts
-    3. For authenticated users, checks privacy individually
+    Restricted posts are matched against the viewer's precomputed visibility
+    sets (see ``forum.visibility``) with ``author_id IN (SELECT ...)``
+    subqueries, so there are no joins, no DISTINCT and no id lists whose
+    size grows with the viewer's network.
     """
     if not user.is_authenticated:
         # Anonymous users can only see public posts
@@ -104,26 +58,12 @@ def get_viewable_posts(user, posts_queryset):
 
     # Include: author's own posts, all public posts, friends-only from their friends,
     # and cio-wide from users in same CIOs
-    try:
-        user_profile = user.profile
-        user_cio_friends = Friendship.objects.filter(
-            user=user
-        ).values_list('friend__profile__user_id', flat=True).filter(
-            friend__profile__role='cio'
-        )
-
-        # Posts authored by the user, all public posts, or posts from friends
-        return posts_queryset.filter(
-            Q(author=user) |  # User's own posts
-            Q(privacy='public') |  # Public posts
-            # Friends' posts
-            Q(privacy='friends_only', author__friendships__friend=user) |
-            # CIO-wide posts from same CIOs
-            Q(privacy='cio_wide', author__friendships__friend__in=user_cio_friends)
-        ).distinct()
-    except Profile.DoesNotExist:
-        # If user has no profile, only show public posts
-        return posts_queryset.filter(privacy='public')
+    return posts_queryset.filter(
+        Q(author=user) |  # User's own posts
+        Q(privacy='public') |  # Public posts
+        Q(privacy='friends_only', author_id__in=visibility.visible_authors(user, visibility.FRIENDS_ONLY)) |
+        Q(privacy='cio_wide', author_id__in=visibility.visible_authors(user, visibility.CIO_WIDE))
+    )
 
 
 @login_required
@@ -169,13 +109,14 @@ def post_update_privacy(request, pk):
 
 
 def post_detail(request, pk):
-    post = get_object_or_404(Post, pk=pk)
+    post = get_object_or_404(
+        Post.objects.select_related('author__profile').prefetch_related('images'), pk=pk)
 
     # Check if user can view this post
     if not can_user_view_post(request.user, post):
         return HttpResponseForbidden("You do not have permission to view this post.")
 
-    comments = post.comments.filter(parent__isnull=True)
+    comments_page = threads.load_page(post, request.GET.get('page'))
 
     if request.method == "POST":
         # Check if user is suspended
@@ -204,7 +145,36 @@ def post_detail(request, pk):
     else:
         form = CommentForm()
 
-    return render(request, 'forum/post_detail.html', {'post': post, 'comments': comments, 'form': form, 'is_moderator': is_moderator(request.user)})
+    return render(request, 'forum/post_detail.html', {
+        'post': post,
+        'comments': comments_page.object_list,
+        'comments_page': comments_page,
+        'form': form,
+        'is_moderator': is_moderator(request.user),
+    })
+
+
+def comment_replies(request, pk):
+    """HTML fragment with the next batch of replies to a comment ("load more replies")."""
+    comment = get_object_or_404(Comment.objects.select_related('post'), pk=pk)
+
+    if not can_user_view_post(request.user, comment.post):
+        return HttpResponseForbidden("You do not have permission to view this post.")
+
+    try:
+        offset = max(int(request.GET.get('offset', 0)), 0)
+    except ValueError:
+        offset = 0
+
+    replies, remaining = threads.load_replies(comment, offset)
+    return render(request, 'forum/comment_replies.html', {
+        'parent': comment,
+        'replies': replies,
+        'remaining': remaining,
+        'next_offset': offset + len(replies),
+        'form': CommentForm(),
+        'is_moderator': is_moderator(request.user),
+    })
 
 
 @login_required
@@ -236,13 +206,8 @@ def post_create(request):
             post.save()
             logger.info(f"Post saved successfully with ID {post.pk}")
             
-            # Handle multiple images
-            images = request.FILES.getlist('images')
-            if images:
-                from .models import PostImage
-                for image in images:
-                    PostImage.objects.create(post=post, image=image)
-                logger.info(f"Saved {len(images)} images for post {post.pk}")
+            # Handle multiple images: spooled here, pushed to storage in the background
+            uploads.queue_post_images(post, request.FILES.getlist('images'))
 
             return redirect('forum:post_detail', pk=post.pk)
         else:
@@ -252,28 +217,64 @@ def post_create(request):
     return render(request, 'forum/post_create.html', {'form': form})
 
 
+def _channel_page(request, tag):
+    posts = get_viewable_posts(request.user, Post.objects.filter(tag=tag))
+    posts = feeds.prefetch_for_cards(posts)
+    return feeds.paginate(posts, request.GET.get('cursor'), feeds.page_size(request))
+
+
+def _render_channel(request, tag, template_name):
+    posts, next_cursor = _channel_page(request, tag)
+    return render(request, template_name, {
+        'posts': posts,
+        'tag': tag,
+        'next_cursor': next_cursor,
+    })
+
+
 def post_list(request):
-    posts = Post.objects.filter(tag='general').order_by('-created_at')
-    posts = get_viewable_posts(request.user, posts)
-    return render(request, 'forum/post_list.html', {'posts': posts})
+    return _render_channel(request, 'general', 'forum/post_list.html')
 
 
 def food_list(request):
-    posts = Post.objects.filter(tag='food').order_by('-created_at')
-    posts = get_viewable_posts(request.user, posts)
-    return render(request, 'forum/food_list.html', {'posts': posts})
+    return _render_channel(request, 'food', 'forum/food_list.html')
 
 
 def leaderboard_list(request):
-    posts = Post.objects.filter(tag='leaderboard').order_by('-created_at')
-    posts = get_viewable_posts(request.user, posts)
-    return render(request, 'forum/leaderboard_list.html', {'posts': posts})
+    return _render_channel(request, 'leaderboard', 'forum/leaderboard_list.html')
 
 
 def cio_list(request):
-    posts = Post.objects.filter(tag='cio_leaders').order_by('-created_at')
-    posts = get_viewable_posts(request.user, posts)
-    return render(request, 'forum/cio_list.html', {'posts': posts})
+    return _render_channel(request, 'cio_leaders', 'forum/cio_list.html')
+
+
+def channel_feed_api(request, tag):
+    """JSON page of a channel feed, used for infinite scroll."""
+    if tag not in dict(Post.TAG_CHOICES):
+        raise Http404("Unknown channel.")
+
+    posts, next_cursor = _channel_page(request, tag)
+
+    data = []
+    for post in posts:
+        if post.preview_images:
+            preview = post.preview_images[0]
+            image_url = images.variant_url(preview.image, preview.variants, 640)
+        elif post.image:
+            image_url = images.variant_url(post.image, post.image_variants, 640)
+        else:
+            image_url = None
+        data.append({
+            "id": post.id,
+            "title": post.title,
+            "author": get_display_name(post.author),
+            "author_url": reverse('users:profile', kwargs={'username': post.author.username}),
+            "url": reverse('forum:post_detail', args=[post.pk]),
+            "image": image_url,
+            "created_at": post.created_at.isoformat(),
+        })
+
+    return JsonResponse({"posts": data, "next_cursor": next_cursor})
 
 
 @login_required
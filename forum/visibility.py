@@ -0,0 +1,199 @@
+"""Per-viewer visibility sets for restricted forum posts.
+
+For every user we keep the ids of the authors whose ``friends_only`` and
+``cio_wide`` posts that user may see (see ``VisibleAuthor``). The rules are:
+
+- friends_only: the author has a friendship row pointing at the viewer
+- cio_wide: the author is a CIO friend of the viewer, or the author is not a
+  CIO and follows at least one CIO the viewer also follows
+
+The sets are updated incrementally from friendship and profile-role changes
+(wired up in ``forum.signals``) so the channel views can filter with an
+``author_id IN (SELECT ...)`` subquery on the viewer's rows instead of
+joining through ``Friendship``, and ``can_view_posts`` can check any number
+of posts in a single query.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from social.models import Friendship
+from users.models import Profile
+from .models import VisibleAuthor
+
+FRIENDS_ONLY = 'friends_only'
+CIO_WIDE = 'cio_wide'
+
+# Keep IN (...) lists below SQLite's bound-parameter limit.
+CHUNK_SIZE = 500
+
+# Attribute used to memoize checked authors on the (per-request) user object.
+CACHE_ATTR = '_visible_author_privacies'
+
+
+def _chunks(ids):
+    ids = list(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def _is_cio(user_id):
+    return Profile.objects.filter(user_id=user_id, role='cio').exists()
+
+
+def _write(rows):
+    VisibleAuthor.objects.bulk_create(
+        [VisibleAuthor(viewer_id=v, author_id=a, privacy=p) for v, a, p in rows if v != a],
+        batch_size=CHUNK_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def visible_authors(user, privacy):
+    """Subquery of the authors whose ``privacy`` posts ``user`` may see.
+
+    Used as ``author_id__in=...``, so the database resolves it from the
+    ``(viewer, privacy)`` index however many authors the viewer can see,
+    with no id list passed as parameters.
+    """
+    return VisibleAuthor.objects.filter(viewer=user, privacy=privacy).values('author_id')
+
+
+def can_view_posts(user, posts):
+    """Return a list of booleans saying whether ``user`` may view each post.
+
+    Costs at most one query regardless of how many posts are checked; the
+    id list is bounded by the posts passed in. Answers are memoized on the
+    (per-request) user object, so authors already checked during this
+    request cost nothing.
+    """
+    posts = list(posts)
+    restricted = [
+        p for p in posts
+        if p.privacy != 'public' and p.author_id != user.id
+    ]
+
+    seen = {}
+    if restricted and user.is_authenticated:
+        seen = getattr(user, CACHE_ATTR, None)
+        if seen is None:
+            seen = {}
+            setattr(user, CACHE_ATTR, seen)
+        unknown = {p.author_id for p in restricted} - seen.keys()
+        if unknown:
+            for author_id in unknown:
+                seen[author_id] = set()
+            rows = VisibleAuthor.objects.filter(
+                viewer=user, author_id__in=unknown,
+            ).values_list('author_id', 'privacy')
+            for author_id, privacy in rows:
+                seen[author_id].add(privacy)
+
+    return [
+        p.privacy == 'public'
+        or p.author_id == user.id
+        or p.privacy in seen.get(p.author_id, ())
+        for p in posts
+    ]
+
+
+def compute_visibility(viewer_ids):
+    """Compute the full set of ``(viewer, author, privacy)`` rows from scratch."""
+    rows = set()
+    follows = defaultdict(set)
+
+    for chunk in _chunks(viewer_ids):
+        edges = Friendship.objects.filter(friend_id__in=chunk).values_list(
+            'friend_id', 'user_id', 'user__profile__role')
+        for viewer_id, author_id, author_role in edges:
+            rows.add((viewer_id, author_id, FRIENDS_ONLY))
+            if author_role == 'cio':
+                rows.add((viewer_id, author_id, CIO_WIDE))
+
+        edges = Friendship.objects.filter(
+            user_id__in=chunk, friend__profile__role='cio'
+        ).values_list('user_id', 'friend_id')
+        for viewer_id, cio_id in edges:
+            follows[viewer_id].add(cio_id)
+
+    members = defaultdict(set)
+    for chunk in _chunks({c for cios in follows.values() for c in cios}):
+        edges = Friendship.objects.filter(friend_id__in=chunk).exclude(
+            user__profile__role='cio'
+        ).values_list('friend_id', 'user_id')
+        for cio_id, author_id in edges:
+            members[cio_id].add(author_id)
+
+    for viewer_id, cios in follows.items():
+        for cio_id in cios:
+            for author_id in members[cio_id]:
+                rows.add((viewer_id, author_id, CIO_WIDE))
+
+    return {row for row in rows if row[0] != row[1]}
+
+
+@transaction.atomic
+def rebuild_visibility(viewer_ids):
+    """Recompute and replace the stored visibility sets of ``viewer_ids``."""
+    viewer_ids = set(viewer_ids)
+    rows = compute_visibility(viewer_ids)
+    for chunk in _chunks(viewer_ids):
+        VisibleAuthor.objects.filter(viewer_id__in=chunk).delete()
+    _write(rows)
+
+
+def friendship_created(friendship):
+    """Add the rows a new ``user -> friend`` edge grants."""
+    user_id, friend_id = friendship.user_id, friendship.friend_id
+    roles = dict(Profile.objects.filter(
+        user_id__in=[user_id, friend_id]).values_list('user_id', 'role'))
+    user_is_cio = roles.get(user_id) == 'cio'
+
+    rows = [(friend_id, user_id, FRIENDS_ONLY)]
+    if user_is_cio:
+        rows.append((friend_id, user_id, CIO_WIDE))
+
+    if roles.get(friend_id) == 'cio':
+        # user now follows this CIO: co-followers and user see each other
+        followers = Friendship.objects.filter(friend_id=friend_id).exclude(
+            user_id=user_id).values_list('user_id', 'user__profile__role')
+        for follower_id, follower_role in followers:
+            if not user_is_cio:
+                rows.append((follower_id, user_id, CIO_WIDE))
+            if follower_role != 'cio':
+                rows.append((user_id, follower_id, CIO_WIDE))
+
+    _write(rows)
+
+
+@transaction.atomic
+def friendship_deleted(friendship):
+    """Drop the rows a removed ``user -> friend`` edge was granting."""
+    user_id, friend_id = friendship.user_id, friendship.friend_id
+    rebuild_visibility([user_id, friend_id])
+
+    if not _is_cio(friend_id) or _is_cio(user_id):
+        return
+
+    # co-followers keep seeing user only if they still share another CIO
+    still_shared = Friendship.objects.filter(
+        friend_id__in=Friendship.objects.filter(
+            user_id=user_id, friend__profile__role='cio').values('friend_id')
+    ).values('user_id')
+    VisibleAuthor.objects.filter(
+        author_id=user_id,
+        privacy=CIO_WIDE,
+        viewer_id__in=Friendship.objects.filter(friend_id=friend_id).values('user_id'),
+    ).exclude(viewer_id__in=still_shared).delete()
+
+
+def role_changed(user_id):
+    """Rebuild every viewer whose sets depend on ``user_id``'s CIO status."""
+    affected = {user_id}
+    affected.update(Friendship.objects.filter(user_id=user_id).values_list('friend_id', flat=True))
+    affected.update(Friendship.objects.filter(friend_id=user_id).values_list('user_id', flat=True))
+    affected.update(Friendship.objects.filter(
+        friend_id__in=Friendship.objects.filter(
+            user_id=user_id, friend__profile__role='cio').values('friend_id')
+    ).values_list('user_id', flat=True))
+    rebuild_visibility(affected)
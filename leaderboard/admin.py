@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.safestring import mark_safe
-from .models import Task, Points, Event
+from .models import Task, TaskTemplate, Points, PointEvent, Event
 
 
 @admin.register(Task)
@@ -17,12 +17,28 @@ class TaskAdmin(admin.ModelAdmin):
 	search_fields = ("title", "content", "user__username")
 
 
+@admin.register(TaskTemplate)
+class TaskTemplateAdmin(admin.ModelAdmin):
+	list_display = ("title", "kind", "points", "position", "active")
+	list_filter = ("kind", "active")
+	list_editable = ("position", "active")
+	search_fields = ("title",)
+
+
 @admin.register(Points)
 class PointsAdmin(admin.ModelAdmin):
 	list_display = ("user", "score")
 	search_fields = ("user__username",)
 
 
+@admin.register(PointEvent)
+class PointEventAdmin(admin.ModelAdmin):
+	list_display = ("user", "amount", "reason", "created_at")
+	list_filter = ("reason",)
+	search_fields = ("user__username",)
+	readonly_fields = ("user", "amount", "reason", "created_at")
+
+
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
 	list_display = ("title", "created_by", "start_at", "location", "image_preview_admin")
@@ -0,0 +1,79 @@
+"""Keep ``CIOScore`` (a CIO's followers' total points) in step with its inputs.
+
+A CIO's followers are the users ``Friendship.friends_of(cio)`` returns, i.e.
+``Friendship(user=cio, friend=follower)`` rows. The signal handlers in
+``leaderboard.signals`` call these functions when points change, when a
+follower edge is added or removed and when a profile's role changes, so
+each change is one small UPDATE instead of re-summing every CIO's
+followers on each dashboard view. ``rebuild`` recomputes the table from
+scratch in one grouped query (``manage.py rebuild_cio_scores``).
+"""
+from django.db.models import F, Sum
+
+from social.models import Friendship
+from users.models import Profile
+
+from .models import CIOScore, Points
+
+
+def points_changed(user_id, delta):
+    """Add ``delta`` to the score of every CIO that ``user_id`` follows; return their ids."""
+    if not delta:
+        return []
+    cio_ids = list(CIOScore.objects.filter(cio__friendships__friend_id=user_id).values_list("cio_id", flat=True))
+    if cio_ids:
+        CIOScore.objects.filter(cio_id__in=cio_ids).update(total_points=F("total_points") + delta)
+    return cio_ids
+
+
+def follower_added(cio_id, follower_id):
+    points = Points.objects.filter(user_id=follower_id).values_list("score", flat=True).first()
+    if points:
+        CIOScore.objects.filter(cio_id=cio_id).update(total_points=F("total_points") + points)
+
+
+def follower_removed(cio_id, follower_id):
+    points = Points.objects.filter(user_id=follower_id).values_list("score", flat=True).first()
+    if points:
+        CIOScore.objects.filter(cio_id=cio_id).update(total_points=F("total_points") - points)
+
+
+def _follower_total(cio_id):
+    return (
+        Points.objects.filter(user__related_to__user_id=cio_id)
+        .aggregate(total=Sum("score"))["total"]
+    ) or 0
+
+
+def role_changed(profile):
+    """Add or drop ``profile``'s row to match whether it is a CIO."""
+    if profile.role == "cio":
+        if not CIOScore.objects.filter(cio_id=profile.user_id).exists():
+            CIOScore.objects.get_or_create(
+                cio_id=profile.user_id, defaults={"total_points": _follower_total(profile.user_id)}
+            )
+    else:
+        CIOScore.objects.filter(cio_id=profile.user_id).delete()
+
+
+def rebuild():
+    """Recompute every CIO's total from ``Points`` and ``Friendship``."""
+    cio_ids = list(Profile.objects.filter(role="cio").values_list("user_id", flat=True))
+    totals = dict(
+        Friendship.objects.filter(user_id__in=cio_ids)
+        .values("user_id")
+        .annotate(total=Sum("friend__points__score"))
+        .values_list("user_id", "total")
+    )
+    CIOScore.objects.exclude(cio_id__in=cio_ids).delete()
+    CIOScore.objects.bulk_create(
+        [CIOScore(cio_id=cio_id, total_points=totals.get(cio_id) or 0) for cio_id in cio_ids],
+        update_conflicts=True,
+        unique_fields=["cio"],
+        update_fields=["total_points"],
+    )
+    return len(cio_ids)
+
+
+def top_cios(limit=10):
+    return CIOScore.objects.select_related("cio__profile").order_by("-total_points", "cio_id")[:limit]
@@ -0,0 +1,131 @@
+"""Version numbers for cached template fragments.
+
+The leaderboard tables and event lists look the same to most viewers, so
+the dashboard, events and profile templates wrap them in ``{% cache %}``
+blocks keyed on a version from here (``fragment_versions.leaderboards``,
+``fragment_versions.events``, or ``fragment_versions.members`` for one
+CIO's member board). Changes to ``Points``, ``Friendship`` or ``Event``
+call ``bump`` once the transaction commits (see ``leaderboard.signals``
+and ``Points.award``), which retires every fragment rendered from the old
+data at once without knowing its key; the old entries just expire.
+
+Awards are frequent, so ``points_changed`` only bumps the boards an award
+can show up on: the top-``BOARD_SIZE`` tables when the user's score (or a
+followed CIO's total) is at or above their last row, and the member
+boards of the CIOs the user follows. Everything else, like a new rank far
+down a board, waits for the TTL.
+
+Fragments live at most ``FRAGMENT_CACHE_TIMEOUT`` seconds, which bounds
+staleness that no save announces (an event moving from upcoming to past,
+signed media URLs expiring), so keep it well under the storage's
+``querystring_expire``.
+
+A bump must reach every process, so the versions live in the ``shared``
+cache alias (the database cache by default), not the per-process default
+cache that holds the fragments themselves; ``check --deploy`` warns when
+``shared`` is process-local.
+"""
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.db import transaction
+
+LEADERBOARDS = "leaderboards"
+EVENTS = "events"
+MEMBERS = "members"
+NAMES = (LEADERBOARDS, EVENTS)
+# rows in each cached board
+BOARD_SIZE = 10
+DEFAULT_TIMEOUT = 300
+CACHE_PREFIX = "fragments:version:"
+VERSION_CACHE = "shared"
+LOCAL_BACKENDS = ("django.core.cache.backends.locmem.LocMemCache", "django.core.cache.backends.dummy.DummyCache")
+
+
+def _new_version():
+    # never reuse a number, even if the stored version was evicted
+    return time.time_ns()
+
+
+def member_family(cio_id):
+    """Fragment family of ``cio_id``'s member board."""
+    return f"{MEMBERS}:{cio_id}"
+
+
+def versions(names=NAMES):
+    """``{name: version}`` for ``names`` (every site-wide family), in one cache round-trip."""
+    cache = caches[VERSION_CACHE]
+    found = cache.get_many([CACHE_PREFIX + name for name in names])
+    result = {}
+    for name in names:
+        version = found.get(CACHE_PREFIX + name)
+        if version is None:
+            version = _new_version()
+            cache.add(CACHE_PREFIX + name, version, None)
+        result[name] = version
+    return result
+
+
+def bump(*names):
+    """Retire the fragments of ``names`` once the current transaction commits."""
+    def apply():
+        caches[VERSION_CACHE].set_many({CACHE_PREFIX + name: _new_version() for name in names}, None)
+    transaction.on_commit(apply)
+
+
+def member_version(cio_id):
+    return versions((member_family(cio_id),))[member_family(cio_id)]
+
+
+def points_changed(user_id, delta, cio_ids):
+    """Bump the fragments a committed ``delta`` to ``user_id``'s score can change.
+
+    ``cio_ids`` are the CIOs the user follows. Call after ``ranking.points_changed``.
+    """
+    from . import ranking
+
+    names = [
+        member_family(cio_id) for cio_id in cio_ids
+        if ranking.moves_top(ranking.member_board(cio_id), user_id, delta, BOARD_SIZE)
+    ]
+    if ranking.moves_top(ranking.INDIVIDUAL, user_id, delta, BOARD_SIZE) or any(
+        ranking.moves_top(ranking.CIO, cio_id, delta, BOARD_SIZE) for cio_id in cio_ids
+    ):
+        names.append(LEADERBOARDS)
+    if names:
+        bump(*names)
+
+
+def context(members_of=None):
+    """Template context for ``{% cache fragment_timeout "..." fragment_versions.<name> %}``.
+
+    ``members_of`` adds ``fragment_versions.members`` for that CIO's member board.
+    """
+    names = NAMES if members_of is None else NAMES + (member_family(members_of),)
+    found = versions(names)
+    if members_of is not None:
+        found[MEMBERS] = found.pop(member_family(members_of))
+    return {
+        "fragment_versions": found,
+        "fragment_timeout": getattr(settings, "FRAGMENT_CACHE_TIMEOUT", DEFAULT_TIMEOUT),
+    }
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_version_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get(VERSION_CACHE, {}).get("BACKEND")
+    if backend is None:
+        return [checks.Error(
+            f"CACHES has no {VERSION_CACHE!r} alias for the fragment versions.",
+            id="leaderboard.E001",
+        )]
+    if backend in LOCAL_BACKENDS:
+        return [checks.Warning(
+            f"CACHES[{VERSION_CACHE!r}] uses {backend}, so fragment versions are not shared "
+            "between processes and cached leaderboards go stale in all but one of them.",
+            hint="Use the database, file or Redis cache for it.",
+            id="leaderboard.W001",
+        )]
+    return []
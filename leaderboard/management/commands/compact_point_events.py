@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from leaderboard.models import PointEvent
+
+DEFAULT_RETENTION_DAYS = 90
+
+
+class Command(BaseCommand):
+    help = "Fold each user's old PointEvent rows into a single summary event. Scores are unchanged."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "POINT_EVENT_RETENTION_DAYS", DEFAULT_RETENTION_DAYS),
+            help="Keep individual events from the last N days (default: POINT_EVENT_RETENTION_DAYS or 90).",
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["days"])
+        removed = PointEvent.compact(before)
+        self.stdout.write(self.style.SUCCESS(f"Compacted point history before {before:%Y-%m-%d}; {removed} events removed"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leaderboard import task_templates
+
+
+class Command(BaseCommand):
+    help = "Load daily_tasks.json and weekly_tasks.json into the TaskTemplate catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kind",
+            choices=[task_templates.DAILY, task_templates.WEEKLY],
+            help="Only import one kind of template (default: both).",
+        )
+        parser.add_argument(
+            "--deactivate-missing",
+            action="store_true",
+            help="Deactivate catalog templates that are no longer in the file.",
+        )
+
+    def handle(self, *args, **options):
+        kinds = [options["kind"]] if options["kind"] else [task_templates.DAILY, task_templates.WEEKLY]
+        for kind in kinds:
+            try:
+                created, updated, deactivated = task_templates.import_templates(
+                    kind, deactivate_missing=options["deactivate_missing"]
+                )
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot load {kind} templates from {task_templates.FILES[kind]}: {e}")
+            self.stdout.write(self.style.SUCCESS(
+                f"{kind}: {created} created, {updated} updated, {deactivated} deactivated"
+            ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from leaderboard import cio_scores
+
+
+class Command(BaseCommand):
+    help = "Recompute the CIO leaderboard totals from Points and follower edges."
+
+    def handle(self, *args, **options):
+        count = cio_scores.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt CIO scores for {count} CIOs"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from leaderboard import cio_scores, ranking
+from leaderboard.models import PointEvent
+
+
+class Command(BaseCommand):
+    help = "Recompute every user's Points score from the PointEvent ledger, then the derived boards."
+
+    def handle(self, *args, **options):
+        fixed = PointEvent.rebuild_scores()
+        cio_scores.rebuild()
+        ranking.reset()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt points from the ledger; {fixed} scores changed"))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_cio_scores(apps, schema_editor):
+    CIOScore = apps.get_model('leaderboard', 'CIOScore')
+    Profile = apps.get_model('users', 'Profile')
+    Friendship = apps.get_model('social', 'Friendship')
+    Points = apps.get_model('leaderboard', 'Points')
+
+    cio_ids = list(Profile.objects.filter(role='cio').values_list('user_id', flat=True))
+    scores = dict(Points.objects.values_list('user_id', 'score'))
+    totals = dict.fromkeys(cio_ids, 0)
+    for cio_id, follower_id in Friendship.objects.filter(user_id__in=cio_ids).values_list('user_id', 'friend_id'):
+        totals[cio_id] += scores.get(follower_id) or 0
+    CIOScore.objects.bulk_create(CIOScore(cio_id=c, total_points=t) for c, t in totals.items())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('leaderboard', '0006_alter_event_id'),
+        ('social', '0003_conversation_dm_key'),
+        ('users', '0011_coalesce_message_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CIOScore',
+            fields=[
+                ('cio', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cio_score', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_points', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_points', 'cio'], name='leaderboard_cio_rank_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_cio_scores, migrations.RunPython.noop),
+    ]
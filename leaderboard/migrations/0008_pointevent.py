@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:09
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    # one opening-balance event per existing score so the ledger sums to Points.score
+    Points = apps.get_model('leaderboard', 'Points')
+    PointEvent = apps.get_model('leaderboard', 'PointEvent')
+    PointEvent.objects.bulk_create(
+        [
+            PointEvent(user_id=user_id, amount=score, reason='compacted')
+            for user_id, score in Points.objects.exclude(score=0).values_list('user_id', 'score')
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0007_cio_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField()),
+                ('reason', models.CharField(blank=True, choices=[('task', 'Daily task completed'), ('task_undone', 'Daily task undone'), ('weekly', 'Weekly challenge completed'), ('weekly_undone', 'Weekly challenge undone'), ('adjustment', 'Manual adjustment'), ('compacted', 'Compacted history')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='point_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'created_at'], name='leaderboard_pointevent_idx')],
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:13
+
+import json
+import os
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Q
+
+SEED_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed_catalog(apps, schema_editor):
+    """Create templates from the JSON seed files and link past completions by kind and title.
+
+    Completions have no kind column, but weekly ones always carried a proof
+    image and daily ones never did, so a title used in both files links each
+    completion to the right template.
+    """
+    TaskTemplate = apps.get_model('leaderboard', 'TaskTemplate')
+    Task = apps.get_model('leaderboard', 'Task')
+    for kind in ('daily', 'weekly'):
+        try:
+            with open(os.path.join(SEED_DIR, f'{kind}_tasks.json'), encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            continue
+        position = 0
+        for entry in entries:
+            title = str(entry.get('title') or '').strip() if isinstance(entry, dict) else ''
+            if not title or TaskTemplate.objects.filter(kind=kind, title=title).exists():
+                continue
+            try:
+                points = int(entry.get('points', 0))
+            except (TypeError, ValueError):
+                continue
+            template = TaskTemplate.objects.create(
+                kind=kind, title=title, content=str(entry.get('content') or ''),
+                points=points, position=position,
+            )
+            position += 1
+            completions = Task.objects.filter(template__isnull=True, title=title)
+            no_proof = Q(image='') | Q(image__isnull=True)
+            completions = completions.exclude(no_proof) if kind == 'weekly' else completions.filter(no_proof)
+            completions.update(template=template)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0008_pointevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('daily', 'Daily task'), ('weekly', 'Weekly challenge')], max_length=10)),
+                ('title', models.CharField(max_length=200)),
+                ('content', models.TextField(blank=True)),
+                ('points', models.IntegerField(default=0)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('active', models.BooleanField(default=True)),
+            ],
+            options={
+                'ordering': ['kind', 'position', 'id'],
+                'indexes': [models.Index(fields=['kind', 'active', 'position'], name='leaderboard_tasktemplate_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'title'), name='leaderboard_tasktemplate_unique_title')],
+            },
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='template',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='completions', to='leaderboard.tasktemplate'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'template', 'created_at'], name='leaderboard_task_done_idx'),
+        ),
+        migrations.RunPython(seed_catalog, migrations.RunPython.noop),
+    ]
@@ -1,25 +1,231 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.utils import timezone
 
 
+def _add_to_score(user_id, amount):
+    """Add ``amount`` to ``user_id``'s score; the new score, or None without a row.
+
+    Where the database can return columns from an UPDATE (PostgreSQL, SQLite
+    3.35+) that is a single statement; elsewhere the score is read back.
+    """
+    if connection.vendor in ("postgresql", "sqlite") and connection.features.can_return_columns_from_insert:
+        table = connection.ops.quote_name(Points._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET score = score + %s WHERE user_id = %s RETURNING score",
+                [amount, user_id],
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
+    rows = Points.objects.filter(user_id=user_id)
+    if not rows.update(score=F("score") + amount):
+        return None
+    return rows.values_list("score", flat=True).get()
+
+
 class Points(models.Model):
-    """One row per user storing accumulated points."""
+    """One row per user storing accumulated points.
+
+    ``score`` is the running total of the user's ``PointEvent`` ledger; change
+    it through ``Points.award`` so the ledger and derived boards stay in step.
+    """
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     score = models.IntegerField(default=0)
 
     def __str__(self):
         return f"{self.user.username}: {self.score} points"
 
-    def add(self, amount: int):
-        self.score = (self.score or 0) + (amount or 0)
-        self.save(update_fields=["score"])
+    @staticmethod
+    def award(user, amount: int, reason: str = ""):
+        """Atomically add ``amount`` to ``user``'s score and log it. Returns the new score.
+
+        The score is bumped in place (``score = score + amount``), so
+        concurrent awards for the same user can't overwrite each other. The
+        in-memory boards follow once the transaction commits.
+        """
+        from . import cio_scores, fragments, ranking
+
+        user_id = getattr(user, "pk", user)
+        amount = amount or 0
+        if not amount:
+            return Points.objects.get_or_create(user_id=user_id)[0].score
+        with transaction.atomic():
+            PointEvent.objects.create(user_id=user_id, amount=amount, reason=reason)
+            score = _add_to_score(user_id, amount)
+            if score is None:
+                Points.objects.get_or_create(user_id=user_id)
+                score = _add_to_score(user_id, amount)
+            cio_ids = cio_scores.points_changed(user_id, amount)
+
+        def apply():
+            ranking.points_changed(user_id, score, cio_ids=cio_ids, delta=amount)
+            fragments.points_changed(user_id, amount, cio_ids)
+
+        # the in-memory boards must not show a score that was rolled back
+        transaction.on_commit(apply)
+        return score
+
+    def add(self, amount: int, reason: str = ""):
+        self.score = Points.award(self.user_id, amount, reason)
+
+    @staticmethod
+    def lock(user):
+        """Lock ``user``'s row until the current transaction ends.
+
+        Toggles take it before checking for an existing completion, so a
+        double-click can't complete the same task twice.
+        """
+        user_id = getattr(user, "pk", user)
+        Points.objects.get_or_create(user_id=user_id)
+        return Points.objects.select_for_update().get(user_id=user_id)
+
+
+class PointEvent(models.Model):
+    """Append-only ledger of score changes; ``Points.score`` is its running sum."""
+
+    TASK = "task"
+    TASK_UNDONE = "task_undone"
+    WEEKLY = "weekly"
+    WEEKLY_UNDONE = "weekly_undone"
+    ADJUSTMENT = "adjustment"
+    COMPACTED = "compacted"
+    REASON_CHOICES = [
+        (TASK, "Daily task completed"),
+        (TASK_UNDONE, "Daily task undone"),
+        (WEEKLY, "Weekly challenge completed"),
+        (WEEKLY_UNDONE, "Weekly challenge undone"),
+        (ADJUSTMENT, "Manual adjustment"),
+        (COMPACTED, "Compacted history"),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="point_events")
+    amount = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["user", "created_at"], name="leaderboard_pointevent_idx")]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.amount:+d} ({self.reason})"
+
+    @staticmethod
+    def compact(before):
+        """Fold each user's events older than ``before`` into one ``COMPACTED`` event.
+
+        Totals are unchanged; returns the number of events removed.
+        """
+        removed = 0
+        with transaction.atomic():
+            old = PointEvent.objects.filter(created_at__lt=before)
+            totals = list(
+                old.values("user_id").annotate(total=Sum("amount"), n=Count("id")).filter(n__gt=1)
+            )
+            for row in totals:
+                user_old = old.filter(user_id=row["user_id"])
+                removed += user_old.delete()[0] - 1
+                PointEvent.objects.create(
+                    user_id=row["user_id"],
+                    amount=row["total"],
+                    reason=PointEvent.COMPACTED,
+                    created_at=before,
+                )
+        return removed
+
+    @staticmethod
+    def rebuild_scores():
+        """Reset every ``Points.score`` to its ledger sum; returns the number of rows fixed.
+
+        Each score is set from its own ledger sum inside the UPDATE, so an award
+        committed while this runs is never overwritten with an older total.
+        """
+        ledger = PointEvent.objects.filter(user_id=OuterRef("user_id")).order_by().values("user_id")
+        total = Coalesce(Subquery(ledger.annotate(total=Sum("amount")).values("total")), 0)
+        with transaction.atomic():
+            fixed = Points.objects.exclude(score=total).update(score=total)
+            missing = (
+                PointEvent.objects.exclude(user__points__isnull=False)
+                .order_by().values("user_id").annotate(total=Sum("amount"))
+            )
+            # a concurrent award may create the row first; its score already counts the ledger
+            created = Points.objects.bulk_create(
+                [Points(user_id=row["user_id"], score=row["total"]) for row in missing],
+                ignore_conflicts=True,
+            )
+        return fixed + len(created)
+
+class CIOScore(models.Model):
+    """Total points of each CIO's followers, maintained by ``leaderboard.cio_scores``.
+
+    One row per CIO, so the CIO leaderboard is an indexed ORDER BY ... LIMIT.
+    """
+    cio = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="cio_score",
+    )
+    total_points = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["-total_points", "cio"], name="leaderboard_cio_rank_idx")]
+
+    def __str__(self):
+        return f"{self.cio.username}: {self.total_points} member points"
+
+
+class TaskTemplate(models.Model):
+    """A daily task or weekly challenge users can complete for points.
+
+    Completions are ``Task`` rows pointing at their template, so toggles and
+    progress counts address templates by id rather than by list position or
+    title. ``daily_tasks.json`` and ``weekly_tasks.json`` seed this table
+    (``manage.py import_task_templates``); retired templates are deactivated
+    rather than deleted so past completions keep their link.
+    """
+
+    DAILY = "daily"
+    WEEKLY = "weekly"
+    KIND_CHOICES = [
+        (DAILY, "Daily task"),
+        (WEEKLY, "Weekly challenge"),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    title = models.CharField(max_length=200)
+    content = models.TextField(blank=True)
+    points = models.IntegerField(default=0)
+    position = models.PositiveIntegerField(default=0)
+    active = models.BooleanField(default=True)
+
+    class Meta:
+        ordering = ["kind", "position", "id"]
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "title"], name="leaderboard_tasktemplate_unique_title"),
+        ]
+        indexes = [models.Index(fields=["kind", "active", "position"], name="leaderboard_tasktemplate_idx")]
+
+    def __str__(self):
+        return f"{self.get_kind_display()}: {self.title}"
+
+    @staticmethod
+    def active_for(kind):
+        return TaskTemplate.objects.filter(kind=kind, active=True)
 
 
 class Task(models.Model):
     """A task assigned/created by a user with a point value."""
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # the catalog entry this completes; title/content/points are copied so history survives edits
+    template = models.ForeignKey(
+        TaskTemplate, on_delete=models.SET_NULL, null=True, blank=True, related_name="completions"
+    )
     title = models.CharField(max_length=200)
     content = models.TextField(blank=True)
     points = models.IntegerField(default=0)
@@ -31,23 +237,30 @@ class Task(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [models.Index(fields=["user", "template", "created_at"], name="leaderboard_task_done_idx")]
 
     def __str__(self):
         return f"{self.user.username}: {self.title}"
 
+    def _set_completed(self, completed):
+        """Flip ``completed`` in the database; True only for the caller that flipped it."""
+        with transaction.atomic():
+            changed = Task.objects.filter(pk=self.pk, completed=not completed).update(
+                completed=completed, updated_at=timezone.now())
+            self.completed = completed
+            if changed:
+                Points.award(
+                    self.user_id,
+                    self.points if completed else -self.points,
+                    PointEvent.TASK if completed else PointEvent.TASK_UNDONE,
+                )
+        return bool(changed)
+
     def mark_completed(self):
-        if not self.completed:
-            self.completed = True
-            self.save(update_fields=["completed", "updated_at"])
-            pts, _ = Points.objects.get_or_create(user=self.user)
-            pts.add(self.points)
+        return self._set_completed(True)
 
     def mark_incomplete(self):
-        if self.completed:
-            self.completed = False
-            self.save(update_fields=["completed", "updated_at"])
-            pts, _ = Points.objects.get_or_create(user=self.user)
-            pts.add(-self.points)
+        return self._set_completed(False)
 
     def delete(self, *args, **kwargs):
         # remove stored image file (if any) when deleting the Task
@@ -0,0 +1,223 @@
+"""In-memory rank lookups for the leaderboards.
+
+Each board is a ``Ranking``: a sorted list of ``(-score, user_id)`` keys,
+so a user's rank is a binary search (O(log n)) and a neighbours window is
+a slice. Boards:
+
+- ``INDIVIDUAL``: ``Points`` of every user who is not a CIO
+- ``CIO``: ``CIOScore`` totals
+- ``member_board(cio_id)``: ``Points`` of a CIO's followers
+
+Boards are built from the database on first use, kept per process and
+updated in place by ``points_changed`` (called from ``Points.award`` and
+the ``Points`` signal handlers), which also moves the CIOs whose follower
+totals changed. Changes that move users between boards (roles, follower
+edges) just drop the affected board so it is rebuilt on next use. A
+freshly built board is also stored in the ``shared`` cache so other
+processes and restarts skip the full scan; every board is rebuilt at least
+every ``LEADERBOARD_RANKING_TTL`` seconds after it was built to pick up
+changes made by other processes.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import CIOScore, Points
+
+INDIVIDUAL = "individual"
+CIO = "cio"
+DEFAULT_TTL = 300
+CACHE_PREFIX = "leaderboard:ranking:"
+# snapshots are only useful if every process reads the same ones (see settings.CACHES)
+SNAPSHOT_CACHE = "shared"
+
+
+def member_board(cio_id):
+    return f"members:{cio_id}"
+
+
+class Ranking:
+    """Scores kept in rank order; ties share a rank (1 + number of higher scores)."""
+
+    def __init__(self, scores=()):
+        self.scores = dict(scores)
+        self.keys = sorted((-score, user_id) for user_id, score in self.scores.items())
+        # wall clock, so a snapshot's age means the same in every process
+        self.built_at = time.time()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, user_id):
+        return user_id in self.scores
+
+    def update(self, user_id, score):
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            del self.keys[bisect_left(self.keys, (-old, user_id))]
+        self.scores[user_id] = score
+        insort(self.keys, (-score, user_id))
+
+    def remove(self, user_id):
+        old = self.scores.pop(user_id, None)
+        if old is not None:
+            del self.keys[bisect_left(self.keys, (-old, user_id))]
+
+    def rank(self, user_id):
+        """1-based rank of ``user_id``, or None if not on the board."""
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        # keys sort by -score, so everything before (-score, <lowest id>) scored higher
+        return bisect_left(self.keys, (-score, float("-inf"))) + 1
+
+    def _entries(self, start, stop):
+        return [
+            {"rank": self.rank(user_id), "user_id": user_id, "points": -neg_score}
+            for neg_score, user_id in self.keys[max(start, 0):stop]
+        ]
+
+    def top(self, n=10):
+        return self._entries(0, n)
+
+    def around(self, user_id, radius=2):
+        """Entries from ``radius`` places above ``user_id`` to ``radius`` below."""
+        score = self.scores.get(user_id)
+        if score is None:
+            return []
+        position = bisect_left(self.keys, (-score, user_id))
+        return self._entries(position - radius, position + radius + 1)
+
+    def __getstate__(self):
+        return {"scores": self.scores, "built_at": self.built_at}
+
+    def __setstate__(self, state):
+        self.__init__(state["scores"])
+        # a snapshot expires when its original build does, not when it was loaded
+        self.built_at = state.get("built_at", self.built_at)
+
+
+_boards = {}
+_lock = threading.Lock()
+
+
+def _ttl():
+    return getattr(settings, "LEADERBOARD_RANKING_TTL", DEFAULT_TTL)
+
+
+def _fresh(board):
+    return board is not None and time.time() - board.built_at < _ttl()
+
+
+def _load_scores(name):
+    if name == INDIVIDUAL:
+        qs = Points.objects.exclude(user__profile__role="cio")
+        return qs.values_list("user_id", "score")
+    if name == CIO:
+        return CIOScore.objects.values_list("cio_id", "total_points")
+    if name.startswith("members:"):
+        cio_id = int(name.split(":", 1)[1])
+        return Points.objects.filter(user__related_to__user_id=cio_id).values_list("user_id", "score")
+    raise KeyError(f"Unknown leaderboard {name!r}")
+
+
+def get_board(name):
+    """Return the ``Ranking`` for ``name``, building it if missing or expired."""
+    with _lock:
+        board = _boards.get(name)
+        if _fresh(board):
+            return board
+
+    board = caches[SNAPSHOT_CACHE].get(CACHE_PREFIX + name)
+    if not _fresh(board):
+        board = Ranking((user_id, score or 0) for user_id, score in _load_scores(name))
+        caches[SNAPSHOT_CACHE].set(CACHE_PREFIX + name, board, _ttl())
+    with _lock:
+        _boards[name] = board
+    return board
+
+
+def invalidate(*names):
+    with _lock:
+        for name in names:
+            _boards.pop(name, None)
+    caches[SNAPSHOT_CACHE].delete_many([CACHE_PREFIX + name for name in names])
+
+
+def points_changed(user_id, score, created=False, cio_ids=None, delta=0):
+    """Move ``user_id`` to ``score`` on every loaded board that holds them.
+
+    A new ``Points`` row (``created``) may belong on boards that don't hold
+    the user yet, so those are dropped instead. ``cio_ids`` (the CIOs the
+    user follows, whose totals moved by ``delta``) are moved on the CIO
+    board; without them that board is dropped.
+    """
+    with _lock:
+        touched = [CIO]
+        cio_board = _boards.get(CIO)
+        if cio_ids is None or cio_board is None:
+            # follower totals moved; cheap to rebuild
+            _boards.pop(CIO, None)
+        else:
+            for cio_id in cio_ids:
+                if cio_id in cio_board:
+                    cio_board.update(cio_id, cio_board.scores[cio_id] + delta)
+        for name, board in list(_boards.items()):
+            if name == CIO:
+                continue
+            if user_id in board:
+                board.update(user_id, score)
+                touched.append(name)
+            elif created:
+                del _boards[name]
+                touched.append(name)
+    # cached snapshots are now behind this process's boards
+    caches[SNAPSHOT_CACHE].delete_many([CACHE_PREFIX + name for name in touched])
+
+
+def moves_top(name, member_id, delta, n=10):
+    """Whether ``member_id`` moving by ``delta`` (already applied) can change the top ``n`` of ``name``.
+
+    Only this process's loaded boards are consulted; a board it hasn't
+    loaded can't tell, so counts as a yes.
+    """
+    with _lock:
+        board = _boards.get(name)
+        if board is None:
+            return True
+        score = board.scores.get(member_id)
+        if score is None:
+            return False
+        if len(board) <= n:
+            return True
+        threshold = -board.keys[n - 1][0]
+        return max(score, score - delta) >= threshold
+
+
+def points_removed(user_id):
+    with _lock:
+        names = [name for name, board in _boards.items() if user_id in board] + [CIO]
+    invalidate(*names)
+
+
+def reset():
+    """Forget every board (tests, or after bulk score changes)."""
+    with _lock:
+        names = list(_boards)
+        _boards.clear()
+    caches[SNAPSHOT_CACHE].delete_many([CACHE_PREFIX + name for name in names + [INDIVIDUAL, CIO]])
+
+
+def standing(name, user_id, radius=2):
+    """``{"rank", "total", "around"}`` for ``user_id`` on ``name``, or None."""
+    board = get_board(name)
+    with _lock:
+        rank = board.rank(user_id)
+        if rank is None:
+            return None
+        return {"rank": rank, "total": len(board), "around": board.around(user_id, radius)}
@@ -0,0 +1,76 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from social.models import Friendship
+from users.models import Profile
+
+from . import cio_scores, fragments, ranking
+from .models import Event, PointEvent, Points
+
+
+@receiver(pre_save, sender=Points)
+def remember_previous_score(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    instance._previous_score = (
+        Points.objects.filter(pk=instance.pk).values_list("score", flat=True).first()
+        if instance.pk else None
+    ) or 0
+
+
+@receiver(post_save, sender=Points)
+def update_cio_scores_on_points(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    delta = (instance.score or 0) - instance._previous_score
+    if delta:
+        # a direct save (admin, fixtures) bypassed Points.award; keep the ledger summing to score
+        PointEvent.objects.create(user_id=instance.user_id, amount=delta, reason=PointEvent.ADJUSTMENT)
+    cio_ids = cio_scores.points_changed(instance.user_id, delta)
+    ranking.points_changed(instance.user_id, instance.score or 0, created=created)
+    fragments.bump(fragments.LEADERBOARDS, *map(fragments.member_family, cio_ids))
+
+
+@receiver(post_delete, sender=Points)
+def update_cio_scores_on_points_delete(sender, instance, **kwargs):
+    cio_ids = cio_scores.points_changed(instance.user_id, -(instance.score or 0))
+    ranking.points_removed(instance.user_id)
+    fragments.bump(fragments.LEADERBOARDS, *map(fragments.member_family, cio_ids))
+
+
+@receiver(post_save, sender=Friendship)
+def update_cio_score_on_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        cio_scores.follower_added(instance.user_id, instance.friend_id)
+        ranking.invalidate(ranking.member_board(instance.user_id), ranking.CIO)
+        fragments.bump(fragments.LEADERBOARDS, fragments.member_family(instance.user_id))
+
+
+@receiver(post_delete, sender=Friendship)
+def update_cio_score_on_unfollow(sender, instance, **kwargs):
+    cio_scores.follower_removed(instance.user_id, instance.friend_id)
+    ranking.invalidate(ranking.member_board(instance.user_id), ranking.CIO)
+    fragments.bump(fragments.LEADERBOARDS, fragments.member_family(instance.user_id))
+
+
+@receiver(post_save, sender=Profile)
+def update_cio_score_on_role(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # saved values stored by users.signals.remember_previous_profile
+    previous = getattr(instance, "_previous_fields", None)
+    if previous is None or previous["role"] != instance.role:
+        cio_scores.role_changed(instance)
+        ranking.invalidate(ranking.INDIVIDUAL, ranking.CIO)
+        fragments.bump(fragments.LEADERBOARDS)
+    elif previous["display_name"] != instance.display_name:
+        # boards show display names too
+        cio_ids = Friendship.objects.filter(friend_id=instance.user_id).values_list("user_id", flat=True)
+        fragments.bump(fragments.LEADERBOARDS, *map(fragments.member_family, cio_ids))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def update_event_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        fragments.bump(fragments.EVENTS)
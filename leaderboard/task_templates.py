@@ -0,0 +1,97 @@
+"""Daily and weekly task template seed files.
+
+``daily_tasks.json`` and ``weekly_tasks.json`` next to this module are the
+seed/import format for the ``TaskTemplate`` catalog; nothing reads them at
+request time. ``parse`` reads and validates one file, and
+``import_templates`` upserts it into the catalog (``manage.py
+import_task_templates``), matching rows by title so existing template ids,
+and the completions pointing at them, survive edits and reordering.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# same values as TaskTemplate.DAILY / TaskTemplate.WEEKLY
+DAILY = "daily"
+WEEKLY = "weekly"
+TEMPLATE_DIR = os.path.dirname(os.path.abspath(__file__))
+FILES = {
+    DAILY: os.path.join(TEMPLATE_DIR, "daily_tasks.json"),
+    WEEKLY: os.path.join(TEMPLATE_DIR, "weekly_tasks.json"),
+}
+
+
+def _clean(entry):
+    """Return a normalised template dict, or None if ``entry`` is unusable."""
+    if not isinstance(entry, dict):
+        return None
+    title = str(entry.get("title") or "").strip()
+    if not title:
+        return None
+    try:
+        points = int(entry.get("points", 0))
+    except (TypeError, ValueError):
+        return None
+    return {"title": title, "content": str(entry.get("content") or ""), "points": points}
+
+
+def parse(path):
+    """The templates in the JSON file at ``path``, in file order.
+
+    Each is a dict of ``title``, ``content``, ``points`` and ``position``.
+    Invalid entries and repeated titles are skipped with a warning; a file
+    that can't be read or isn't a JSON list raises ``OSError``/``ValueError``.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError("expected a JSON list of templates")
+    templates = []
+    seen = set()
+    for index, entry in enumerate(data):
+        tpl = _clean(entry)
+        if tpl is None:
+            logger.warning(f"Skipping invalid task template #{index} in {path}")
+            continue
+        if tpl["title"] in seen:
+            logger.warning(f"Skipping duplicate task template {tpl['title']!r} in {path}")
+            continue
+        seen.add(tpl["title"])
+        tpl["position"] = len(templates)
+        templates.append(tpl)
+    return templates
+
+
+def import_templates(kind, deactivate_missing=False):
+    """Upsert the ``kind`` seed file into ``TaskTemplate``.
+
+    Returns ``(created, updated, deactivated)`` counts. Templates no longer
+    in the file are deactivated only if ``deactivate_missing`` is set.
+    """
+    from django.db import transaction
+
+    from .models import TaskTemplate
+
+    seeds = parse(FILES[kind])
+    created = updated = 0
+    with transaction.atomic():
+        existing = {t.title: t for t in TaskTemplate.objects.select_for_update().filter(kind=kind)}
+        for tpl in seeds:
+            values = {"content": tpl["content"], "points": tpl["points"], "position": tpl["position"], "active": True}
+            row = existing.get(tpl["title"])
+            if row is None:
+                TaskTemplate.objects.create(kind=kind, title=tpl["title"], **values)
+                created += 1
+            elif any(getattr(row, field) != value for field, value in values.items()):
+                TaskTemplate.objects.filter(pk=row.pk).update(**values)
+                updated += 1
+        deactivated = 0
+        if deactivate_missing:
+            deactivated = (
+                TaskTemplate.objects.filter(kind=kind, active=True)
+                .exclude(title__in=[tpl["title"] for tpl in seeds])
+                .update(active=False)
+            )
+    return created, updated, deactivated
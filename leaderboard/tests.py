@@ -1,16 +1,33 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import Points, Task
-from .models import Event
+from .models import Points, PointEvent, Task, TaskTemplate
+from .models import Event, CIOScore
+from . import cio_scores, fragments, ranking, task_templates
+from django.apps import apps as django_apps
+from django.core.cache import cache, caches
+from django.db import transaction
+from social.models import Friendship
+from django.core.management import call_command
+from io import StringIO
 from django.utils import timezone
+import importlib
+import json
 import os
+import shutil
+import tempfile
+from unittest import mock
 
 
 User = get_user_model()
 
 
+def first_template(kind):
+	"""Id of the first seeded template of ``kind`` (see migration 0009)."""
+	return TaskTemplate.active_for(kind).values_list('id', flat=True).first()
+
+
 class LeaderboardPointsTests(TestCase):
 	def setUp(self):
 		self.client = Client()
@@ -23,12 +40,12 @@ class LeaderboardPointsTests(TestCase):
 		self.assertEqual(pts.score, 0)
 
 		# toggle first daily task (index 0) -> should award 5 points per daily_tasks.json
-		resp = self.client.post(reverse('leaderboard:task_toggle', args=[0]))
+		resp = self.client.post(reverse('leaderboard:task_toggle', args=[first_template(TaskTemplate.DAILY)]))
 		pts.refresh_from_db()
 		self.assertEqual(pts.score, 5)
 
 		# toggling again should remove the completion and subtract points back to 0
-		resp = self.client.post(reverse('leaderboard:task_toggle', args=[0]))
+		resp = self.client.post(reverse('leaderboard:task_toggle', args=[first_template(TaskTemplate.DAILY)]))
 		pts.refresh_from_db()
 		self.assertEqual(pts.score, 0)
 
@@ -37,7 +54,7 @@ class LeaderboardPointsTests(TestCase):
 		self.assertEqual(pts.score, 0)
 
 		# posting without a file should not create a Task and not change points
-		resp = self.client.post(reverse('leaderboard:weekly_toggle', args=[0]))
+		resp = self.client.post(reverse('leaderboard:weekly_toggle', args=[first_template(TaskTemplate.WEEKLY)]))
 		pts.refresh_from_db()
 		self.assertEqual(pts.score, 0)
 
@@ -46,7 +63,7 @@ class LeaderboardPointsTests(TestCase):
 		# create a small dummy image in-memory if it doesn't exist
 		image_data = b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff\x21\xf9\x04\x01\x00\x00\x00\x00\x2c\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02\x4c\x01\x00\x3b'
 		upload = SimpleUploadedFile('proof.gif', image_data, content_type='image/gif')
-		resp = self.client.post(reverse('leaderboard:weekly_toggle', args=[0]), {'proof': upload})
+		resp = self.client.post(reverse('leaderboard:weekly_toggle', args=[first_template(TaskTemplate.WEEKLY)]), {'proof': upload})
 
 		pts.refresh_from_db()
 		# weekly_tasks.json first entry is 30 points; ensure Points updated
@@ -98,3 +115,455 @@ class LeaderboardPointsTests(TestCase):
 		self.assertEqual(resp.status_code, 302)
 		self.assertFalse(Event.objects.filter(title='Nope').exists())
 
+
+
+class CIOScoreTests(TestCase):
+	def setUp(self):
+		self.cio = User.objects.create_user(username='cio', password='pass')
+		self.cio.profile.role = 'cio'
+		self.cio.profile.save()
+		self.member = User.objects.create_user(username='member', password='pass')
+		Points.objects.create(user=self.member, score=10)
+
+	def total(self):
+		return CIOScore.objects.get(cio=self.cio).total_points
+
+	def test_score_follows_points_and_follower_edges(self):
+		self.assertEqual(self.total(), 0)
+		Friendship.make_friends(self.cio, self.member)
+		self.assertEqual(self.total(), 10)
+
+		Points.objects.get(user=self.member).add(5)
+		self.assertEqual(self.total(), 15)
+
+		Friendship.objects.filter(user=self.cio, friend=self.member).delete()
+		self.assertEqual(self.total(), 0)
+
+	def test_row_follows_role(self):
+		Friendship.make_friends(self.cio, self.member)
+		self.cio.profile.role = 'student'
+		self.cio.profile.save()
+		self.assertFalse(CIOScore.objects.filter(cio=self.cio).exists())
+
+		self.cio.profile.role = 'cio'
+		self.cio.profile.save()
+		self.assertEqual(self.total(), 10)
+
+	def test_rebuild_matches_maintained_scores(self):
+		Friendship.make_friends(self.cio, self.member)
+		CIOScore.objects.all().update(total_points=999)
+		call_command('rebuild_cio_scores', stdout=StringIO())
+		self.assertEqual(self.total(), 10)
+
+	def test_top_cios_is_one_query(self):
+		with self.assertNumQueries(1):
+			rows = list(cio_scores.top_cios())
+		self.assertEqual([r.cio for r in rows], [self.cio])
+
+
+class RankingTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		caches[ranking.SNAPSHOT_CACHE].clear()
+		ranking.reset()
+		self.addCleanup(ranking.reset)
+		self.users = [User.objects.create_user(username=f'u{i}', password='pass') for i in range(6)]
+		for i, user in enumerate(self.users):
+			Points.objects.create(user=user, score=i * 10)
+
+	def test_ranking_structure(self):
+		board = ranking.Ranking({1: 50, 2: 70, 3: 50, 4: 10})
+		self.assertEqual([board.rank(u) for u in (2, 1, 3, 4)], [1, 2, 2, 4])
+		board.update(4, 100)
+		self.assertEqual(board.rank(4), 1)
+		self.assertEqual([e['user_id'] for e in board.around(1, radius=1)], [2, 1, 3])
+		board.remove(2)
+		self.assertEqual((board.rank(1), len(board)), (2, 3))
+
+	def test_standing_and_window(self):
+		last = self.users[0]
+		with self.assertNumQueries(1):
+			result = ranking.standing(ranking.INDIVIDUAL, last.id, radius=1)
+		self.assertEqual((result['rank'], result['total']), (6, 6))
+		self.assertEqual([e['points'] for e in result['around']], [10, 0])
+
+		with self.assertNumQueries(0):
+			ranking.standing(ranking.INDIVIDUAL, last.id)
+
+	def test_points_changes_update_loaded_board(self):
+		ranking.get_board(ranking.INDIVIDUAL)
+		with self.captureOnCommitCallbacks(execute=True):
+			Points.objects.get(user=self.users[0]).add(1000)
+		with self.assertNumQueries(0):
+			self.assertEqual(ranking.standing(ranking.INDIVIDUAL, self.users[0].id)['rank'], 1)
+
+	def test_snapshot_is_shared_and_keeps_its_age(self):
+		board = ranking.get_board(ranking.INDIVIDUAL)
+		snapshot = caches[ranking.SNAPSHOT_CACHE].get(ranking.CACHE_PREFIX + ranking.INDIVIDUAL)
+		self.assertEqual(snapshot.scores, board.scores)
+		self.assertEqual(snapshot.built_at, board.built_at)
+
+		# another process finds a snapshot built longer than the TTL ago and rebuilds it
+		snapshot.built_at -= ranking.DEFAULT_TTL + 1
+		caches[ranking.SNAPSHOT_CACHE].set(ranking.CACHE_PREFIX + ranking.INDIVIDUAL, snapshot)
+		ranking._boards.clear()
+		with self.assertNumQueries(1):
+			ranking.get_board(ranking.INDIVIDUAL)
+		with self.assertNumQueries(0):
+			ranking.get_board(ranking.INDIVIDUAL)
+
+	def test_member_board_follows_friendships(self):
+		cio = User.objects.create_user(username='cio', password='pass')
+		cio.profile.role = 'cio'
+		cio.profile.save()
+		Friendship.make_friends(cio, self.users[1])
+		self.assertEqual(len(ranking.get_board(ranking.member_board(cio.id))), 1)
+		Friendship.make_friends(cio, self.users[5])
+		result = ranking.standing(ranking.member_board(cio.id), self.users[1].id)
+		self.assertEqual((result['rank'], result['total']), (2, 2))
+		self.assertIsNone(ranking.standing(ranking.INDIVIDUAL, cio.id))
+
+
+class PointLedgerTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		caches[ranking.SNAPSHOT_CACHE].clear()
+		ranking.reset()
+		self.user = User.objects.create_user(username='alice', password='pass')
+
+	def ledger_total(self):
+		return sum(PointEvent.objects.filter(user=self.user).values_list('amount', flat=True))
+
+	def test_award_increments_and_logs_event(self):
+		self.assertEqual(Points.award(self.user, 5, PointEvent.TASK), 5)
+		self.assertEqual(Points.award(self.user.id, -2, PointEvent.TASK_UNDONE), 3)
+		self.assertEqual(Points.objects.get(user=self.user).score, 3)
+		self.assertEqual(
+			list(PointEvent.objects.filter(user=self.user).order_by('id').values_list('amount', 'reason')),
+			[(5, 'task'), (-2, 'task_undone')],
+		)
+
+	def test_award_does_not_read_back_the_score(self):
+		Points.objects.create(user=self.user)
+		# savepoint, ledger INSERT, score UPDATE ... RETURNING, CIO totals UPDATE, release;
+		# no read-back of the score
+		with self.assertNumQueries(5):
+			self.assertEqual(Points.award(self.user, 5, PointEvent.TASK), 5)
+
+	def test_rolled_back_award_leaves_boards_alone(self):
+		Points.objects.create(user=self.user)
+		ranking.get_board(ranking.INDIVIDUAL)
+		with self.captureOnCommitCallbacks(execute=True) as callbacks:
+			try:
+				with transaction.atomic():
+					Points.award(self.user, 50, PointEvent.TASK)
+					raise RuntimeError
+			except RuntimeError:
+				pass
+		self.assertEqual(callbacks, [])
+		self.assertEqual(ranking.get_board(ranking.INDIVIDUAL).scores[self.user.id], 0)
+
+	def test_award_does_not_overwrite_stale_instance(self):
+		stale = Points.objects.create(user=self.user)
+		Points.award(self.user, 5)
+		stale.add(3)
+		self.assertEqual(stale.score, 8)
+		self.assertEqual(Points.objects.get(user=self.user).score, 8)
+
+	def test_direct_saves_are_recorded_as_adjustments(self):
+		pts = Points.objects.create(user=self.user, score=10)
+		pts.score = 4
+		pts.save()
+		self.assertEqual(self.ledger_total(), 4)
+		self.assertTrue(PointEvent.objects.filter(user=self.user, reason=PointEvent.ADJUSTMENT).exists())
+
+	def test_toggle_twice_restores_score(self):
+		self.client.login(username='alice', password='pass')
+		self.client.post(reverse('leaderboard:task_toggle', args=[first_template(TaskTemplate.DAILY)]))
+		self.client.post(reverse('leaderboard:task_toggle', args=[first_template(TaskTemplate.DAILY)]))
+		self.assertEqual(Points.objects.get(user=self.user).score, 0)
+		self.assertEqual(self.ledger_total(), 0)
+
+	def test_double_create_completes_once(self):
+		# the second click's request: another completion commits while it waits for the lock
+		self.client.login(username='alice', password='pass')
+		tpl = TaskTemplate.objects.get(pk=first_template(TaskTemplate.DAILY))
+		real_lock = Points.lock
+
+		def lock_after_first_click(user):
+			Task.objects.create(user=self.user, template=tpl, title=tpl.title, points=tpl.points, completed=True)
+			Points.award(self.user, tpl.points, PointEvent.TASK)
+			return real_lock(user)
+
+		with mock.patch.object(Points, 'lock', side_effect=lock_after_first_click):
+			self.client.post(reverse('leaderboard:task_toggle', args=[tpl.pk]))
+		# the request saw the first completion and toggled it off instead of adding a second
+		self.assertFalse(Task.objects.filter(user=self.user, template=tpl).exists())
+		self.assertEqual(Points.objects.get(user=self.user).score, 0)
+		self.assertEqual(self.ledger_total(), 0)
+
+	def test_mark_completed_awards_once_for_stale_copies(self):
+		task = Task.objects.create(user=self.user, title='t', points=5)
+		stale = Task.objects.get(pk=task.pk)
+		self.assertTrue(task.mark_completed())
+		self.assertFalse(stale.mark_completed())
+		self.assertEqual(Points.objects.get(user=self.user).score, 5)
+		self.assertTrue(task.mark_incomplete())
+		self.assertFalse(stale.mark_incomplete())
+		self.assertEqual(self.ledger_total(), 0)
+
+	def test_compact_keeps_totals(self):
+		for amount in (5, 10, -5):
+			Points.award(self.user, amount, PointEvent.TASK)
+		recent = Points.award(self.user, 7, PointEvent.TASK)
+		PointEvent.objects.filter(user=self.user).exclude(amount=7).update(created_at=timezone.now() - timezone.timedelta(days=200))
+
+		call_command('compact_point_events', '--days', '90', stdout=StringIO())
+
+		events = list(PointEvent.objects.filter(user=self.user).order_by('created_at').values_list('amount', 'reason'))
+		self.assertEqual(events, [(10, 'compacted'), (7, 'task')])
+		self.assertEqual(self.ledger_total(), recent)
+
+	def test_rebuild_points_from_ledger(self):
+		Points.award(self.user, 12, PointEvent.WEEKLY)
+		Points.objects.filter(user=self.user).update(score=999)
+		other = User.objects.create_user(username='bob', password='pass')
+		PointEvent.objects.create(user=other, amount=4, reason=PointEvent.ADJUSTMENT)
+
+		call_command('rebuild_points', stdout=StringIO())
+
+		self.assertEqual(Points.objects.get(user=self.user).score, 12)
+		self.assertEqual(Points.objects.get(user=other).score, 4)
+		self.assertEqual(ranking.standing(ranking.INDIVIDUAL, other.id)['rank'], 2)
+
+	def test_rebuild_scores_is_set_based(self):
+		users = [User.objects.create_user(username=f'u{i}', password='pass') for i in range(5)]
+		for user in users:
+			Points.award(user, 3, PointEvent.WEEKLY)
+		Points.objects.update(score=0)
+
+		# savepoint, one UPDATE for every score, the missing-rows lookup, release
+		with self.assertNumQueries(4):
+			self.assertEqual(PointEvent.rebuild_scores(), 5)
+		self.assertEqual(list(Points.objects.filter(user__in=users).values_list('score', flat=True)), [3] * 5)
+
+
+class TaskTemplateTests(TestCase):
+	def setUp(self):
+		fd, self.path = tempfile.mkstemp(suffix='.json')
+		os.close(fd)
+		self.addCleanup(os.remove, self.path)
+
+	def write(self, data):
+		with open(self.path, 'w', encoding='utf-8') as f:
+			json.dump(data, f)
+
+	def test_validates_and_numbers_templates(self):
+		self.write([
+			{'title': 'Walk', 'points': '5'},
+			{'title': '', 'points': 1},
+			{'title': 'Bike', 'points': 'lots'},
+			{'title': 'Walk', 'points': 9},
+			{'title': 'Compost', 'content': 'One item', 'points': 15},
+		])
+		with self.assertLogs('leaderboard.task_templates', 'WARNING'):
+			loaded = task_templates.parse(self.path)
+		self.assertEqual(loaded, [
+			{'title': 'Walk', 'content': '', 'points': 5, 'position': 0},
+			{'title': 'Compost', 'content': 'One item', 'points': 15, 'position': 1},
+		])
+
+	def test_unreadable_files_raise(self):
+		with open(self.path, 'w', encoding='utf-8') as f:
+			f.write('{not json')
+		with self.assertRaises(ValueError):
+			task_templates.parse(self.path)
+		self.write({'title': 'Walk'})
+		with self.assertRaises(ValueError):
+			task_templates.parse(self.path)
+		with self.assertRaises(OSError):
+			task_templates.parse(self.path + '.missing')
+
+	def test_seed_links_shared_titles_by_kind(self):
+		user = User.objects.create_user(username='alice', password='pass')
+		daily = Task.objects.create(user=user, title='Stretch', points=1, completed=True)
+		weekly = Task.objects.create(
+			user=user, title='Stretch', points=5, completed=True, image='task_proofs/proof.jpg')
+		TaskTemplate.objects.all().delete()
+		seed_dir = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, seed_dir)
+		for kind, points in (('daily', 1), ('weekly', 5)):
+			with open(os.path.join(seed_dir, f'{kind}_tasks.json'), 'w', encoding='utf-8') as f:
+				json.dump([{'title': 'Stretch', 'points': points}], f)
+
+		migration = importlib.import_module('leaderboard.migrations.0009_task_template')
+		with mock.patch.object(migration, 'SEED_DIR', seed_dir):
+			migration.seed_catalog(django_apps, None)
+
+		daily.refresh_from_db()
+		weekly.refresh_from_db()
+		self.assertEqual((daily.template.kind, weekly.template.kind), ('daily', 'weekly'))
+
+
+@override_settings(STORAGES={
+	"default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+	"staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+class TaskCatalogTests(TestCase):
+	def setUp(self):
+		self.user = User.objects.create_user(username='alice', password='pass')
+		self.client.login(username='alice', password='pass')
+
+	def test_seeded_from_json(self):
+		self.assertEqual(
+			list(TaskTemplate.active_for(TaskTemplate.DAILY).values_list('title', flat=True)),
+			[tpl['title'] for tpl in task_templates.parse(task_templates.FILES[task_templates.DAILY])],
+		)
+
+	def test_toggle_links_completion_to_template(self):
+		template = TaskTemplate.active_for(TaskTemplate.DAILY).last()
+		self.client.post(reverse('leaderboard:task_toggle', args=[template.id]))
+		task = Task.objects.get(user=self.user)
+		self.assertEqual((task.template, task.points), (template, template.points))
+
+		resp = self.client.get(reverse('leaderboard:task_list'))
+		self.assertEqual([t.id for t in resp.context['tasks_done']], [template.id])
+
+	def test_toggle_rejects_unknown_or_inactive_templates(self):
+		weekly = first_template(TaskTemplate.WEEKLY)
+		self.client.post(reverse('leaderboard:task_toggle', args=[weekly]))
+		template = TaskTemplate.active_for(TaskTemplate.DAILY).first()
+		template.active = False
+		template.save()
+		self.client.post(reverse('leaderboard:task_toggle', args=[template.id]))
+		self.assertFalse(Task.objects.filter(user=self.user).exists())
+
+	def test_import_keeps_ids_when_seed_changes(self):
+		template = TaskTemplate.active_for(TaskTemplate.DAILY).first()
+		template.points = 1
+		template.save()
+		extra = TaskTemplate.objects.create(kind=TaskTemplate.DAILY, title='Retired', points=3)
+
+		out = StringIO()
+		call_command('import_task_templates', '--kind', 'daily', '--deactivate-missing', stdout=out)
+
+		self.assertIn('daily: 0 created, 1 updated, 1 deactivated', out.getvalue())
+		template.refresh_from_db()
+		seeds = task_templates.parse(task_templates.FILES[task_templates.DAILY])
+		self.assertEqual(template.points, next(t['points'] for t in seeds if t['title'] == template.title))
+		extra.refresh_from_db()
+		self.assertFalse(extra.active)
+
+
+@override_settings(STORAGES={
+	"default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+	"staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+class FragmentCacheTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		caches['shared'].clear()
+		self.cio = User.objects.create_user(username='cio', password='pass')
+		self.cio.profile.role = 'cio'
+		self.cio.profile.save()
+		self.client.login(username='cio', password='pass')
+
+	def make_event(self, title):
+		return Event(title=title, start_at=timezone.now() + timezone.timedelta(days=1), created_by=self.cio)
+
+	def test_bump_after_commit_changes_only_that_family(self):
+		before = fragments.versions()
+		self.assertEqual(fragments.versions(), before)
+		with self.captureOnCommitCallbacks(execute=True):
+			fragments.bump(fragments.EVENTS)
+			self.assertEqual(fragments.versions(), before)
+		after = fragments.versions()
+		self.assertNotEqual(after[fragments.EVENTS], before[fragments.EVENTS])
+		self.assertEqual(after[fragments.LEADERBOARDS], before[fragments.LEADERBOARDS])
+
+	def test_versions_live_in_the_shared_cache(self):
+		versions = fragments.versions()
+		cache.clear()
+		self.assertEqual(fragments.versions(), versions)
+
+		local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+		with self.settings(CACHES={'default': local, 'shared': local}):
+			self.assertEqual([w.id for w in fragments.check_version_cache(None)], ['leaderboard.W001'])
+		with self.settings(CACHES={
+			'default': local, 'shared': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 't'},
+		}):
+			self.assertEqual(fragments.check_version_cache(None), [])
+
+	def test_events_list_is_served_from_cache_until_an_event_is_saved(self):
+		self.client.get(reverse('leaderboard:events_list'))
+		# bulk_create sends no signals, so the cached list stays as it was
+		Event.objects.bulk_create([self.make_event('Silent cleanup')])
+		self.assertNotContains(self.client.get(reverse('leaderboard:events_list')), 'Silent cleanup')
+
+		with self.captureOnCommitCallbacks(execute=True):
+			self.make_event('Beach cleanup').save()
+		resp = self.client.get(reverse('leaderboard:events_list'))
+		self.assertContains(resp, 'Beach cleanup')
+		self.assertContains(resp, 'Silent cleanup')
+
+	def test_points_award_retires_leaderboard_fragments(self):
+		before = fragments.versions()[fragments.LEADERBOARDS]
+		with self.captureOnCommitCallbacks(execute=True):
+			Points.award(self.cio, 5, PointEvent.TASK)
+		self.assertNotEqual(fragments.versions()[fragments.LEADERBOARDS], before)
+
+	def test_awards_below_the_top_ten_leave_fragments_alone(self):
+		leaders = [User.objects.create_user(username=f'leader{i}', password='pass') for i in range(10)]
+		for leader in leaders:
+			Points.objects.create(user=leader, score=100)
+		student = User.objects.create_user(username='student', password='pass')
+		Friendship.make_friends(self.cio, student)
+		other_cio = User.objects.create_user(username='othercio', password='pass')
+		other_cio.profile.role = 'cio'
+		other_cio.profile.save()
+		ranking.reset()
+		ranking.get_board(ranking.INDIVIDUAL)
+		ranking.get_board(ranking.CIO)
+		ranking.get_board(ranking.member_board(self.cio.id))
+
+		before = fragments.versions(fragments.NAMES + (fragments.member_family(self.cio.id), fragments.member_family(other_cio.id)))
+		with self.captureOnCommitCallbacks(execute=True):
+			Points.award(student, 5, PointEvent.TASK)
+		after = fragments.versions(tuple(before))
+		# still far below the 10th individual; the CIO board has just two rows, and the
+		# student tops their CIO's member board
+		self.assertNotEqual(after[fragments.LEADERBOARDS], before[fragments.LEADERBOARDS])
+		self.assertNotEqual(after[fragments.member_family(self.cio.id)], before[fragments.member_family(self.cio.id)])
+		self.assertEqual(after[fragments.member_family(other_cio.id)], before[fragments.member_family(other_cio.id)])
+
+		Friendship.objects.filter(user=self.cio).delete()
+		ranking.get_board(ranking.INDIVIDUAL)
+		before = fragments.versions()
+		with self.captureOnCommitCallbacks(execute=True):
+			Points.award(student, 5, PointEvent.TASK)
+		self.assertEqual(fragments.versions(), before)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Points.award(student, 200, PointEvent.TASK)
+		self.assertNotEqual(fragments.versions()[fragments.LEADERBOARDS], before[fragments.LEADERBOARDS])
+
+	def test_logins_leave_leaderboard_fragments_alone(self):
+		before = fragments.versions()
+		with self.captureOnCommitCallbacks(execute=True):
+			self.client.login(username='cio', password='pass')
+		self.assertEqual(fragments.versions(), before)
+
+		with self.captureOnCommitCallbacks(execute=True):
+			self.cio.profile.display_name = 'The Club'
+			self.cio.profile.save()
+		self.assertNotEqual(fragments.versions(), before)
+
+	def test_profile_member_board_follows_friendships(self):
+		member = User.objects.create_user(username='member', password='pass')
+		Points.objects.create(user=member, score=10)
+		url = reverse('users:profile', kwargs={'username': 'cio'})
+		self.assertNotContains(self.client.get(url), '<strong>10</strong> pts')
+
+		with self.captureOnCommitCallbacks(execute=True):
+			Friendship.make_friends(self.cio, member)
+		self.assertContains(self.client.get(url), '<strong>10</strong> pts')
@@ -1,19 +1,18 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
-import os, json
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
-from .models import Task, Points
+from .models import Task, TaskTemplate, Points, PointEvent
 from .models import Event
+from . import fragments
 from .forms import EventForm
-from users.models import Profile, Notification
+from users.models import Profile, broadcast_notification, mark_notifications_read
 
 
 UserModel = get_user_model()
@@ -22,24 +21,15 @@ UserModel = get_user_model()
 def task_list(request):
     user = request.user
 
-    tasks_file = os.path.join(settings.BASE_DIR, "leaderboard", "daily_tasks.json")
-    try:
-        with open(tasks_file, "r", encoding="utf-8") as f:
-            templates = json.load(f)
-    except Exception:
-        templates = []
-
     today = timezone.localdate()
 
-    completed_qs = Task.objects.filter(user=user, completed=True, created_at__date=today)
-    completed_titles = set(completed_qs.values_list("title", flat=True))
+    completed_qs = Task.objects.filter(user=user, completed=True, created_at__date=today, template__isnull=False)
+    completed_ids = set(completed_qs.values_list("template_id", flat=True))
 
     tasks_todo = []
     tasks_done = []
-    for idx, tpl in enumerate(templates):
-        tpl_obj = dict(tpl)
-        tpl_obj["idx"] = idx
-        if tpl_obj.get("title") in completed_titles:
+    for tpl_obj in TaskTemplate.active_for(TaskTemplate.DAILY):
+        if tpl_obj.id in completed_ids:
             tasks_done.append(tpl_obj)
         else:
             tasks_todo.append(tpl_obj)
@@ -49,33 +39,27 @@ def task_list(request):
 
 
 @login_required
-def task_toggle(request, idx):
+def task_toggle(request, template_id):
     if request.method != "POST":
         return redirect("leaderboard:task_list")
 
-    tasks_file = os.path.join(settings.BASE_DIR, "leaderboard", "daily_tasks.json")
-    try:
-        with open(tasks_file, "r", encoding="utf-8") as f:
-            templates = json.load(f)
-    except Exception:
-        templates = []
-
-    try:
-        tpl = templates[int(idx)]
-    except Exception:
+    tpl = TaskTemplate.active_for(TaskTemplate.DAILY).filter(pk=template_id).first()
+    if tpl is None:
         return redirect("leaderboard:task_list")
 
     user = request.user
     today = timezone.localdate()
 
-    existing = Task.objects.filter(user=user, title=tpl.get("title"), created_at__date=today, completed=True).first()
-    pts_obj, _ = Points.objects.get_or_create(user=user)
-    if existing:
-        pts_obj.add(-existing.points)
-        existing.delete()
-    else:
-        new = Task.objects.create(user=user, title=tpl.get("title"), content=tpl.get("content", ""), points=int(tpl.get("points", 0)), completed=True)
-        pts_obj.add(new.points)
+    with transaction.atomic():
+        # serialise this user's toggles, so a double-click can't complete the task twice
+        Points.lock(user)
+        existing = Task.objects.filter(user=user, template=tpl, created_at__date=today, completed=True).first()
+        if existing:
+            existing.delete()
+            Points.award(user, -existing.points, PointEvent.TASK_UNDONE)
+        else:
+            new = Task.objects.create(user=user, template=tpl, title=tpl.title, content=tpl.content, points=tpl.points, completed=True)
+            Points.award(user, new.points, PointEvent.TASK)
 
     return redirect("leaderboard:task_list")
 
@@ -83,19 +67,21 @@ def task_toggle(request, idx):
 def events_list(request):
     now = timezone.now()
     
+    # Querysets are lazy: when the cached fragment is hit they never run.
     # Upcoming events: events whose start time hasn't passed yet
     upcoming = Event.objects.filter(
         start_at__gte=now
-    ).order_by('start_at')
+    ).select_related('created_by__profile').order_by('start_at')
     
     # Past events: events whose start time has already passed
     past = Event.objects.filter(
         start_at__lt=now
-    ).order_by('-start_at')  # Most recent first
+    ).select_related('created_by__profile').order_by('-start_at')  # Most recent first
     
     return render(request, "leaderboard/events_list.html", {
         "upcoming_events": upcoming,
-        "past_events": past
+        "past_events": past,
+        **fragments.context(),
     })
 
 
@@ -118,13 +104,7 @@ def event_create(request):
 
             # 🔔 Notify other users about the new event
             detail_url = reverse("leaderboard:event_detail", kwargs={"pk": ev.pk})
-            for user in UserModel.objects.exclude(id=request.user.id):
-                Notification.objects.create(
-                    user=user,
-                    notif_type="event",
-                    text=f"New event: {ev.title}",
-                    url=detail_url,
-                )
+            broadcast_notification("event", f"New event: {ev.title}", detail_url, sender=request.user)
 
             return redirect('leaderboard:events_list')
     else:
@@ -145,12 +125,7 @@ def event_detail(request, pk):
     # 🔔 Mark event notifications for this specific event as read
     if request.user.is_authenticated:
         detail_url = reverse("leaderboard:event_detail", kwargs={"pk": ev.pk})
-        Notification.objects.filter(
-            user=request.user,
-            notif_type="event",
-            url=detail_url,
-            is_read=False,
-        ).update(is_read=True)
+        mark_notifications_read(request.user, notif_type="event", url=detail_url)
 
     return render(request, 'leaderboard/event_detail.html', { 'event': ev })
 
@@ -164,29 +139,20 @@ def weekly_list_view(request):
     within the current Monday->next Monday range.
     """
     user = request.user
-    tasks_file = os.path.join(settings.BASE_DIR, "leaderboard", "weekly_tasks.json")
-    try:
-        with open(tasks_file, "r", encoding="utf-8") as f:
-            templates = json.load(f)
-    except Exception:
-        templates = []
 
     today = timezone.localdate()
     start_of_week = today - timedelta(days=today.weekday())
     end_of_week = start_of_week + timedelta(days=7)
 
-    completed_qs = Task.objects.filter(user=user, completed=True, created_at__date__gte=start_of_week, created_at__date__lt=end_of_week)
-    # map title -> Task for the completed items in the current week
-    completed_map = {t.title: t for t in completed_qs}
-    completed_titles = set(completed_map.keys())
+    completed_qs = Task.objects.filter(user=user, completed=True, created_at__date__gte=start_of_week, created_at__date__lt=end_of_week, template__isnull=False)
+    # map template id -> Task for the completed items in the current week
+    completed_map = {t.template_id: t for t in completed_qs}
 
     tasks_todo = []
     tasks_done = []
-    for idx, tpl in enumerate(templates):
-        tpl_obj = dict(tpl)
-        tpl_obj["idx"] = idx
-        if tpl_obj.get("title") in completed_titles:
-            tpl_obj["task"] = completed_map.get(tpl_obj.get("title"))
+    for tpl_obj in TaskTemplate.active_for(TaskTemplate.WEEKLY):
+        if tpl_obj.id in completed_map:
+            tpl_obj.task = completed_map[tpl_obj.id]
             tasks_done.append(tpl_obj)
         else:
             tasks_todo.append(tpl_obj)
@@ -196,21 +162,13 @@ def weekly_list_view(request):
 
 
 @login_required
-def weekly_toggle(request, idx):
+def weekly_toggle(request, template_id):
     # only allow POST
     if request.method != "POST":
         return redirect("leaderboard:weekly_list")
 
-    tasks_file = os.path.join(settings.BASE_DIR, "leaderboard", "weekly_tasks.json")
-    try:
-        with open(tasks_file, "r", encoding="utf-8") as f:
-            templates = json.load(f)
-    except Exception:
-        templates = []
-
-    try:
-        tpl = templates[int(idx)]
-    except Exception:
+    tpl = TaskTemplate.active_for(TaskTemplate.WEEKLY).filter(pk=template_id).first()
+    if tpl is None:
         return redirect("leaderboard:weekly_list")
 
     user = request.user
@@ -218,19 +176,20 @@ def weekly_toggle(request, idx):
     start_of_week = today - timedelta(days=today.weekday())
     end_of_week = start_of_week + timedelta(days=7)
 
-    existing = Task.objects.filter(user=user, title=tpl.get("title"), completed=True, created_at__date__gte=start_of_week, created_at__date__lt=end_of_week).first()
-    pts_obj, _ = Points.objects.get_or_create(user=user)
-    if existing:
-        pts_obj.add(-existing.points)
-        existing.delete()
-    else:
-        # require uploaded proof for weekly challenges
-        proof = request.FILES.get('proof')
-        if not proof:
+    proof = request.FILES.get('proof')
+    with transaction.atomic():
+        # serialise this user's toggles, so a double-click can't complete the challenge twice
+        Points.lock(user)
+        existing = Task.objects.filter(user=user, template=tpl, completed=True, created_at__date__gte=start_of_week, created_at__date__lt=end_of_week).first()
+        if existing:
+            existing.delete()
+            Points.award(user, -existing.points, PointEvent.WEEKLY_UNDONE)
+        elif proof:
+            new = Task.objects.create(user=user, template=tpl, title=tpl.title, content=tpl.content, points=tpl.points, completed=True, image=proof)
+            Points.award(user, new.points, PointEvent.WEEKLY)
+        else:
+            # require uploaded proof for weekly challenges
             messages.error(request, "You must upload a picture proof to complete a weekly challenge.")
             return redirect('leaderboard:weekly_list')
 
-        new = Task.objects.create(user=user, title=tpl.get("title"), content=tpl.get("content", ""), points=int(tpl.get("points", 0)), completed=True, image=proof)
-        pts_obj.add(new.points)
-
     return redirect("leaderboard:weekly_list")
\ No newline at end of file
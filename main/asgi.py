@@ -2,6 +2,13 @@
 ASGI config for main project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The site itself runs under gunicorn (see Procfile). Serve the chat stream
+endpoints (``social:chat_stream``) from this module instead, e.g. with
+``uvicorn main.asgi:application`` behind a proxy that routes them here, to
+hold streams open without tying up a sync worker. Any number of these
+processes is fine: sends reach them through PostgreSQL NOTIFY (see
+social/events.py).
+Without it the stream answers 204 and chat pages fall back to polling.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
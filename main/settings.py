@@ -212,6 +212,50 @@ LOGIN_URL = 'login'
 
 LOGOUT_REDIRECT_URL = 'logout'
 
+# Number of posts per page in the forum channel feeds
+FORUM_FEED_PAGE_SIZE = int(os.environ.get('FORUM_FEED_PAGE_SIZE', 20))
+
+# Number of top-level comments per page on a forum post
+FORUM_COMMENTS_PAGE_SIZE = int(os.environ.get('FORUM_COMMENTS_PAGE_SIZE', 20))
+
+# In-process background work queue (see main/tasks.py)
+BACKGROUND_TASKS = {
+    'BACKEND': os.environ.get('BACKGROUND_TASKS_BACKEND', 'main.tasks.ThreadPoolBackend'),
+    'WORKERS': int(os.environ.get('BACKGROUND_TASKS_WORKERS', 4)),
+}
+
+# Per-process by default; point CACHE_BACKEND/CACHE_LOCATION at the file or
+# database cache to share cached values (e.g. unread counts) across processes.
+# CACHE_MAX_ENTRIES must hold a count per active user plus the site fragments;
+# Django's default of 300 would keep evicting them
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'project-b-24'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 20000)),
+        },
+    },
+    # Values every process must agree on (leaderboard.fragments versions); the
+    # database cache needs `manage.py createcachetable` (see Procfile)
+    'shared': {
+        'BACKEND': os.environ.get('SHARED_CACHE_BACKEND', (
+            'django.core.cache.backends.locmem.LocMemCache' if DEBUG
+            else 'django.core.cache.backends.db.DatabaseCache')),
+        'LOCATION': os.environ.get('SHARED_CACHE_LOCATION', 'shared' if DEBUG else 'django_cache'),
+    },
+}
+# Cached unread-notification counts are recomputed from the tables this often (seconds)
+NOTIFICATION_COUNT_TIMEOUT = int(os.environ.get('NOTIFICATION_COUNT_TIMEOUT', 300))
+# Site-wide dashboard widgets (top boards, event counts) are rebuilt this often (seconds)
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', 60))
+# Rendered leaderboard/event fragments are kept at most this long (seconds); keep well under
+# the media storage's querystring_expire, since they embed signed image URLs
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', 300))
+
+# Where forum uploads wait on local disk until a worker pushes them to storage
+UPLOAD_SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR', os.path.join(BASE_DIR, 'upload_spool'))
+
 django_heroku.settings(locals())
 
 # AWS Settings
@@ -225,11 +269,15 @@ AWS_DEFAULT_ACL = None
 AWS_S3_FILE_OVERWRITE = False
 AWS_S3_SIGNATURE_VERSION = "s3v4"
 AWS_QUERYSTRING_EXPIRE = 86400
+# Signed media URLs are cached per object for this long (capped at half of
+# AWS_QUERYSTRING_EXPIRE), so rendering a page of images doesn't re-sign each one
+MEDIA_URL_CACHE_TTL = int(os.environ.get('MEDIA_URL_CACHE_TTL', 3600))
+MEDIA_URL_CACHE_SIZE = int(os.environ.get('MEDIA_URL_CACHE_SIZE', 4096))
 
 # Use S3 for media storage
 STORAGES = {
     "default": {
-        "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
+        "BACKEND": "main.storages.CachedS3Storage",
     },
     "staticfiles": {
         "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
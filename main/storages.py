@@ -1,10 +1,83 @@
 from storages.backends.s3boto3 import S3Boto3Storage
 from django.conf import settings
+from collections import OrderedDict
 import logging
 import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Signed URLs are reused for at most this fraction of AWS_QUERYSTRING_EXPIRE,
+# so a URL handed out from the cache is always valid for the rest of it.
+URL_CACHE_TTL_FRACTION = 0.5
+URL_CACHE_SIZE = 4096
+
+
+class SignedURLCache:
+    """Thread-safe LRU of ``name -> url`` whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, ttl, max_size=URL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            url, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[name]
+                return None
+            self._entries.move_to_end(name)
+            return url
+
+    def set(self, name, url):
+        with self._lock:
+            self._entries[name] = (url, time.monotonic() + self.ttl)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, name):
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CachedURLMixin:
+    """Reuse presigned URLs instead of re-signing (SigV4 HMAC) on every ``url()`` call.
+
+    Only plain ``url(name)`` calls are cached; calls with custom parameters,
+    expiry or HTTP method are signed every time. Tune with
+    ``MEDIA_URL_CACHE_TTL`` (seconds) and ``MEDIA_URL_CACHE_SIZE``.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        default_ttl = int(self.querystring_expire * URL_CACHE_TTL_FRACTION)
+        ttl = min(getattr(settings, 'MEDIA_URL_CACHE_TTL', default_ttl), default_ttl)
+        self.url_cache = SignedURLCache(ttl, getattr(settings, 'MEDIA_URL_CACHE_SIZE', URL_CACHE_SIZE))
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        if parameters or expire is not None or http_method or not self.querystring_auth:
+            return super().url(name, parameters=parameters, expire=expire, http_method=http_method)
+        url = self.url_cache.get(name)
+        if url is None:
+            url = super().url(name)
+            self.url_cache.set(name, url)
+        return url
+
+    def delete(self, name):
+        self.url_cache.delete(name)
+        super().delete(name)
+
 
 class StaticStorage(S3Boto3Storage):
     """S3 storage for static files."""
@@ -12,7 +85,11 @@ class StaticStorage(S3Boto3Storage):
     custom_domain = getattr(settings, 'AWS_S3_CUSTOM_DOMAIN', None)
 
 
-class MediaStorage(S3Boto3Storage):
+class CachedS3Storage(CachedURLMixin, S3Boto3Storage):
+    """``S3Boto3Storage`` with cached signed URLs; the default storage in production."""
+
+
+class MediaStorage(CachedURLMixin, S3Boto3Storage):
     """S3 storage for user uploaded media files."""
     location = getattr(settings, 'AWS_MEDIA_LOCATION', 'media')
     file_overwrite = False
@@ -27,13 +104,6 @@ class MediaStorage(S3Boto3Storage):
         logger.debug(f"AWS credentials available: Access Key={bool(os.environ.get('AWS_ACCESS_KEY_ID'))}, Secret Key={bool(os.environ.get('AWS_SECRET_ACCESS_KEY'))}")
         logger.debug(f"Custom domain: {self.custom_domain}")
     
-    def url(self, name):
-        """Override url method to log generated URLs and ensure public access."""
-        logger.debug(f"Generating URL for file: {name}")
-        url = super().url(name)
-        logger.info(f"Generated URL for {name}: {url}")
-        return url
-    
     def save(self, name, content, max_length=None):
         """Override save to add logging."""
         logger.info(f"Starting S3 upload: file name={name}")
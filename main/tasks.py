@@ -0,0 +1,78 @@
+"""Minimal pluggable background work queue.
+
+Work is handed to the backend named by ``settings.BACKGROUND_TASKS['BACKEND']``:
+
+- ``main.tasks.ThreadPoolBackend`` (default): runs tasks on an in-process
+  thread pool of ``WORKERS`` threads, so no broker or extra service is needed
+- ``main.tasks.ImmediateBackend``: runs tasks inline, for tests and scripts
+
+Tasks are plain callables. Anything queued in-process is lost if the
+process exits before it runs, so tasks should leave enough state behind
+(e.g. a spooled file, a status flag) to be retried.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'main.tasks.ThreadPoolBackend',
+    'WORKERS': 4,
+}
+
+
+def _run(func, args, kwargs):
+    try:
+        func(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"Background task {func.__name__} failed: {str(e)}", exc_info=True)
+    finally:
+        # worker threads open their own DB connections; don't leak them
+        connections.close_all()
+
+
+class ImmediateBackend:
+    """Run each task synchronously in the caller's thread."""
+
+    def __init__(self, **options):
+        pass
+
+    def enqueue(self, func, *args, **kwargs):
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Background task {func.__name__} failed: {str(e)}", exc_info=True)
+
+
+class ThreadPoolBackend:
+    """Run tasks concurrently on a process-wide thread pool."""
+
+    def __init__(self, WORKERS=DEFAULTS['WORKERS'], **options):
+        self.executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='background-task')
+
+    def enqueue(self, func, *args, **kwargs):
+        return self.executor.submit(_run, func, args, kwargs)
+
+
+_backends = {}
+_lock = threading.Lock()
+
+
+def get_backend():
+    options = {**DEFAULTS, **getattr(settings, 'BACKGROUND_TASKS', {})}
+    path = options.pop('BACKEND')
+    key = (path, tuple(sorted(options.items())))
+    with _lock:
+        if key not in _backends:
+            _backends[key] = import_string(path)(**options)
+        return _backends[key]
+
+
+def enqueue(func, *args, **kwargs):
+    """Queue ``func(*args, **kwargs)`` on the configured backend."""
+    return get_backend().enqueue(func, *args, **kwargs)
@@ -0,0 +1,236 @@
+"""Pub/sub for pushing new chat messages to open chat tabs.
+
+``send_message`` and ``send_message_api`` publish each new message to the
+conversation's channel; the ``social:chat_stream`` view subscribes to that
+channel and relays messages to the browser as Server-Sent Events. An open
+but idle chat waits on an ``asyncio.Queue`` and runs no queries; the only
+query after connecting is a catch-up of messages the client missed while
+reconnecting.
+
+Sends and streams usually run in different processes (the site under
+gunicorn, the stream under uvicorn, see main/asgi.py), so on PostgreSQL a
+send is announced with ``NOTIFY``, which the database delivers to every
+listening process when the transaction commits. Each process that holds
+streams runs one ``Listener`` thread that ``LISTEN``s, loads the message
+(once per process, and only if someone there is subscribed) and hands it
+to the in-process ``broker``. Other databases (SQLite in development) have
+no such channel, so there the broker is fed directly and only reaches
+streams served by the sending process.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connection, connections, transaction
+
+from .models import ConversationParticipant, Message
+
+logger = logging.getLogger(__name__)
+
+# close each stream after this long so the browser reconnects (and catches up)
+STREAM_TIMEOUT = 300
+# comment line sent to keep proxies from closing an idle connection
+KEEPALIVE_INTERVAL = 15
+# PostgreSQL NOTIFY channel carrying "<conversation id>:<message id>"
+NOTIFY_CHANNEL = "chat_messages"
+# seconds to wait before reconnecting a listener whose connection failed
+RECONNECT_DELAY = 5
+# reconnect delay (ms) suggested to EventSource
+RETRY_MS = 1000
+
+
+class Broker:
+    """Fan out published payloads to asyncio subscribers, from any thread."""
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        """Register a queue for ``channel``; call from the subscriber's event loop."""
+        queue = asyncio.Queue()
+        subscription = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, channel, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channel, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, payload)
+            except RuntimeError:
+                # the subscriber's loop has shut down
+                logger.debug(f"Dropping event for closed subscriber on {channel}")
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+
+broker = Broker()
+
+
+def conversation_channel(convo_id):
+    return f'conversation:{convo_id}'
+
+
+def message_payload(msg, sender_username):
+    """The JSON shape used by ``chat_messages_api`` and the stream."""
+    return {
+        "id": msg.id,
+        "body": msg.body,
+        "created_at": msg.created_at.isoformat(),
+        "sender": sender_username,
+    }
+
+
+def publish_message(msg, sender_username):
+    """Push ``msg`` to its conversation's subscribers once the transaction commits."""
+    if connection.vendor == "postgresql":
+        # held back by the database until commit, then sent to every listener
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [NOTIFY_CHANNEL, f"{msg.conversation_id}:{msg.id}"])
+        return
+    payload = message_payload(msg, sender_username)
+    channel = conversation_channel(msg.conversation_id)
+    transaction.on_commit(lambda: broker.publish(channel, payload))
+
+
+def relay_notification(notification):
+    """Publish the message named by a ``NOTIFY`` payload to this process's subscribers."""
+    convo_id, message_id = (int(part) for part in notification.split(":"))
+    channel = conversation_channel(convo_id)
+    if not broker.subscriber_count(channel):
+        return
+    msg = Message.objects.select_related("sender").filter(pk=message_id).first()
+    if msg is not None:
+        broker.publish(channel, message_payload(msg, msg.sender.username))
+
+
+class Listener(threading.Thread):
+    """``LISTEN`` on ``NOTIFY_CHANNEL`` and relay each notification, reconnecting on errors."""
+
+    def __init__(self):
+        super().__init__(name="chat-listener", daemon=True)
+
+    def run(self):
+        while True:
+            try:
+                self.listen()
+            except Exception as e:
+                logger.warning(f"Chat listener lost its connection, retrying: {str(e)}")
+                time.sleep(RECONNECT_DELAY)
+
+    def listen(self):
+        db = connections["default"]
+        # a connection of its own, outside Django's per-thread handling
+        conn = db.get_new_connection(db.get_connection_params())
+        try:
+            conn.autocommit = True
+            conn.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            for notify in conn.notifies():
+                try:
+                    relay_notification(notify.payload)
+                except Exception as e:
+                    logger.error(f"Could not relay chat notification {notify.payload!r}: {str(e)}", exc_info=True)
+                finally:
+                    close_old_connections()
+        finally:
+            conn.close()
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def ensure_listener():
+    """Start this process's ``Listener`` (PostgreSQL with psycopg 3 only)."""
+    global _listener
+    if connection.vendor != "postgresql":
+        return
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    with _listener_lock:
+        if _listener is not None:
+            return
+        if not is_psycopg3:
+            logger.warning("Chat streams need psycopg 3 to LISTEN; only same-process sends will arrive")
+            _listener = False
+            return
+        _listener = Listener()
+        _listener.start()
+
+
+def format_event(payload):
+    return f'id: {payload["id"]}\ndata: {json.dumps(payload)}\n\n'
+
+
+@sync_to_async
+def _messages_after(convo_id, after_id):
+    msgs = (
+        Message.objects
+        .filter(conversation_id=convo_id, id__gt=after_id)
+        .select_related("sender")
+        .order_by("id")
+    )
+    return [message_payload(m, m.sender.username) for m in msgs]
+
+
+@sync_to_async
+def _mark_read(convo_id, user_id, message_id):
+    ConversationParticipant.mark_read(convo_id, user_id, message_id)
+
+
+async def message_stream(convo_id, after_id=None, timeout=STREAM_TIMEOUT, reader_id=None):
+    """Yield SSE frames for messages in ``convo_id`` newer than ``after_id``.
+
+    If ``reader_id`` is given, that user's read marker follows the messages
+    delivered, so chats read live don't show up as unread in the sidebar.
+    """
+    channel = conversation_channel(convo_id)
+    loop = asyncio.get_running_loop()
+    ensure_listener()
+    # subscribe before catching up so nothing published in between is lost
+    subscription = broker.subscribe(channel)
+    queue = subscription[1]
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+
+        last_id = after_id or 0
+        if after_id is not None:
+            backlog = await _messages_after(convo_id, after_id)
+            for payload in backlog:
+                last_id = payload["id"]
+                yield format_event(payload)
+            if backlog and reader_id:
+                await _mark_read(convo_id, reader_id, last_id)
+
+        deadline = loop.time() + timeout
+        while (remaining := deadline - loop.time()) > 0:
+            try:
+                payload = await asyncio.wait_for(queue.get(), min(KEEPALIVE_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if payload["id"] <= last_id:
+                continue
+            last_id = payload["id"]
+            yield format_event(payload)
+            if reader_id:
+                await _mark_read(convo_id, reader_id, last_id)
+    finally:
+        broker.unsubscribe(channel, subscription)
@@ -0,0 +1,97 @@
+"""Conversation list for the chat sidebar, loaded in a fixed number of queries.
+
+``sidebar_conversations`` runs three queries whatever the number of
+conversations: the conversations with their denormalized latest-message
+preview, their participants, and the unread counts. Unread messages are
+the ones after each participant's ``last_read_message_id``, so counting
+them is a range scan on ``(conversation, id)`` and only touches
+conversations that actually have something unread.
+"""
+from django.db.models import Count, F
+
+from .models import ConversationParticipant, Message
+
+SNIPPET_LENGTH = 60
+GROUP_NAME_MEMBERS = 3
+
+
+def _display_name(convo_id, participants, user):
+    if len(participants) > 2:
+        # Auto name: comma-separated first names
+        group_name = ", ".join(p.first_name or p.username for p in participants[:GROUP_NAME_MEMBERS])
+        if len(participants) > GROUP_NAME_MEMBERS:
+            group_name += " + others"
+        return f"👥 {group_name}"
+    other = next((p for p in participants if p.id != user.id), None)
+    return other.username if other else f"Conversation {convo_id}"
+
+
+def sidebar_conversations(user):
+    """Return a dict per conversation of ``user``, most recently active first.
+
+    Keys: ``id``, ``display``, ``is_group``, ``last_message`` (``{"snippet",
+    "sender", "created_at"}`` or None) and ``unread``.
+    """
+    memberships = list(
+        ConversationParticipant.objects
+        .filter(user=user)
+        .order_by(F("conversation__last_message_at").desc(nulls_last=True), "-conversation__updated_at")
+        .values(
+            "conversation_id",
+            "last_read_message_id",
+            "conversation__last_message_id",
+            "conversation__last_message_at",
+            "conversation__last_message_preview",
+            "conversation__last_message__sender__username",
+        )
+    )
+    if not memberships:
+        return []
+    convo_ids = [m["conversation_id"] for m in memberships]
+
+    participants = {}
+    members = (
+        ConversationParticipant.objects
+        .filter(conversation_id__in=convo_ids)
+        .select_related("user")
+        .only("conversation_id", "user__id", "user__username", "user__first_name")
+        .order_by("id")
+    )
+    for member in members:
+        participants.setdefault(member.conversation_id, []).append(member.user)
+
+    unread_ids = [
+        m["conversation_id"] for m in memberships
+        if (m["conversation__last_message_id"] or 0) > m["last_read_message_id"]
+    ]
+    unread = {}
+    if unread_ids:
+        unread = dict(
+            Message.objects
+            .filter(
+                conversation_id__in=unread_ids,
+                conversation__conversationparticipant__user=user,
+                id__gt=F("conversation__conversationparticipant__last_read_message_id"),
+            )
+            .exclude(sender=user)
+            .values("conversation_id")
+            .annotate(n=Count("id"))
+            .values_list("conversation_id", "n")
+        )
+
+    items = []
+    for m in memberships:
+        convo_id = m["conversation_id"]
+        members = participants.get(convo_id, [])
+        items.append({
+            "id": convo_id,
+            "display": _display_name(convo_id, members, user),
+            "is_group": len(members) > 2,
+            "last_message": {
+                "snippet": m["conversation__last_message_preview"][:SNIPPET_LENGTH],
+                "sender": m["conversation__last_message__sender__username"],
+                "created_at": m["conversation__last_message_at"],
+            } if m["conversation__last_message_id"] else None,
+            "unread": unread.get(convo_id, 0),
+        })
+    return items
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_last_message(apps, schema_editor):
+    Conversation = apps.get_model('social', 'Conversation')
+    ConversationParticipant = apps.get_model('social', 'ConversationParticipant')
+    Message = apps.get_model('social', 'Message')
+    latest = (
+        Message.objects.values('conversation_id')
+        .annotate(last_id=models.Max('id'))
+        .values_list('last_id', flat=True)
+    )
+    for msg in Message.objects.filter(id__in=list(latest)).only('id', 'conversation_id', 'body', 'created_at'):
+        Conversation.objects.filter(pk=msg.conversation_id).update(
+            last_message_id=msg.id,
+            last_message_at=msg.created_at,
+            last_message_preview=msg.body[:100],
+        )
+        # treat history from before unread tracking as read
+        ConversationParticipant.objects.filter(conversation_id=msg.conversation_id).update(
+            last_read_message_id=msg.id,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='social.message'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message_preview',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='last_read_message_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['-last_message_at', '-updated_at'], name='social_convo_inbox_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'id'], name='social_message_convo_idx'),
+        ),
+        migrations.RunPython(backfill_last_message, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:55
+
+from django.db import migrations, models
+
+
+def backfill_dm_key(apps, schema_editor):
+    Conversation = apps.get_model('social', 'Conversation')
+    ConversationParticipant = apps.get_model('social', 'ConversationParticipant')
+    two_person = (
+        Conversation.objects.annotate(total=models.Count('participants', distinct=True))
+        .filter(total=2)
+        .order_by('-updated_at', 'id')
+        .values_list('id', flat=True)
+    )
+    members = {}
+    for convo_id, user_id in ConversationParticipant.objects.filter(
+        conversation_id__in=list(two_person)
+    ).values_list('conversation_id', 'user_id'):
+        members.setdefault(convo_id, []).append(user_id)
+
+    seen = set()
+    # same precedence as the old lookup: the most recently updated DM wins,
+    # racing duplicates keep working as keyless conversations
+    for convo_id in two_person:
+        low, high = sorted(members[convo_id])
+        key = f'{low}:{high}'
+        if key in seen:
+            continue
+        seen.add(key)
+        Conversation.objects.filter(pk=convo_id).update(dm_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('social', '0002_conversation_last_message'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversation',
+            name='dm_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_dm_key, migrations.RunPython.noop),
+    ]
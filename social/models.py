@@ -1,7 +1,7 @@
 # social/models.py
 from django.conf import settings
-from django.db import models, transaction
-from django.db.models import Q, UniqueConstraint, Count, F
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q, UniqueConstraint, F
 from django.contrib.auth import get_user_model
 
 User = settings.AUTH_USER_MODEL
@@ -102,36 +102,75 @@ class Conversation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Latest message, kept up to date by social.signals so inbox ordering and
+    # previews don't aggregate over Message
+    last_message = models.ForeignKey(
+        "Message",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+        editable=False,
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_message_preview = models.CharField(max_length=100, blank=True, editable=False)
+    # "<low user id>:<high user id>" for one-to-one chats, NULL for groups;
+    # unique, so there is at most one DM per pair of users
+    dm_key = models.CharField(max_length=64, null=True, blank=True, unique=True, editable=False)
+
+    PREVIEW_LENGTH = 100
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-last_message_at", "-updated_at"], name="social_convo_inbox_idx"),
+        ]
+
+    def record_message(self, msg):
+        """Make ``msg`` the latest message unless a newer one is already recorded."""
+        Conversation.objects.filter(
+            Q(last_message__isnull=True) | Q(last_message_id__lt=msg.id),
+            pk=self.pk,
+        ).update(
+            last_message=msg,
+            last_message_at=msg.created_at,
+            last_message_preview=msg.body[:self.PREVIEW_LENGTH],
+        )
+
+    def refresh_last_message(self):
+        """Recompute the latest message from scratch, e.g. after one is deleted."""
+        msg = self.messages.order_by("-id").only("id", "body", "created_at").first()
+        Conversation.objects.filter(pk=self.pk).update(
+            last_message=msg,
+            last_message_at=msg.created_at if msg else None,
+            last_message_preview=msg.body[:self.PREVIEW_LENGTH] if msg else "",
+        )
+
+    @staticmethod
+    def dm_key_for(u1, u2):
+        """Canonical key of the DM between two users: ``"<low id>:<high id>"``."""
+        low, high = sorted((u1.id, u2.id))
+        return f"{low}:{high}"
+
     @staticmethod
     def get_or_create_dm(u1, u2):
         if u1.id == u2.id:
             return None
-        qs = (
-            Conversation.objects
-            .annotate(total=Count("participants", distinct=True))
-            .filter(total=2)
-            .annotate(
-                match=Count(
-                    "participants",
-                    filter=Q(participants__in=[u1.id, u2.id]),
-                    distinct=True,
-                )
-            )
-            .filter(match=2)
-            .order_by("-updated_at", "id")
-        )
-
-        convo = qs.first()
+        key = Conversation.dm_key_for(u1, u2)
+        convo = Conversation.objects.filter(dm_key=key).first()
         if convo:
             return convo
 
-        with transaction.atomic():
-            convo = Conversation.objects.create()
-            ConversationParticipant.objects.get_or_create(
-                conversation=convo, user=u1)
-            ConversationParticipant.objects.get_or_create(
-                conversation=convo, user=u2)
-            return convo
+        try:
+            with transaction.atomic():
+                convo = Conversation.objects.create(dm_key=key)
+                ConversationParticipant.objects.bulk_create([
+                    ConversationParticipant(conversation=convo, user=u1),
+                    ConversationParticipant(conversation=convo, user=u2),
+                ])
+                return convo
+        except IntegrityError:
+            # a concurrent request created it first
+            return Conversation.objects.get(dm_key=key)
 
 
 class ConversationParticipant(models.Model):
@@ -142,10 +181,24 @@ class ConversationParticipant(models.Model):
         )
     
     joined_at = models.DateTimeField(auto_now_add=True)
+    # id of the newest message this user has seen; anything after it from
+    # someone else is unread
+    last_read_message_id = models.BigIntegerField(default=0)
 
     class Meta:
         unique_together = [("conversation", "user")]
 
+    @staticmethod
+    def mark_read(conversation, user, message_id):
+        """Move ``user``'s read marker forward to ``message_id`` (never back)."""
+        if not message_id:
+            return
+        ConversationParticipant.objects.filter(
+            conversation=conversation,
+            user=user,
+            last_read_message_id__lt=message_id,
+        ).update(last_read_message_id=message_id)
+
 
 class Message(models.Model):
     conversation = models.ForeignKey(
@@ -164,3 +217,6 @@ class Message(models.Model):
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["conversation", "id"], name="social_message_convo_idx"),
+        ]
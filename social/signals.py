@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Conversation, ConversationParticipant, Message
+
+
+@receiver(post_save, sender=Message)
+def record_last_message(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    Conversation(pk=instance.conversation_id).record_message(instance)
+    # your own message is never unread
+    ConversationParticipant.mark_read(instance.conversation_id, instance.sender_id, instance.id)
+
+
+@receiver(post_delete, sender=Message)
+def refresh_last_message(sender, instance, **kwargs):
+    convo = Conversation.objects.filter(pk=instance.conversation_id, last_message_id__isnull=True).first()
+    if convo is not None:
+        convo.refresh_last_message()
@@ -1,3 +1,215 @@
+import asyncio
+import json
+import threading
+import time
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from django.urls import reverse
+
+from . import events
+from .inbox import sidebar_conversations
+from .models import Conversation, ConversationParticipant, Message
+
+User = get_user_model()
+
+
+class BrokerTests(TestCase):
+    def test_publish_from_another_thread_reaches_subscriber(self):
+        broker = events.Broker()
+
+        async def receive():
+            subscription = broker.subscribe("chan")
+            threading.Thread(target=broker.publish, args=("chan", {"id": 1})).start()
+            try:
+                return await asyncio.wait_for(subscription[1].get(), 1)
+            finally:
+                broker.unsubscribe("chan", subscription)
+
+        self.assertEqual(asyncio.run(receive()), {"id": 1})
+        self.assertEqual(broker.subscriber_count("chan"), 0)
+
+    def test_publish_without_subscribers_is_a_no_op(self):
+        events.Broker().publish("nobody", {"id": 1})
+
+
+class ChatStreamTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.bob = User.objects.create_user("bob", password="pw")
+        self.convo = Conversation.get_or_create_dm(self.alice, self.bob)
+
+    def frames(self, after_id=None, timeout=0.5):
+        """Collect the data frames of a short-lived stream."""
+        async def collect():
+            return [chunk async for chunk in events.message_stream(self.convo.id, after_id, timeout)]
+        return [
+            json.loads(line[len("data: "):])
+            for chunk in async_to_sync(collect)()
+            for line in chunk.splitlines()
+            if line.startswith("data: ")
+        ]
+
+    def test_sent_message_is_published_after_commit(self):
+        self.client.force_login(self.alice)
+        url = reverse("social:send_message_api", args=[self.convo.id])
+        published = []
+        original = events.broker.publish
+        events.broker.publish = lambda channel, payload: published.append((channel, payload))
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(url, {"body": "hi"})
+        finally:
+            events.broker.publish = original
+
+        channel, payload = published[0]
+        self.assertEqual(channel, events.conversation_channel(self.convo.id))
+        self.assertEqual((payload["body"], payload["sender"]), ("hi", "alice"))
+
+    def test_stream_catches_up_from_last_event_id(self):
+        first = Message.objects.create(conversation=self.convo, sender=self.alice, body="one")
+        Message.objects.create(conversation=self.convo, sender=self.bob, body="two")
+        self.assertEqual([f["body"] for f in self.frames(after_id=first.id)], ["two"])
+
+    def test_idle_stream_runs_no_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.frames(), [])
+
+    def test_notification_from_another_process_reaches_the_stream(self):
+        first = Message.objects.create(conversation=self.convo, sender=self.alice, body="one")
+
+        async def collect():
+            frames = []
+            async for chunk in events.message_stream(self.convo.id, first.id, timeout=1):
+                frames.append(chunk)
+                if len(frames) == 1:
+                    # what the Listener thread does with "<conversation>:<message>"
+                    msg = await sync_to_async(Message.objects.create)(
+                        conversation=self.convo, sender=self.bob, body="two")
+                    await sync_to_async(events.relay_notification)(f"{self.convo.id}:{msg.id}")
+                elif '"two"' in chunk:
+                    break
+            return frames
+
+        started = time.monotonic()
+        frames = async_to_sync(collect)()
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertIn('"two"', frames[-1])
+
+    def test_notification_without_subscribers_runs_no_queries(self):
+        msg = Message.objects.create(conversation=self.convo, sender=self.bob, body="two")
+        with self.assertNumQueries(0):
+            events.relay_notification(f"{self.convo.id}:{msg.id}")
+
+    def test_stream_requires_participation(self):
+        carol = User.objects.create_user("carol", password="pw")
+        self.client.force_login(carol)
+        response = self.client.get(reverse("social:chat_stream", args=[self.convo.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_stream_falls_back_outside_asgi(self):
+        self.client.force_login(self.alice)
+        response = self.client.get(reverse("social:chat_stream", args=[self.convo.id]))
+        self.assertEqual(response.status_code, 204)
+
+    async def test_stream_is_served_under_asgi(self):
+        await self.async_client.aforce_login(self.alice)
+        response = await self.async_client.get(reverse("social:chat_stream", args=[self.convo.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        await response.streaming_content.aclose()
+
+
+class SidebarTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.friends = [User.objects.create_user(f"friend{i}", password="pw") for i in range(4)]
+
+    def test_constant_queries_and_fields(self):
+        for friend in self.friends:
+            convo = Conversation.get_or_create_dm(self.alice, friend)
+            Message.objects.create(conversation=convo, sender=friend, body="x" * 500)
+        group = Conversation.objects.create()
+        for user in [self.alice] + self.friends:
+            group.participants.add(user)
+
+        with self.assertNumQueries(3):
+            items = sidebar_conversations(self.alice)
+
+        self.assertEqual(len(items), 5)
+        dm = next(i for i in items if i["display"] == "friend0")
+        self.assertFalse(dm["is_group"])
+        self.assertEqual(dm["unread"], 1)
+        self.assertEqual(dm["last_message"]["sender"], "friend0")
+        self.assertLess(len(dm["last_message"]["snippet"]), 500)
+
+        grp = next(i for i in items if i["is_group"])
+        self.assertEqual(grp["display"], "👥 alice, friend0, friend1 + others")
+        self.assertIsNone(grp["last_message"])
+        self.assertEqual(grp["unread"], 0)
+
+
+class LastMessageTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.bob = User.objects.create_user("bob", password="pw")
+        self.convo = Conversation.get_or_create_dm(self.alice, self.bob)
+
+    def participant(self, user):
+        return ConversationParticipant.objects.get(conversation=self.convo, user=user)
+
+    def test_new_message_updates_conversation_and_sender_read_marker(self):
+        msg = Message.objects.create(conversation=self.convo, sender=self.alice, body="hello there")
+        self.convo.refresh_from_db()
+        self.assertEqual(self.convo.last_message_id, msg.id)
+        self.assertEqual(self.convo.last_message_preview, "hello there")
+        self.assertEqual(self.participant(self.alice).last_read_message_id, msg.id)
+        self.assertEqual(self.participant(self.bob).last_read_message_id, 0)
+
+    def test_deleting_latest_message_falls_back_to_previous(self):
+        first = Message.objects.create(conversation=self.convo, sender=self.alice, body="one")
+        Message.objects.create(conversation=self.convo, sender=self.bob, body="two").delete()
+        self.convo.refresh_from_db()
+        self.assertEqual(self.convo.last_message_id, first.id)
+        self.assertEqual(self.convo.last_message_preview, "one")
+
+    def test_unread_counts_follow_read_marker(self):
+        for body in ("a", "b", "c"):
+            Message.objects.create(conversation=self.convo, sender=self.bob, body=body)
+        self.assertEqual(sidebar_conversations(self.alice)[0]["unread"], 3)
+
+        self.client.force_login(self.alice)
+        self.client.get(reverse("social:chat_messages_api", args=[self.convo.id]))
+        self.assertEqual(sidebar_conversations(self.alice)[0]["unread"], 0)
+        self.assertEqual(sidebar_conversations(self.bob)[0]["unread"], 0)
+
+
+class DirectMessageTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user("alice", password="pw")
+        self.bob = User.objects.create_user("bob", password="pw")
+
+    def test_same_dm_either_way_round(self):
+        convo = Conversation.get_or_create_dm(self.alice, self.bob)
+        self.assertEqual(Conversation.get_or_create_dm(self.bob, self.alice), convo)
+        self.assertEqual(convo.dm_key, f"{self.alice.id}:{self.bob.id}")
+        self.assertEqual(convo.participants.count(), 2)
+
+    def test_lookup_is_a_single_query(self):
+        Conversation.get_or_create_dm(self.alice, self.bob)
+        with self.assertNumQueries(1):
+            Conversation.get_or_create_dm(self.alice, self.bob)
+
+    def test_lost_creation_race_returns_existing_dm(self):
+        existing = Conversation.objects.create(dm_key=Conversation.dm_key_for(self.alice, self.bob))
+        real_filter = Conversation.objects.filter
+        with mock.patch.object(Conversation.objects, "filter",
+                               side_effect=lambda *a, **kw: real_filter(pk=None)):
+            convo = Conversation.get_or_create_dm(self.alice, self.bob)
+        self.assertEqual(convo, existing)
+        self.assertEqual(Conversation.objects.count(), 1)
 
-# Create your tests here.
+    def test_no_dm_with_yourself(self):
+        self.assertIsNone(Conversation.get_or_create_dm(self.alice, self.alice))
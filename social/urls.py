@@ -35,6 +35,8 @@ urlpatterns = [
          views.chat_messages_api, name="chat_messages_api"),
     path("api/chats/<int:convo_id>/send/",
          views.send_message_api, name="send_message_api"),
+    path("api/chats/<int:convo_id>/stream/",
+         views.chat_stream, name="chat_stream"),
     
 
 ]
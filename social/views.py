@@ -1,18 +1,21 @@
 # social/views.py
 from django.views.decorators.http import require_http_methods
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.shortcuts import get_object_or_404, redirect, render
 from django.db.models import Q, Value
 from django.db.models.functions import Concat
-from django.db.models import Max
+from django.db.models import F
 from django.urls import reverse
-from users.models import Notification
+from users.models import create_notification, mark_notifications_read, notify_users
 
 from django.conf import settings
 from .models import FriendRequest, Friendship, Conversation, Message, ConversationParticipant
+from . import events
+from .inbox import sidebar_conversations
 from users.models import Profile
 User = settings.AUTH_USER_MODEL
 
@@ -101,11 +104,11 @@ def send_friend_request(request, user_id):
     messages.success(request, "Friend request sent.")
 
     # Notify the recipient about the friend request
-    Notification.objects.create(
-        user=to_user,
-        notif_type="friend_request",
-        text=f"{request.user.username} sent you a friend request",
-        url=reverse("social:incoming_requests"),
+    create_notification(
+        to_user,
+        "friend_request",
+        f"{request.user.username} sent you a friend request",
+        reverse("social:incoming_requests"),
     )
 
     if isinstance(redirect_url, str):
@@ -190,18 +193,12 @@ def send_message(request, convo_id):
             sender=request.user,
             body=body
         )
+        events.publish_message(msg, request.user.username)
 
         # 🔔 create notifications for everyone else in the convo
         recipients = convo.participants.exclude(id=request.user.id)
         url = reverse("social:chat_detail", kwargs={"convo_id": convo.id})
-
-        for user in recipients:
-            Notification.objects.create(
-                user=user,
-                notif_type="message",
-                text=f"New message from {request.user.username}",
-                url=url,
-            )
+        notify_users(recipients, "message", f"New message from {request.user.username}", url)
 
     return redirect("social:chat_detail", convo_id=convo.id)
 
@@ -226,54 +223,26 @@ def friends_list(request):
 def chat_list(request):
     convos_qs = (
         request.user.conversations
-        .prefetch_related("participants", "messages")
-        .annotate(last_msg_at=Max("messages__created_at"))
-        .order_by("-last_msg_at", "-updated_at")
+        .select_related("last_message")
+        .prefetch_related("participants")
+        .order_by(F("last_message_at").desc(nulls_last=True), "-updated_at")
     )
 
     items = []
     for c in convos_qs:
-        other = c.participants.exclude(id=request.user.id).first()
+        other = next((p for p in c.participants.all() if p.id != request.user.id), None)
         items.append({
             "id": c.id,
             "other": other,                         # a User object
             "display": other.get_full_name() or other.username if other else f"Conversation {c.id}",
-            "last": c.messages.last(),
+            "last": c.last_message,
         })
 
     return render(request, "social/chat_list.html", {"items": items})
 
 
 def _sidebar_convos(request):
-    qs = (
-        request.user.conversations
-        .prefetch_related("participants", "messages")
-        .annotate(last_msg_at=Max("messages__created_at"))
-        .order_by("-last_msg_at", "-updated_at")
-    )
-
-    convos = []
-    for c in qs:
-        participants = list(c.participants.all())
-
-        # Group chat if more than 2 members
-        if len(participants) > 2:
-            # Auto name: comma-separated first names
-            group_name = ", ".join([p.first_name or p.username for p in participants[:3]])
-            if len(participants) > 3:
-                group_name += " + others"
-            display = f"👥 {group_name}"
-        else:
-            # 1-on-1 chat
-            other = c.participants.exclude(id=request.user.id).first()
-            display = other.username if other else f"Conversation {c.id}"
-
-        convos.append({
-            "id": c.id,
-            "display": display,
-            "is_group": len(participants) > 2
-        })
-    return convos
+    return sidebar_conversations(request.user)
 
 
 @login_required
@@ -284,16 +253,12 @@ def chat_detail(request, convo_id):
     msgs = convo.messages.select_related("sender").all()
     participants = convo.participants.all()
     other = participants.exclude(id=request.user.id).first()
+    ConversationParticipant.mark_read(convo, request.user, convo.last_message_id)
     convos = _sidebar_convos(request)
 
     # 🔔 mark message notifications for this convo as read
     url = reverse("social:chat_detail", kwargs={"convo_id": convo.id})
-    Notification.objects.filter(
-        user=request.user,
-        notif_type="message",
-        url=url,
-        is_read=False,
-    ).update(is_read=True)
+    mark_notifications_read(request.user, notif_type="message", url=url)
 
     return render(
         request,
@@ -316,16 +281,12 @@ def chat_messages_api(request, convo_id):
         Conversation, id=convo_id, participants=request.user)
     after = request.GET.get("after")
     qs = convo.messages.select_related("sender")
+    fields = ("id", "body", "created_at", "sender__username")
     if after:
-        qs = qs.filter(id__gt=after)
-
-    if not after:
-        qs = qs.order_by("-id")[:50]
-
-    msgs = qs.order_by("id").values(
-        "id", "body", "created_at",
-        "sender__username",
-    )
+        msgs = qs.filter(id__gt=after).order_by("id").values(*fields)
+    else:
+        # latest 50, oldest first (a sliced queryset can't be re-ordered)
+        msgs = reversed(qs.order_by("-id").values(*fields)[:50])
 
     data = [{
         "id": m["id"],
@@ -333,6 +294,8 @@ def chat_messages_api(request, convo_id):
         "created_at": m["created_at"].isoformat(),
         "sender": m["sender__username"],
     } for m in msgs]
+    if data:
+        ConversationParticipant.mark_read(convo, request.user, data[-1]["id"])
 
     return JsonResponse({"messages": data})
 
@@ -348,30 +311,48 @@ def send_message_api(request, convo_id):
 
     msg = Message.objects.create(
         conversation=convo, sender=request.user, body=body)
+    events.publish_message(msg, request.user.username)
 
     # 🔔 notifications for API-based send (same recipients logic)
     recipients = convo.participants.exclude(id=request.user.id)
     url = reverse("social:chat_detail", kwargs={"convo_id": convo.id})
-
-    for user in recipients:
-        Notification.objects.create(
-            user=user,
-            notif_type="message",
-            text=f"New message from {request.user.username}",
-            url=url,
-        )
+    notify_users(recipients, "message", f"New message from {request.user.username}", url)
 
     return JsonResponse({
         "ok": True,
-        "message": {
-            "id": msg.id,
-            "body": msg.body,
-            "created_at": msg.created_at.isoformat(),
-            "sender": request.user.username,
-        }
+        "message": events.message_payload(msg, request.user.username),
     }, status=201)
 
 
+@login_required
+async def chat_stream(request, convo_id):
+    """Push new messages in a conversation as Server-Sent Events.
+
+    Only served under ASGI; elsewhere it answers 204, which tells
+    EventSource to stop reconnecting so the page falls back to polling.
+    """
+    user = await request.auser()
+    if not await Conversation.objects.filter(id=convo_id, participants=user).aexists():
+        raise Http404("No Conversation matches the given query.")
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    after = request.headers.get("Last-Event-ID") or request.GET.get("after")
+    try:
+        after_id = int(after) if after else None
+    except ValueError:
+        after_id = None
+
+    response = StreamingHttpResponse(
+        events.message_stream(convo_id, after_id, reader_id=user.id),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # stop nginx-style proxies from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 
 @login_required
 def find_cios(request):
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 
-from .models import Profile, Interest, ProfilePicture
+from .models import Profile, Interest, ProfilePicture, BroadcastNotification
 
 
 class ProfilePictureAdmin(admin.ModelAdmin):
@@ -57,5 +57,14 @@ class ProfileAdmin(admin.ModelAdmin):
                promote_to_moderator, demote_from_moderator]
 
 
+@admin.register(BroadcastNotification)
+class BroadcastNotificationAdmin(admin.ModelAdmin):
+    """Site-wide announcements: one row, shown to every user."""
+    list_display = ('text', 'notif_type', 'sender', 'created_at')
+    list_filter = ('notif_type',)
+    search_fields = ('text',)
+    readonly_fields = ('created_at',)
+
+
 admin.site.register(Interest)
 admin.site.register(ProfilePicture, ProfilePictureAdmin)
@@ -1,12 +1,9 @@
-from .models import Notification
+from .models import unread_notification_count
 
 def unread_notifications(request):
     has_any = False
     count = 0
     if request.user.is_authenticated:
-        count = Notification.objects.filter(
-            user=request.user,
-            is_read=False,
-        ).count()
+        count = unread_notification_count(request.user)
         has_any = count > 0
-    return {"has_unread_notifications": has_any, "unread_notifications_count": count}
\ No newline at end of file
+    return {"has_unread_notifications": has_any, "unread_notifications_count": count}
@@ -0,0 +1,196 @@
+"""Data for the dashboard page, loaded in a handful of queries.
+
+The page has two kinds of widgets:
+
+- site-wide ones that look the same to every viewer (top individuals, top
+  CIOs, upcoming/past events, how many daily and weekly tasks exist).
+  ``site_widgets`` builds them together and caches the result for
+  ``DASHBOARD_CACHE_TIMEOUT`` seconds, so most requests never query them,
+  and the template caches their rendered HTML (``leaderboard.fragments``);
+- per-user ones (score, rank, task progress, a CIO's member board, unread
+  count), built by ``user_widgets`` on every request. Ranks come from the
+  in-memory boards in ``leaderboard.ranking``, progress for both task
+  kinds is a single aggregate and the users around the viewer's rank are
+  fetched in one ``in_bulk``. A CIO's member board is only built when its
+  rendered fragment is not cached.
+
+``load`` returns the template context plus a ``Timings`` with the
+milliseconds spent in each section; the view sends them as a
+``Server-Timing`` header so they show up in the browser's dev tools.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from functools import partial
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from leaderboard import fragments, ranking
+from leaderboard.cio_scores import top_cios
+from leaderboard.models import Event, Points, Task, TaskTemplate
+
+from .models import Profile, unread_notification_count
+
+logger = logging.getLogger(__name__)
+
+SITE_CACHE_KEY = "dashboard:site"
+DEFAULT_CACHE_TIMEOUT = 60
+BOARD_SIZE = 10
+PAST_EVENTS = 5
+
+
+class Timings:
+    """Wall-clock milliseconds per named section."""
+
+    def __init__(self):
+        self.sections = {}
+
+    @contextmanager
+    def section(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections[name] = (time.perf_counter() - started) * 1000
+
+    @property
+    def total(self):
+        return sum(self.sections.values())
+
+    def header(self):
+        """The sections as a ``Server-Timing`` header value."""
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.sections.items())
+
+
+def _with_users(entries, users):
+    for entry in entries:
+        entry["user"] = users.get(entry["user_id"])
+    return entries
+
+
+def _build_site_widgets():
+    User = get_user_model()
+    individual = ranking.get_board(ranking.INDIVIDUAL).top(BOARD_SIZE)
+    users = User.objects.select_related("profile").in_bulk([e["user_id"] for e in individual])
+
+    now = timezone.now()
+    events = Event.objects.aggregate(upcoming=Count("id", filter=Q(start_at__gte=now)))
+    past_events = [
+        {"title": ev.title, "start_at": ev.start_at, "location": ev.location, "created_by": ev.created_by}
+        for ev in Event.objects.filter(start_at__lt=now).select_related("created_by").order_by("-start_at")[:PAST_EVENTS]
+    ]
+    totals = TaskTemplate.objects.filter(active=True).aggregate(
+        daily=Count("id", filter=Q(kind=TaskTemplate.DAILY)),
+        weekly=Count("id", filter=Q(kind=TaskTemplate.WEEKLY)),
+    )
+    return {
+        "individual_leaderboard": _with_users(individual, users),
+        "cio_leaderboard": [
+            {"rank": rank, "points": row.total_points, "user": row.cio}
+            for rank, row in enumerate(top_cios(BOARD_SIZE), start=1)
+        ],
+        "upcoming_events": events["upcoming"],
+        "past_events": past_events,
+        "daily_total": totals["daily"],
+        "weekly_total": totals["weekly"],
+    }
+
+
+def site_widgets(versions):
+    """Site-wide widgets, cached for ``DASHBOARD_CACHE_TIMEOUT`` seconds.
+
+    The key carries the ``leaderboard.fragments`` versions, so a change
+    that retires the rendered boards or event lists also retires this data.
+    """
+    key = f"{SITE_CACHE_KEY}:{versions[fragments.LEADERBOARDS]}:{versions[fragments.EVENTS]}"
+    widgets = cache.get(key)
+    if widgets is None:
+        widgets = _build_site_widgets()
+        cache.set(key, widgets, getattr(settings, "DASHBOARD_CACHE_TIMEOUT", DEFAULT_CACHE_TIMEOUT))
+    return widgets
+
+
+def _task_progress(user):
+    today = timezone.localdate()
+    start_of_week = today - timedelta(days=today.weekday())
+    return Task.objects.filter(
+        user=user,
+        completed=True,
+        template__active=True,
+        created_at__date__gte=start_of_week,
+    ).aggregate(
+        daily_completed=Count("id", filter=Q(template__kind=TaskTemplate.DAILY, created_at__date=today)),
+        weekly_completed=Count("id", filter=Q(template__kind=TaskTemplate.WEEKLY)),
+    )
+
+
+def _member_leaderboard(cio_id):
+    User = get_user_model()
+    members = ranking.get_board(ranking.member_board(cio_id)).top(BOARD_SIZE)
+    users = User.objects.select_related("profile").in_bulk([e["user_id"] for e in members])
+    return _with_users(members, users)
+
+
+def user_widgets(user, timings):
+    """Widgets that depend on ``user``, who must be authenticated."""
+    User = get_user_model()
+    with timings.section("profile"):
+        try:
+            # request.user.profile: the page header reuses the cached row
+            is_cio = user.profile.role == "cio"
+        except Profile.DoesNotExist:
+            is_cio = False
+        my_score = Points.objects.filter(user=user).values_list("score", flat=True).first() or 0
+
+    with timings.section("progress"):
+        progress = _task_progress(user)
+
+    with timings.section("boards"):
+        my_standing = ranking.standing(ranking.CIO if is_cio else ranking.INDIVIDUAL, user.id)
+        # evaluated by the template only when the "dashboard-members" fragment misses
+        members = SimpleLazyObject(partial(_member_leaderboard, user.id)) if is_cio else []
+        entries = my_standing["around"] if my_standing else []
+        if entries:
+            users = User.objects.select_related("profile").in_bulk({e["user_id"] for e in entries})
+            _with_users(entries, users)
+
+    with timings.section("notifications"):
+        unread = unread_notification_count(user)
+
+    return {
+        "is_cio": is_cio,
+        "my_score": my_score,
+        "my_standing": my_standing,
+        "member_leaderboard": members,
+        "unread_notifications": unread,
+        **progress,
+    }
+
+
+def load(user):
+    """Return ``(context, timings)`` for the dashboard as seen by ``user``."""
+    timings = Timings()
+    with timings.section("site"):
+        context = fragments.context()
+        context.update(site_widgets(context["fragment_versions"]))
+    context.update({
+        "is_cio": False,
+        "my_score": 0,
+        "my_standing": None,
+        "member_leaderboard": [],
+        "unread_notifications": 0,
+        "daily_completed": 0,
+        "weekly_completed": 0,
+    })
+    if user.is_authenticated:
+        context.update(user_widgets(user, timings))
+        if context["is_cio"]:
+            context["fragment_versions"][fragments.MEMBERS] = fragments.member_version(user.id)
+    logger.debug(f"Dashboard for {user.pk or 'anonymous'} built in {timings.total:.1f}ms ({timings.header()})")
+    return context, timings
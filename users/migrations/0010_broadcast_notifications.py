@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:57
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_remove_profile_timezone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notif_type',
+            field=models.CharField(choices=[('message', 'Message'), ('event', 'Event'), ('mention', 'Mention'), ('friend_request', 'Friend Request')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='BroadcastReceipt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seen_up_to', models.BigIntegerField(default=0)),
+                ('read_ids', models.JSONField(blank=True, default=list)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='broadcast_receipt', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BroadcastNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notif_type', models.CharField(choices=[('message', 'Message'), ('event', 'Event'), ('mention', 'Mention'), ('friend_request', 'Friend Request')], max_length=20)),
+                ('text', models.CharField(max_length=255)),
+                ('url', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['notif_type', 'url'], name='users_broadcast_target_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-17 21:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def coalesce_unread_messages(apps, schema_editor):
+    Notification = apps.get_model('users', 'Notification')
+    duplicates = (
+        Notification.objects.filter(notif_type='message', is_read=False)
+        .values('user_id', 'url')
+        .annotate(total=models.Count('id'), latest=models.Max('id'))
+        .filter(total__gt=1)
+    )
+    for group in duplicates:
+        Notification.objects.filter(
+            notif_type='message', is_read=False, user_id=group['user_id'], url=group['url'],
+        ).exclude(id=group['latest']).delete()
+        Notification.objects.filter(id=group['latest']).update(count=group['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_broadcast_notifications'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(coalesce_unread_messages, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_read', False), ('notif_type', 'message')), fields=('user', 'notif_type', 'url'), name='users_notification_one_unread_message'),
+        ),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -103,19 +105,282 @@ class Notification(models.Model):
     text = models.CharField(max_length=255)
     url = models.CharField(max_length=255, blank=True)
     is_read = models.BooleanField(default=False)
+    # for coalesced types, the number of events folded into this row
+    count = models.PositiveIntegerField(default=1)
+    # for coalesced types, bumped to the time of the latest event
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # types where repeats for the same target update the unread row in place
+    COALESCED_TYPES = ("message",)
+
     class Meta:
         ordering = ["-created_at"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "notif_type", "url"],
+                condition=models.Q(notif_type="message", is_read=False),
+                name="users_notification_one_unread_message",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.text[:40]}"
     
+class BroadcastNotification(models.Model):
+    """A notification for every user, stored once (e.g. a new event).
+
+    Whether a user has read it is tracked by their ``BroadcastReceipt``
+    rather than by a row per user.
+    """
+    notif_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    text = models.CharField(max_length=255)
+    url = models.CharField(max_length=255, blank=True)
+    # the user who triggered it doesn't get notified
+    sender = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    is_read = False
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["notif_type", "url"], name="users_broadcast_target_idx")]
+
+    def __str__(self):
+        return f"broadcast - {self.text[:40]}"
+
+
+class BroadcastReceipt(models.Model):
+    """Per-user read state for broadcasts.
+
+    Every broadcast up to ``seen_up_to`` counts as read, as do the ids in
+    ``read_ids``: broadcasts above the watermark that were read out of
+    order. The watermark moves forward over them as the gaps get read, so
+    ``read_ids`` stays short.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="broadcast_receipt")
+    seen_up_to = models.BigIntegerField(default=0)
+    read_ids = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"{self.user.username} - broadcasts read up to {self.seen_up_to}"
+
+
+# Unread counts are cached per user and kept in step by the write and
+# mark-as-read paths below; the cache timeout doubles as the interval at
+# which a count is reconciled against the tables.
+UNREAD_COUNT_TIMEOUT = 300
+LATEST_BROADCAST_KEY = "notifications:latest-broadcast"
+# every process must see the same counts and watermark (see settings.CACHES)
+COUNT_CACHE = "shared"
+
+
+def _counts():
+    return caches[COUNT_CACHE]
+
+
+def _latest_broadcast_id():
+    latest = _counts().get(LATEST_BROADCAST_KEY)
+    if latest is None:
+        latest = BroadcastNotification.objects.aggregate(last=models.Max("id"))["last"] or 0
+        _counts().set(LATEST_BROADCAST_KEY, latest, None)
+    return latest
+
+
+def _unread_count_key(user_id):
+    # a new broadcast changes every user's count; versioning the key by the
+    # latest broadcast retires all cached counts without touching them
+    return f"notifications:unread:{user_id}:{_latest_broadcast_id()}"
+
+
+def _adjust_unread_count(user_id, delta):
+    """Apply ``delta`` to a cached count; a missing count is left to be recomputed."""
+    key = _unread_count_key(user_id)
+    try:
+        if _counts().incr(key, delta) < 0:
+            _counts().delete(key)
+    except ValueError:
+        pass
+
+
+# rows per INSERT when fanning a notification out to many users
+NOTIFICATION_BATCH_SIZE = 1000
+# audiences bigger than this are written by a background worker
+NOTIFICATION_DEFER_THRESHOLD = 200
+
+
+def _write_notifications(user_ids, notif_type, text, url=""):
+    """Insert one notification per user id, ``NOTIFICATION_BATCH_SIZE`` rows at a time."""
+    batch_size = getattr(settings, "NOTIFICATION_BATCH_SIZE", NOTIFICATION_BATCH_SIZE)
+    if isinstance(user_ids, models.QuerySet):
+        user_ids = user_ids.iterator(chunk_size=batch_size)
+    batch = []
+    created = 0
+    for user_id in user_ids:
+        batch.append(Notification(user_id=user_id, notif_type=notif_type, text=text, url=url))
+        if len(batch) >= batch_size:
+            created += _insert_batch(batch)
+            batch = []
+    if batch:
+        created += _insert_batch(batch)
+    return created
+
+
+def _coalesce_batch(batch):
+    """Fold ``batch`` into matching unread notifications; return the rest."""
+    sample = batch[0]
+    unread = Notification.objects.filter(
+        user_id__in=[n.user_id for n in batch],
+        notif_type=sample.notif_type,
+        url=sample.url,
+        is_read=False,
+    )
+    existing = set(unread.values_list("user_id", flat=True))
+    if existing:
+        unread.update(count=models.F("count") + 1, text=sample.text, created_at=timezone.now())
+    return [n for n in batch if n.user_id not in existing]
+
+
+def _insert_batch(batch):
+    coalesce = batch[0].notif_type in Notification.COALESCED_TYPES
+    if coalesce:
+        batch = _coalesce_batch(batch)
+        if not batch:
+            return 0
+    if coalesce and len(batch) == 1:
+        try:
+            with transaction.atomic():
+                batch[0].save()
+        except IntegrityError:
+            # a concurrent sender just created the unread row; fold into theirs
+            _coalesce_batch(batch)
+            return 0
+        _adjust_unread_count(batch[0].user_id, 1)
+        return 1
+    # a concurrent sender may have just created an unread row; keep theirs
+    Notification.objects.bulk_create(batch, ignore_conflicts=coalesce)
+    if len(batch) == 1:
+        _adjust_unread_count(batch[0].user_id, 1)
+        return 1
+    # one cache round trip for the whole batch; counts are rebuilt on next read,
+    # so rows dropped as conflicts are never counted
+    _counts().delete_many([_unread_count_key(n.user_id) for n in batch])
+    return len(batch)
+
+
+def notify_users(users, notif_type, text, url="", defer=None):
+    """Send the same notification to every user in ``users``.
+
+    ``users`` is a queryset of users, or an iterable of users or user ids.
+    Rows are written with ``bulk_create`` in batches. For
+    ``Notification.COALESCED_TYPES``, a user who already has an unread
+    notification for the same ``url`` gets that row updated (count, text,
+    time) instead of a new one. Audiences larger than
+    ``NOTIFICATION_DEFER_THRESHOLD`` (or any audience, with ``defer=True``)
+    are handed to ``main.tasks`` after the current transaction commits, so
+    the request doesn't wait on them; a queryset audience is then only
+    evaluated by the worker.
+    """
+    if isinstance(users, models.QuerySet):
+        user_ids = users.order_by().values_list("id", flat=True)
+    else:
+        user_ids = [getattr(u, "id", u) for u in users]
+
+    if defer is None:
+        threshold = getattr(settings, "NOTIFICATION_DEFER_THRESHOLD", NOTIFICATION_DEFER_THRESHOLD)
+        # a cheap bounded probe instead of counting the whole audience
+        defer = len(user_ids[:threshold + 1]) > threshold
+
+    if not defer:
+        return _write_notifications(user_ids, notif_type, text, url)
+
+    from main.tasks import enqueue
+    transaction.on_commit(lambda: enqueue(_write_notifications, user_ids, notif_type, text, url))
+    return None
+
+
 def create_notification(user, notif_type, text, url=""):
-    from .models import Notification
-    Notification.objects.create(
-        user=user,
-        notif_type=notif_type,
-        text=text,
-        url=url,
-    )
\ No newline at end of file
+    """Notify a single user (a ``User`` or a user id)."""
+    notify_users([user], notif_type, text, url, defer=False)
+
+
+def broadcast_notification(notif_type, text, url="", sender=None):
+    """Notify every user (except ``sender``) with a single row."""
+    return BroadcastNotification.objects.create(notif_type=notif_type, text=text, url=url, sender=sender)
+
+
+def broadcast_receipt(user):
+    """Return ``user``'s receipt, creating it on first use.
+
+    Broadcasts sent before the user joined start out read.
+    """
+    receipt = BroadcastReceipt.objects.filter(user=user).first()
+    if receipt is None:
+        seen_up_to = (
+            BroadcastNotification.objects
+            .filter(created_at__lte=user.date_joined)
+            .aggregate(last=models.Max("id"))["last"]
+        ) or 0
+        receipt, _ = BroadcastReceipt.objects.get_or_create(user=user, defaults={"seen_up_to": seen_up_to})
+    return receipt
+
+
+def unread_broadcasts(user, receipt=None):
+    receipt = receipt or broadcast_receipt(user)
+    return (
+        BroadcastNotification.objects
+        .filter(id__gt=receipt.seen_up_to)
+        .exclude(id__in=receipt.read_ids)
+        .exclude(sender=user)
+    )
+
+
+def unread_notifications_for(user):
+    """Unread personal and broadcast notifications of ``user``, newest first."""
+    personal = list(Notification.objects.filter(user=user, is_read=False).order_by("-created_at"))
+    broadcasts = list(unread_broadcasts(user))
+    return sorted(personal + broadcasts, key=lambda n: n.created_at, reverse=True)
+
+
+def unread_notification_count(user):
+    """Number of unread personal and broadcast notifications, from the cache when possible."""
+    key = _unread_count_key(user.id)
+    count = _counts().get(key)
+    if count is None:
+        count = (
+            Notification.objects.filter(user=user, is_read=False).count()
+            + unread_broadcasts(user).count()
+        )
+        _counts().set(key, count, getattr(settings, "NOTIFICATION_COUNT_TIMEOUT", UNREAD_COUNT_TIMEOUT))
+    return count
+
+
+def mark_notifications_read(user, **filters):
+    """Mark ``user``'s unread notifications matching ``filters`` (e.g.
+    ``notif_type``, ``url``) as read, personal and broadcast alike."""
+    marked = Notification.objects.filter(user=user, is_read=False, **filters).update(is_read=True)
+    if marked:
+        _adjust_unread_count(user.id, -marked)
+
+    with transaction.atomic():
+        receipt = broadcast_receipt(user)
+        receipt = BroadcastReceipt.objects.select_for_update().get(pk=receipt.pk)
+        newly_read = list(unread_broadcasts(user, receipt).filter(**filters).values_list("id", flat=True))
+        if not newly_read:
+            return
+        _adjust_unread_count(user.id, -len(newly_read))
+        read = set(receipt.read_ids) | set(newly_read)
+
+        # advance the watermark over the run of read broadcasts just above it
+        pending = (
+            BroadcastNotification.objects
+            .filter(id__gt=receipt.seen_up_to)
+            .exclude(sender=user)
+            .order_by("id")
+            .values_list("id", flat=True)[:len(read) + 1]
+        )
+        for broadcast_id in pending:
+            if broadcast_id not in read:
+                break
+            receipt.seen_up_to = broadcast_id
+        receipt.read_ids = sorted(i for i in read if i > receipt.seen_up_to)
+        receipt.save(update_fields=["seen_up_to", "read_ids"])
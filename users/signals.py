@@ -1,7 +1,8 @@
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from .models import Profile
+from .models import LATEST_BROADCAST_KEY, BroadcastNotification, Profile, _counts
 
 
 @receiver(post_save, sender=User)
@@ -13,3 +14,37 @@ def create_or_update_profile(sender, instance, created, **kwargs):
             instance.profile.save()
         except Profile.DoesNotExist:
             Profile.objects.create(user=instance)
+
+
+# Profile fields other apps react to when they change (forum visibility,
+# leaderboard boards); fetched once per save for all of them.
+TRACKED_PROFILE_FIELDS = ("role", "display_name")
+
+
+@receiver(pre_save, sender=Profile)
+def remember_previous_profile(sender, instance, update_fields=None, **kwargs):
+    """Store the saved values of ``TRACKED_PROFILE_FIELDS`` as ``instance._previous_fields``.
+
+    None for a new profile. Saves that update none of the fields (every login
+    re-saves the profile) skip the query.
+    """
+    if update_fields is not None and not set(TRACKED_PROFILE_FIELDS) & set(update_fields):
+        instance._previous_fields = {field: getattr(instance, field) for field in TRACKED_PROFILE_FIELDS}
+        return
+    instance._previous_fields = (
+        Profile.objects.filter(pk=instance.pk).values(*TRACKED_PROFILE_FIELDS).first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=BroadcastNotification)
+def remember_latest_broadcast(sender, instance, created, **kwargs):
+    """Retire every cached unread count once a new broadcast commits, however it was created."""
+    if created:
+        transaction.on_commit(lambda: _counts().set(LATEST_BROADCAST_KEY, instance.id, None))
+
+
+@receiver(post_delete, sender=BroadcastNotification)
+def forget_latest_broadcast(sender, instance, **kwargs):
+    # recomputed from the table on next read
+    transaction.on_commit(lambda: _counts().delete(LATEST_BROADCAST_KEY))
@@ -1,13 +1,30 @@
-from django.test import TestCase
+from unittest import mock
+
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.test import Client, TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from leaderboard.models import Points
-from .models import Profile
+from leaderboard import ranking
+from leaderboard.models import Points, Task, TaskTemplate
+from social.models import Friendship
+from . import models as users_models
+from .models import (
+    BroadcastNotification, BroadcastReceipt, Notification, Profile, broadcast_notification,
+    create_notification, mark_notifications_read, notify_users, unread_notification_count,
+    unread_notifications_for,
+)
 
 
 User = get_user_model()
 
 
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
 class CIOLeaderboardTests(TestCase):
     def setUp(self):
         # create multiple users with profiles and points
@@ -34,6 +51,273 @@ class CIOLeaderboardTests(TestCase):
             profile = Profile.objects.filter(user=entry['user']).first()
             self.assertIsNotNone(profile)
             self.assertEqual(profile.role, 'cio')
-from django.test import TestCase
 
-# Create your tests here.
+
+class ProfileSignalTests(TestCase):
+    def test_previous_values_are_fetched_once_per_save(self):
+        profile = User.objects.create_user(username='carol', password='pass').profile
+        before = {'role': profile.role, 'display_name': profile.display_name}
+        profile.role = 'cio'
+        profile.display_name = 'Carol'
+
+        with CaptureQueriesContext(connection) as ctx:
+            profile.save()
+
+        # lookups of previous values select profile columns without user_id
+        reads = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT "users_profile"')]
+        reads = [sql for sql in reads if '"users_profile"."user_id"' not in sql.split(' FROM ')[0]]
+        self.assertEqual(len(reads), 1)
+        self.assertEqual(profile._previous_fields, before)
+
+    def test_saves_of_other_fields_skip_the_lookup(self):
+        profile = User.objects.create_user(username='carol', password='pass').profile
+        with CaptureQueriesContext(connection) as ctx:
+            profile.save(update_fields=['bio'])
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('SELECT')])
+
+
+@override_settings(BACKGROUND_TASKS={'BACKEND': 'main.tasks.ImmediateBackend'},
+                   NOTIFICATION_BATCH_SIZE=2, NOTIFICATION_DEFER_THRESHOLD=3)
+class NotifyUsersTests(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass') for i in range(5)]
+
+    def test_small_audience_is_written_in_batches(self):
+        # one INSERT per NOTIFICATION_BATCH_SIZE rows
+        with self.assertNumQueries(2):
+            notify_users(self.users[:3], 'event', 'Hello', '/events/1/')
+        self.assertEqual(Notification.objects.filter(text='Hello').count(), 3)
+
+    def test_large_audience_is_deferred_until_commit(self):
+        audience = User.objects.filter(username__startswith='user')
+        with self.captureOnCommitCallbacks() as callbacks:
+            with self.assertNumQueries(1):
+                notify_users(audience, 'event', 'Big event')
+            self.assertFalse(Notification.objects.filter(text='Big event').exists())
+        for callback in callbacks:
+            callback()
+        self.assertEqual(Notification.objects.filter(text='Big event').count(), 5)
+
+    def test_create_notification_accepts_user_or_id(self):
+        create_notification(self.users[0], 'mention', 'By user')
+        create_notification(self.users[1].id, 'mention', 'By id')
+        self.assertEqual(
+            sorted(Notification.objects.values_list('user__username', flat=True)), ['user0', 'user1'])
+
+
+class BroadcastNotificationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.cio = User.objects.create_user(username='cio', password='pass')
+        self.alice = User.objects.create_user(username='alice', password='pass')
+
+    def broadcast(self, n):
+        with self.captureOnCommitCallbacks(execute=True):
+            return broadcast_notification('event', f'New event {n}', f'/events/{n}/', sender=self.cio)
+
+    def test_broadcast_is_one_row_and_unread_for_everyone_but_sender(self):
+        self.broadcast(1)
+        self.assertEqual(BroadcastNotification.objects.count(), 1)
+        self.assertEqual(unread_notification_count(self.alice), 1)
+        self.assertEqual(unread_notification_count(self.cio), 0)
+
+    def test_merged_with_personal_notifications_newest_first(self):
+        self.broadcast(1)
+        create_notification(self.alice, 'mention', 'You were mentioned')
+        self.assertEqual(
+            [n.text for n in unread_notifications_for(self.alice)],
+            ['You were mentioned', 'New event 1'])
+
+    def test_users_joining_later_skip_old_broadcasts(self):
+        self.broadcast(1)
+        bob = User.objects.create_user(username='bob', password='pass')
+        self.assertEqual(unread_notification_count(bob), 0)
+        self.broadcast(2)
+        self.assertEqual(unread_notification_count(bob), 1)
+
+    def test_out_of_order_reads_compact_into_watermark(self):
+        first, second, third = self.broadcast(1), self.broadcast(2), self.broadcast(3)
+
+        mark_notifications_read(self.alice, notif_type='event', url='/events/2/')
+        receipt = BroadcastReceipt.objects.get(user=self.alice)
+        self.assertLess(receipt.seen_up_to, first.id)
+        self.assertEqual(receipt.read_ids, [second.id])
+        self.assertEqual([n.text for n in unread_notifications_for(self.alice)], ['New event 3', 'New event 1'])
+
+        mark_notifications_read(self.alice, notif_type='event', url='/events/1/')
+        receipt.refresh_from_db()
+        self.assertEqual((receipt.seen_up_to, receipt.read_ids), (second.id, []))
+        self.assertEqual(unread_notification_count(self.alice), 1)
+
+    def test_broadcasts_saved_or_deleted_elsewhere_retire_cached_counts(self):
+        self.broadcast(1)
+        self.assertEqual(unread_notification_count(self.alice), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            # e.g. added through the admin
+            second = BroadcastNotification.objects.create(notif_type='event', text='Admin news')
+        self.assertEqual(unread_notification_count(self.alice), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertEqual(unread_notification_count(self.alice), 1)
+
+    def test_notifications_page_lists_broadcasts(self):
+        self.broadcast(1)
+        self.client.force_login(self.alice)
+        with self.settings(STORAGES={
+            'default': {'BACKEND': 'django.core.files.storage.InMemoryStorage'},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        }):
+            resp = self.client.get(reverse('users:notifications'))
+        self.assertContains(resp, 'New event 1')
+        self.assertEqual(resp.context['unread_notifications_count'], 1)
+
+
+class UnreadCountCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.alice = User.objects.create_user(username='alice', password='pass')
+
+    def test_count_is_cached_and_kept_in_step(self):
+        create_notification(self.alice, 'mention', 'one')
+        self.assertEqual(unread_notification_count(self.alice), 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_notification_count(self.alice), 1)
+
+        create_notification(self.alice, 'mention', 'two')
+        with self.assertNumQueries(0):
+            self.assertEqual(unread_notification_count(self.alice), 2)
+
+        mark_notifications_read(self.alice, notif_type='mention')
+        self.assertEqual(unread_notification_count(self.alice), 0)
+
+    def test_new_broadcast_invalidates_cached_counts(self):
+        self.assertEqual(unread_notification_count(self.alice), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            broadcast_notification('event', 'New event', '/events/1/')
+        self.assertEqual(unread_notification_count(self.alice), 1)
+
+    def test_count_is_reconciled_after_timeout(self):
+        self.assertEqual(unread_notification_count(self.alice), 0)
+        # written behind the counter's back
+        Notification.objects.create(user=self.alice, notif_type='mention', text='direct')
+        self.assertEqual(unread_notification_count(self.alice), 0)
+        clear_caches()
+        self.assertEqual(unread_notification_count(self.alice), 1)
+
+
+class CoalescedNotificationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.alice = User.objects.create_user(username='alice', password='pass')
+        self.bob = User.objects.create_user(username='bob', password='pass')
+
+    def test_repeated_messages_update_one_unread_row(self):
+        notify_users([self.alice, self.bob], 'message', 'New message from carol', '/chats/1/')
+        notify_users([self.alice], 'message', 'New message from dave', '/chats/1/')
+
+        row = Notification.objects.get(user=self.alice)
+        self.assertEqual((row.count, row.text), (2, 'New message from dave'))
+        self.assertEqual(Notification.objects.get(user=self.bob).count, 1)
+        self.assertEqual(unread_notification_count(self.alice), 1)
+
+    def test_row_created_by_a_concurrent_sender_is_not_counted_twice(self):
+        notify_users([self.alice], 'message', 'New message from carol', '/chats/1/')
+        self.assertEqual(unread_notification_count(self.alice), 1)
+
+        # the other sender's row lands between our lookup and our insert
+        real = users_models._coalesce_batch
+        lookups = iter([lambda batch: batch, real])
+        with mock.patch.object(users_models, '_coalesce_batch', lambda batch: next(lookups)(batch)):
+            notify_users([self.alice], 'message', 'New message from dave', '/chats/1/')
+
+        self.assertEqual(Notification.objects.get(user=self.alice).count, 2)
+        self.assertEqual(unread_notification_count(self.alice), 1)
+
+    def test_other_conversations_and_read_rows_are_separate(self):
+        notify_users([self.alice], 'message', 'New message', '/chats/1/')
+        notify_users([self.alice], 'message', 'New message', '/chats/2/')
+        mark_notifications_read(self.alice, url='/chats/1/')
+        notify_users([self.alice], 'message', 'New message', '/chats/1/')
+
+        self.assertEqual(Notification.objects.filter(user=self.alice).count(), 3)
+        self.assertEqual(unread_notification_count(self.alice), 2)
+
+    def test_other_types_are_not_coalesced(self):
+        create_notification(self.alice, 'mention', 'Mentioned', '/forum/1/')
+        create_notification(self.alice, 'mention', 'Mentioned', '/forum/1/')
+        self.assertEqual(Notification.objects.filter(user=self.alice).count(), 2)
+
+
+@override_settings(STORAGES={
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+})
+class DashboardTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        ranking.reset()
+        self.users = [User.objects.create_user(username=f'user{i}', password='pass') for i in range(12)]
+        for i, user in enumerate(self.users):
+            Points.objects.create(user=user, score=i * 10)
+        self.me = self.users[1]
+        self.client.force_login(self.me)
+
+    def test_context_and_timing_header(self):
+        daily = TaskTemplate.active_for(TaskTemplate.DAILY).first()
+        Task.objects.create(user=self.me, template=daily, title=daily.title, points=daily.points, completed=True)
+
+        resp = self.client.get(reverse('dashboard'))
+
+        self.assertEqual(resp.context['my_score'], 10)
+        self.assertEqual(resp.context['daily_completed'], 1)
+        self.assertEqual(resp.context['daily_total'], TaskTemplate.active_for(TaskTemplate.DAILY).count())
+        self.assertEqual([e['user'] for e in resp.context['individual_leaderboard'][:2]], [self.users[11], self.users[10]])
+        self.assertEqual(resp.context['my_standing']['rank'], 11)
+        self.assertEqual(resp.context['my_standing']['around'][-2]['user'], self.me)
+        self.assertIn('site;dur=', resp['Server-Timing'])
+        self.assertIn('progress;dur=', resp['Server-Timing'])
+
+    def test_site_widgets_are_shared_between_viewers(self):
+        other = Client()
+        other.force_login(self.users[5])
+        unread_notification_count(self.users[5])
+        self.client.get(reverse('dashboard'))
+        # session, user, profile, score, task progress, users around the rank, header picture
+        with self.assertNumQueries(7):
+            resp = other.get(reverse('dashboard'))
+        self.assertEqual(resp.context['my_standing']['rank'], 7)
+
+    def test_anonymous_sees_site_widgets_only(self):
+        self.client.logout()
+        resp = self.client.get(reverse('dashboard'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context['individual_leaderboard']), 10)
+        self.assertIsNone(resp.context['my_standing'])
+
+    def test_cio_sees_member_board(self):
+        cio = self.users[11]
+        cio.profile.role = 'cio'
+        cio.profile.save()
+        Friendship.make_friends(cio, self.users[3])
+        Friendship.make_friends(cio, self.users[7])
+        self.client.force_login(cio)
+
+        resp = self.client.get(reverse('dashboard'))
+
+        self.assertTrue(resp.context['is_cio'])
+        self.assertEqual([e['user'] for e in resp.context['member_leaderboard']], [self.users[7], self.users[3]])
+        self.assertEqual(resp.context['cio_leaderboard'][0]['points'], 100)
+
+    def test_cached_member_board_is_not_rebuilt(self):
+        cio = self.users[11]
+        cio.profile.role = 'cio'
+        cio.profile.save()
+        Friendship.make_friends(cio, self.users[3])
+        self.client.force_login(cio)
+        self.assertContains(self.client.get(reverse('dashboard')), 'user3')
+
+        with mock.patch('users.dashboard._member_leaderboard') as build:
+            resp = self.client.get(reverse('dashboard'))
+        self.assertContains(resp, 'user3')
+        build.assert_not_called()
@@ -2,24 +2,18 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
+from django.utils.functional import SimpleLazyObject
 from .models import Profile, Interest, ProfilePicture
-from leaderboard.models import Points
-from leaderboard.models import Task as LeaderboardTask
-from django.utils import timezone
-from datetime import timedelta
-import os
-import json
 from .forms import UserRegisterForm, UserUpdateForm, ProfileForm
-from .models import Notification
+from .models import unread_notifications_for
+from . import dashboard as dashboard_data
+from leaderboard import fragments
 
 
 @login_required
 def notifications_list(request):
-    # fetch newest first, only show unread notifications
-    notifications = Notification.objects.filter(
-        user=request.user,
-        is_read=False
-    ).order_by("-created_at")
+    # fetch newest first, only show unread notifications (personal and broadcast)
+    notifications = unread_notifications_for(request.user)
 
     return render(
         request,
@@ -156,198 +150,10 @@ def profile_view(request):
 
 
 def dashboard(request):
-
-    individual_leaderboard = []
-    cio_leaderboard = []
-    member_leaderboard = []
-    is_cio = False
-
-    try:
-        # Individual Leaderboard: Users that are NOT CIOs
-        individual_qs = (
-            Points.objects.select_related('user', 'user__profile')
-            .exclude(user__profile__role='cio')
-            .order_by('-score')[:10]
-        )
-
-        for idx, p in enumerate(individual_qs, start=1):
-            individual_leaderboard.append({
-                'rank': idx,
-                'points': p.score,
-                'user': p.user,
-            })
-    except Exception:
-        individual_leaderboard = []
-
-    try:
-        # CIO Leaderboard: total member points — sum all follower points for each CIO
-        from django.db.models import Sum
-        from social.models import Friendship
-
-        cios = Profile.objects.filter(role="cio").select_related('user')
-
-        cio_scores = []
-        for cio_profile in cios:
-            cio_user = cio_profile.user
-
-            followers = Friendship.friends_of(cio_user)
-            total_points = (
-                Points.objects.filter(user__in=followers)
-                .aggregate(total=Sum('score'))['total'] or 0
-            )
-
-            cio_scores.append({
-                'user': cio_user,
-                'total_points': total_points,
-            })
-
-        cio_scores.sort(key=lambda x: x['total_points'], reverse=True)
-        cio_scores = cio_scores[:10]
-
-        for idx, cio_data in enumerate(cio_scores, start=1):
-            cio_leaderboard.append({
-                'rank': idx,
-                'points': cio_data['total_points'],
-                'user': cio_data['user'],
-            })
-    except Exception:
-        cio_leaderboard = []
-
-    # Member Leaderboard: Only shown to CIOs, lists their top followers
-    try:
-        from social.models import Friendship
-
-        if request.user.is_authenticated:
-            user_profile = Profile.objects.filter(
-                user=request.user, role="cio").first()
-            if user_profile:
-                is_cio = True
-
-                followers = Friendship.friends_of(request.user)
-
-                member_qs = Points.objects.filter(
-                    user__in=followers
-                ).select_related('user', 'user__profile').order_by('-score')[:10]
-
-                for idx, p in enumerate(member_qs, start=1):
-                    member_leaderboard.append({
-                        'rank': idx,
-                        'points': p.score,
-                        'user': p.user,
-                    })
-    except Exception:
-        member_leaderboard = []
-
-    # Weekly challenge progress for current user (for the dashboard widget)
-    weekly_total = 0
-    weekly_completed = 0
-    if request.user.is_authenticated:
-        tasks_file = os.path.join(os.path.dirname(
-            os.path.dirname(__file__)), 'leaderboard', 'weekly_tasks.json')
-        try:
-            with open(tasks_file, 'r', encoding='utf-8') as f:
-                templates = json.load(f)
-                weekly_total = len(templates)
-                titles = [t.get('title') for t in templates]
-        except Exception:
-            titles = []
-
-        today = timezone.localdate()
-        start_of_week = today - timedelta(days=today.weekday())
-        end_of_week = start_of_week + timedelta(days=7)
-
-        if titles:
-            weekly_completed = LeaderboardTask.objects.filter(
-                user=request.user,
-                completed=True,
-                title__in=titles,
-                created_at__date__gte=start_of_week,
-                created_at__date__lt=end_of_week,
-            ).count()
-
-    # Daily challenge progress for current user (for the dashboard widget)
-    daily_total = 0
-    daily_completed = 0
-    if request.user.is_authenticated:
-        daily_file = os.path.join(os.path.dirname(
-            os.path.dirname(__file__)), 'leaderboard', 'daily_tasks.json')
-        try:
-            with open(daily_file, 'r', encoding='utf-8') as f:
-                daily_templates = json.load(f)
-                daily_total = len(daily_templates)
-                daily_titles = [t.get('title') for t in daily_templates]
-        except Exception:
-            daily_titles = []
-
-        if daily_titles:
-            today = timezone.localdate()
-            tomorrow = today + timedelta(days=1)
-            daily_completed = LeaderboardTask.objects.filter(
-                user=request.user,
-                completed=True,
-                title__in=daily_titles,
-                created_at__date__gte=today,
-                created_at__date__lt=tomorrow,
-            ).count()
-
-    # Upcoming events count for dashboard
-    upcoming_events = 0
-    past_events = []
-    try:
-        from leaderboard.models import Event
-        now = timezone.now()
-        upcoming_events = Event.objects.filter(start_at__gte=now).count()
-        
-        # Get past events (last 5)
-        past_events_qs = Event.objects.filter(
-            start_at__lt=now
-        ).order_by('-start_at')[:5]
-        
-        for event in past_events_qs:
-            past_events.append({
-                'title': event.title,
-                'start_at': event.start_at,
-                'location': event.location,
-                'created_by': event.created_by,
-            })
-    except Exception:
-        upcoming_events = 0
-        past_events = []
-
-    # current user's personal score
-    my_score = 0
-    if request.user.is_authenticated:
-        try:
-            pts = Points.objects.filter(user=request.user).first()
-            my_score = pts.score if pts and pts.score is not None else 0
-        except Exception:
-            my_score = 0
-
-    # unread notifications for dashboard widget
-    unread_notifications = 0
-    if request.user.is_authenticated:
-        try:
-            unread_notifications = Notification.objects.filter(
-                user=request.user,
-                is_read=False,
-            ).count()
-        except Exception:
-            unread_notifications = 0
-
-    return render(request, 'users/dashboard.html', {
-        'individual_leaderboard': individual_leaderboard,
-        'cio_leaderboard': cio_leaderboard,
-        'member_leaderboard': member_leaderboard,
-        'is_cio': is_cio,
-        'weekly_total': weekly_total,
-        'weekly_completed': weekly_completed,
-        'daily_total': daily_total,
-        'daily_completed': daily_completed,
-        'upcoming_events': upcoming_events,
-        'past_events': past_events,
-        'my_score': my_score,
-        'unread_notifications': unread_notifications,
-    })
+    context, timings = dashboard_data.load(request.user)
+    response = render(request, 'users/dashboard.html', context)
+    response['Server-Timing'] = timings.header()
+    return response
 
 
 @login_required
@@ -412,25 +218,20 @@ def profile_view(request, username):
     profile_picture, _ = ProfilePicture.objects.get_or_create(user=user)
 
     template_name = "users/profile_view.html"
+    # If the profile belongs to a CIO, include their followers as a member leaderboard.
+    # Lazy, so it is only built when the template's cached fragment misses.
     cio_members = []
-    # If the profile belongs to a CIO, include their followers as a member leaderboard
-    try:
-        if profile.role == 'cio':
-            from social.models import Friendship
-            from leaderboard.models import Points
-
-            followers = Friendship.friends_of(user)
-            member_qs = (
-                Points.objects.filter(user__in=followers)
-                .select_related('user', 'user__profile')
-                .order_by('-score')[:10]
-            )
+    if profile.role == 'cio':
+        def top_members():
+            from leaderboard import ranking
+
+            members = ranking.get_board(ranking.member_board(user.id)).top(10)
+            users = User.objects.select_related('profile').in_bulk([m['user_id'] for m in members])
+            for m in members:
+                m['user'] = users.get(m['user_id'])
+            return members
 
-            for idx, p in enumerate(member_qs, start=1):
-                cio_members.append(
-                    {'rank': idx, 'points': p.score, 'user': p.user})
-    except Exception:
-        cio_members = []
+        cio_members = SimpleLazyObject(top_members)
     # relationship status for the current viewer
     is_friend = False
     request_pending = False
@@ -452,6 +253,7 @@ def profile_view(request, username):
         "is_friend": is_friend,
         "request_pending": request_pending,
         "cio_members": cio_members,
+        **fragments.context(members_of=user.id if profile.role == 'cio' else None),
     }
 
     return render(request, template_name, context)